@@ -0,0 +1,179 @@
+"""Parse time and peak RSS of an upstream sensor payload, buffered vs streamed.
+
+Each case runs in a fresh interpreter so peak RSS is not polluted by the
+previous one:
+
+  json.loads     what response.json() did: the whole history as dicts of strings
+  orjson.loads   same, with orjson (skipped if it is not installed)
+  stream         upstream.read_points() over 64 KiB chunks, every point
+  stream-capped  read_points() stopping after --max-points points
+  stream-delta   read_points() stopping at a watermark --new-points points in
+
+Peak RSS is the growth of VmHWM over the RSS before parsing, with the fixture
+already loaded (it is reset through /proc/self/clear_refs on Linux).
+
+Record a real response once and reuse it:
+
+    python benchmarks/bench_parse.py --record "https://esmc.uiowa.edu/...?sensorID=usda-air-w06" \\
+        --fixture /tmp/usda-air-w06.json
+
+Without --fixture a synthetic payload of --points points in the upstream
+format is generated (and kept in the temp dir).
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scheduler_backend.celery import upstream  # noqa: E402
+
+CASES = ["json.loads", "orjson.loads", "stream", "stream-capped", "stream-delta"]
+
+
+def synthesize(path, points):
+    newest = datetime(2025, 5, 4, 10, tzinfo=timezone.utc)
+    payload = {
+        "status": 200,
+        "message": "Success",
+        "sensorID": "usda-air-w06",
+        "points": [
+            {
+                "esmcTime": (newest - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "temperature": f"{20 + (i % 100) / 10:.2f}",
+                "humidity": f"{40 + (i % 300) / 10:.2f}",
+                "pressure": f"{100 + (i % 50) / 10:.2f}",
+                "soilMoisture20": "NaN",
+                "soilMoisture5": "NaN",
+                "soilTemperature": "NaN",
+                "vcc": f"{3 + (i % 30) / 100:.2f}",
+            }
+            for i in range(points)
+        ],
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f)
+
+
+def record(url, path):
+    import requests
+
+    response = requests.get(url, timeout=60, verify=False)
+    response.raise_for_status()
+    with open(path, "wb") as f:
+        f.write(response.content)
+
+
+def _reset_peak_rss():
+    # Linux resets VmHWM (peak RSS) to the current RSS on "5" > clear_refs
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(case, path, max_points, new_points, repeat):
+    """Runs one case in this process and prints a JSON line with its results."""
+    with open(path, "rb") as f:
+        body = f.read()
+    watermark = None
+    if case == "stream-delta":
+        _, head = upstream.read_points(upstream._chunks(body), limit=new_points + 1)
+        watermark = head[-1].timestamp
+
+    if case == "json.loads":
+        parse = lambda: json.loads(body)  # noqa: E731
+    elif case == "orjson.loads":
+        try:
+            import orjson
+        except ImportError:
+            print(json.dumps({"case": case, "skipped": True}))
+            return
+        parse = lambda: orjson.loads(body)  # noqa: E731
+    else:
+        limit = max_points if case == "stream-capped" else None
+        parse = lambda: upstream.read_points(upstream._chunks(body), newer_than=watermark, limit=limit)  # noqa: E731
+
+    baseline = _rss_kb()
+    _reset_peak_rss()
+    timings, result = [], None
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter()
+        result = parse()
+        timings.append(time.perf_counter() - start)
+    peak = _peak_rss_kb()
+    points = len(result["points"]) if isinstance(result, dict) else len(result[1])
+    print(json.dumps({
+        "case": case,
+        "points": points,
+        "ms": statistics.median(timings) * 1000,
+        "peak_mb": (peak - baseline) / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", help="recorded upstream response (JSON file)")
+    parser.add_argument("--record", metavar="URL", help="download URL into --fixture first")
+    parser.add_argument("--points", type=int, default=50_000, help="points in the synthetic fixture")
+    parser.add_argument("--max-points", type=int, default=2000)
+    parser.add_argument("--new-points", type=int, default=60, help="points ahead of the watermark in stream-delta")
+    parser.add_argument("--repeat", type=int, default=5, help="parses per case (median reported)")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    path = args.fixture or os.path.join(tempfile.gettempdir(), f"bench_parse_{args.points}.json")
+    if args.case:
+        run_case(args.case, path, args.max_points, args.new_points, args.repeat)
+        return
+    if args.record:
+        if not args.fixture:
+            parser.error("--record needs --fixture")
+        record(args.record, path)
+    elif not os.path.exists(path):
+        synthesize(path, args.points)
+
+    print(f"fixture {path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+    print(f"{'case':<15}{'points':>9}{'parse ms':>11}{'peak RSS MB':>13}")
+    for case in CASES:
+        output = subprocess.run(
+            [sys.executable, __file__, "--case", case, "--fixture", path, "--max-points", str(args.max_points),
+             "--new-points", str(args.new_points), "--repeat", str(args.repeat)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        if r.get("skipped"):
+            print(f"{case:<15}{'(not installed)':>33}")
+            continue
+        print(f"{case:<15}{r['points']:>9}{r['ms']:>11.1f}{r['peak_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
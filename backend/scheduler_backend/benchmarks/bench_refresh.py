@@ -0,0 +1,184 @@
+"""Measures wall time of a full sensor refresh against a local stub ESMC server.
+
+Starts a threaded HTTP server on localhost that answers every sensor query
+with a fixed JSON payload after an artificial delay, then refreshes 10, 100
+and 1000 sensors two ways:
+
+  legacy      one fresh connection per sensor, `--legacy-workers` fetches at a
+              time (what a Celery group of fetch_and_cache_sensor tasks does on
+              a worker with that many processes)
+  concurrent  upstream.fetch_all(): a thread pool sharing one keep-alive session
+
+    python benchmarks/bench_refresh.py --latency-ms 50 --concurrency 16
+
+A third run repeats the concurrent refresh with the validators of the second
+one, so every sensor comes back unchanged: by 304 when the stub sends ETags,
+or by body digest with --no-etag.
+
+With --redis-url, the cache write is timed as well: one SET per sensor versus
+the single pipelined set_many the refresh task now issues.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scheduler_backend.celery import upstream  # noqa: E402
+
+PAYLOAD = json.dumps([
+    {"time": f"2025-01-01 00:{m:02d}:00", "temp": 21.5, "pres": 1001.2, "hum": 45.0, "vcc": 3300}
+    for m in range(60)
+]).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    latency = 0.05
+    etag = '"bench-v1"'
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        # headers and body go out in separate writes; don't let Nagle hold the body back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.etag and self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if self.etag:
+            self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(latency, etag=True):
+    StubHandler.latency = latency
+    StubHandler.etag = StubHandler.etag if etag else None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy_refresh(sensor_ids, url_template, workers):
+    def fetch(sensor_id):
+        response = requests.get(url_template.format(sensor_id=sensor_id), timeout=30)
+        return sensor_id, response.json()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(fetch, sensor_ids))
+
+
+def timed(fn, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def bench_redis(redis_url, results, repeat):
+    import redis
+
+    client = redis.Redis.from_url(redis_url)
+    values = {f"bench:sensor:{k}": json.dumps(data) for k, (data, _) in results.items()}
+
+    def one_by_one():
+        for key, value in values.items():
+            client.set(key, value, ex=60)
+
+    def pipelined():
+        pipe = client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.set(key, value, ex=60)
+        pipe.execute()
+
+    per_key, _ = timed(one_by_one, repeat)
+    batch, _ = timed(pipelined, repeat)
+    client.delete(*values)
+    return per_key, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency-ms", type=float, default=50, help="stub server delay per request")
+    parser.add_argument("--concurrency", type=int, default=upstream.FETCH_CONCURRENCY)
+    parser.add_argument("--rate-per-host", type=float, default=0, help="per-host req/s limit (0 = unlimited)")
+    parser.add_argument("--legacy-workers", type=int, default=4, help="parallel fetches in the legacy mode")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (median reported)")
+    parser.add_argument("--no-etag", action="store_true", help="stub sends no ETag (detect changes by body digest)")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"))
+    args = parser.parse_args()
+
+    server = start_stub(args.latency_ms / 1000, etag=not args.no_etag)
+    url_template = f"http://127.0.0.1:{server.server_address[1]}/query?sensorID={{sensor_id}}"
+    print(f"stub latency {args.latency_ms:.0f} ms, concurrency {args.concurrency}, "
+          f"legacy workers {args.legacy_workers}, rate limit {args.rate_per_host or 'off'}")
+    print(f"{'sensors':>8}{'legacy s':>11}{'conns':>7}{'concurrent s':>14}{'conns':>7}{'speedup':>9}"
+          f"{'unchanged s':>13}{'parsed':>8}")
+
+    for size in args.sizes:
+        sensor_ids = [f"bench-{i:04d}" for i in range(size)]
+
+        StubHandler.connections = 0
+        legacy, _ = timed(lambda: legacy_refresh(sensor_ids, url_template, args.legacy_workers), args.repeat)
+        legacy_conns = StubHandler.connections // args.repeat
+
+        StubHandler.connections = 0
+        concurrent, results = timed(
+            lambda: upstream.fetch_all(
+                sensor_ids, url_template=url_template,
+                concurrency=args.concurrency, rate_per_host=args.rate_per_host,
+            ),
+            args.repeat,
+        )
+        concurrent_conns = StubHandler.connections // args.repeat
+        assert len(results) == size, f"{size - len(results)} fetches failed"
+
+        known = {sensor_id: validators for sensor_id, (_, validators) in results.items()}
+        unchanged, repeated = timed(
+            lambda: upstream.fetch_all(
+                sensor_ids, url_template=url_template, validators=known,
+                concurrency=args.concurrency, rate_per_host=args.rate_per_host,
+            ),
+            args.repeat,
+        )
+        parsed = sum(data is not upstream.UNCHANGED for data, _ in repeated.values())
+
+        print(f"{size:>8}{legacy:>11.2f}{legacy_conns:>7}{concurrent:>14.2f}{concurrent_conns:>7}"
+              f"{legacy / concurrent:>8.1f}x{unchanged:>13.2f}{parsed:>8}")
+
+        if args.redis_url:
+            per_key, batch = bench_redis(args.redis_url, results, args.repeat)
+            print(f"{'':>8}redis: {size} SETs {per_key * 1000:.1f} ms, one pipeline {batch * 1000:.1f} ms")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# breaker.py
+# The ESMC circuit breaker shared with the main project (sensor_data/breaker.py),
+# through the same cache keys: when the upstream keeps failing, neither project
+# sends requests until SENSOR_BREAKER_RESET_TIMEOUT seconds have passed, then
+# one probe at a time may close it again.
+# This project fetches sensors in batches, so a batch counts as one request:
+# it failed if no sensor could be fetched at all, and is timed as a whole.
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+FAILURES_KEY = "upstream:breaker:failures"
+OPENED_KEY = "upstream:breaker:opened"
+PROBE_KEY = "upstream:breaker:probe"
+STATE_TIMEOUT = 24 * 60 * 60
+PROBE_TIMEOUT = 30
+FAILURE_THRESHOLD = getattr(settings, "SENSOR_BREAKER_FAILURES", 5)
+RESET_TIMEOUT = getattr(settings, "SENSOR_BREAKER_RESET_TIMEOUT", 60)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def metric_key(name):
+    return f"upstream:metrics:{name}"
+
+
+def _incr(name, delta=1):
+    key = metric_key(name)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def _observe(outcome, elapsed):
+    _incr(outcome)
+    _incr(next((f"le_{bound}" for bound in LATENCY_BUCKETS if elapsed <= bound), "le_inf"))
+    _incr("latency_ms", round(elapsed * 1000))
+
+
+def state(now=None):
+    """"closed", "open" or "half_open"."""
+    opened_at = cache.get(OPENED_KEY)
+    if opened_at is None:
+        return "closed"
+    return "open" if (now or time.time()) < opened_at + RESET_TIMEOUT else "half_open"
+
+
+def allow():
+    """Whether a batch may be fetched now; a half-open breaker lets one probe through."""
+    current = state()
+    if current == "closed" or (current == "half_open" and cache.add(PROBE_KEY, True, PROBE_TIMEOUT)):
+        return True
+    _incr("rejected")
+    return False
+
+
+def record(succeeded, elapsed):
+    """Reports the outcome of a batch, closing or (re)opening the breaker as needed."""
+    now = time.time()
+    _observe("successes" if succeeded else "failures", elapsed)
+    opened_at = cache.get(OPENED_KEY)
+    if succeeded:
+        if opened_at is not None:
+            cache.delete_many([OPENED_KEY, PROBE_KEY, FAILURES_KEY])
+            _incr("closed")
+            logger.info("ESMC upstream answered again, circuit closed")
+        else:
+            cache.delete(FAILURES_KEY)
+        return
+    if opened_at is not None:
+        if now >= opened_at + RESET_TIMEOUT:
+            cache.set(OPENED_KEY, now, STATE_TIMEOUT)
+            cache.delete(PROBE_KEY)
+            _incr("opened")
+            logger.warning("ESMC upstream probe failed, circuit open again")
+        return
+    try:
+        failures = cache.incr(FAILURES_KEY)
+    except ValueError:
+        failures = 1 if cache.add(FAILURES_KEY, 1, STATE_TIMEOUT) else cache.incr(FAILURES_KEY)
+    if failures >= FAILURE_THRESHOLD and cache.add(OPENED_KEY, now, STATE_TIMEOUT):
+        _incr("opened")
+        logger.warning(f"ESMC upstream failed {failures} times in a row, circuit open")
@@ -0,0 +1,38 @@
+# latest.py
+# The latest reading per sensor, in the Redis hash the main project reads
+# (sensor_data/latest.py): field sensor_id, value the reading as JSON, a dict of
+# its timestamp (epoch seconds) and the POINT_FIELDS values.
+# A reading replaces a sensor's field only if it is newer, in one Lua script
+# call, the same script as the main project's. This project has no access to
+# the main project's sensor_latest table, so it updates the hash only.
+import json
+
+from django_redis import get_redis_connection
+
+from .series import POINT_FIELDS
+
+HASH_KEY = "sensors:latest"
+
+RECORD_SCRIPT = """
+local written = 0
+for i = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or tonumber(cjson.decode(current)['timestamp']) < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+        written = written + 1
+    end
+end
+return written
+"""
+
+
+def record(readings):
+    """Stores {sensor_id: reading} in the hash wherever each reading is newer; None readings are skipped."""
+    args = []
+    for sensor_id, reading in readings.items():
+        if reading is None:
+            continue
+        reading = {"timestamp": reading["timestamp"], **{field: reading.get(field) for field in POINT_FIELDS}}
+        args += [sensor_id, reading["timestamp"], json.dumps(reading)]
+    if args:
+        get_redis_connection("default").eval(RECORD_SCRIPT, 1, HASH_KEY, *args)
@@ -0,0 +1,27 @@
+# registry.py
+# The sensors to refresh, as published by the main project (sensor_data/registry.py):
+# every sensor registered in Belongs plus the public ones, busiest first, each
+# with a refresh interval derived from how recently it was queried and how many
+# users have it as a favorite. This project has no access to that database, so
+# until the registry has been published the static SENSOR_LIST is used.
+# When each sensor is due is planned in scheduling.py.
+from django.conf import settings
+from django.core.cache import cache
+
+from .sensor_ids import SENSOR_LIST
+
+REGISTRY_KEY = "sensors:registry"
+DEFAULT_INTERVAL = getattr(settings, "SENSOR_REFRESH_INTERVAL", 60)
+
+
+def load():
+    """The published registry ({sensor_id: entry}), or SENSOR_LIST at DEFAULT_INTERVAL."""
+    entries = cache.get(REGISTRY_KEY)
+    if entries is None:
+        entries = {sensor_id: {"interval": DEFAULT_INTERVAL} for sensor_id in SENSOR_LIST}
+    return entries
+
+
+def interval(entries, sensor_id):
+    """The refresh interval of a sensor, DEFAULT_INTERVAL if it is not in `entries`."""
+    return entries.get(sensor_id, {}).get("interval", DEFAULT_INTERVAL)
@@ -0,0 +1,30 @@
+# responses.py
+# Pre-serialized sensor_data_api responses.
+# Next to every payload it writes, the refresh task caches the final response
+# body, gzipped, with the SHA-256 digest of the JSON (the main project's
+# sensor_data/responses.py serves it as is and derives the ETag from the digest).
+# The digest also goes to version_key(), written after the payload and response,
+# which the main project's per-process L1 cache revalidates against.
+import gzip
+import hashlib
+
+from . import series
+
+GZIP_LEVEL = 6
+
+
+def response_key(sensor_id):
+    return f"sensor:{sensor_id}:response"
+
+
+def version_key(sensor_id):
+    return f"sensor:{sensor_id}:version"
+
+
+def build(sensor_id, blob):
+    """The cache entry for an encoded payload: {"digest": sha256 of the JSON body, "body": gzipped body}."""
+    body = series.render_response(sensor_id, blob)
+    return {
+        "digest": hashlib.sha256(body).hexdigest(),
+        "body": gzip.compress(body, GZIP_LEVEL, mtime=0),
+    }
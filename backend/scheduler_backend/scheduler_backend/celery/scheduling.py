@@ -0,0 +1,121 @@
+# scheduling.py
+# The per-sensor refresh schedule shared with the main project
+# (sensor_data/scheduling.py), through the same cache keys. Every refresh, by
+# either project, records the sensor's schedule state under state_key(), and a
+# planned fetch is claimed once under dispatch_key() (per planned time), so the
+# two schedulers never both fetch a sensor for the same planned fetch.
+# plan() is the main project's: the next fetch is planned GRACE seconds after
+# the sensor's expected next point (newest + cadence), never sooner than its
+# demand interval from the registry, backing off exponentially (up to
+# max_delay(), before the cached payload expires) while it is late, offline or
+# failing. A fetch skipped because
+# the upstream circuit was open is planned again once the breaker may probe.
+# This project fetches in batches, so it only claims the sensors already due
+# when it runs.
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+STATE_TIMEOUT = 24 * 60 * 60
+DISPATCH_TIMEOUT = 5 * 60  # seconds after its planned time a lost fetch is claimed again
+CADENCE_POINTS = 32  # newest points the cadence is estimated from
+REFRESH_INTERVAL = getattr(settings, "SENSOR_REFRESH_INTERVAL", 60)
+REFRESH_GRACE = getattr(settings, "SENSOR_REFRESH_GRACE", 15)
+REFRESH_JITTER = getattr(settings, "SENSOR_REFRESH_JITTER", 20)
+MAX_BACKOFF = getattr(settings, "SENSOR_MAX_BACKOFF", 30 * 60)
+BREAKER_RESET_TIMEOUT = getattr(settings, "SENSOR_BREAKER_RESET_TIMEOUT", 60)
+CACHE_TIMEOUT = getattr(settings, "CACHE_TIMEOUT", 1500)  # of the cached payloads, as in tasks.py
+EXPIRY_MARGIN = 60  # seconds a planned fetch comes at least before the cached payload expires
+
+
+def state_key(sensor_id):
+    return f"sensor:{sensor_id}:schedule"
+
+
+def dispatch_key(sensor_id, next_fetch):
+    return f"sensor:{sensor_id}:dispatched:{int(next_fetch)}"
+
+
+def estimate_cadence(times):
+    """Median gap in seconds between the newest CADENCE_POINTS timestamps (newest first), or None."""
+    newest = times[:CADENCE_POINTS]
+    gaps = [newer - older for newer, older in zip(newest, newest[1:]) if newer > older]
+    return statistics.median(gaps) if gaps else None
+
+
+def max_delay():
+    """The longest delay before a fetch, jitter included, that still finds the sensor's payload cached."""
+    return min(MAX_BACKOFF, CACHE_TIMEOUT - REFRESH_JITTER - EXPIRY_MARGIN)
+
+
+def plan(state, outcome, times, interval, now):
+    """The schedule state after a refresh with `outcome` that left the points at `times` cached.
+
+    `times` is None unless the refresh changed the cached payload.
+    """
+    state = dict(state or {})
+    if outcome == "deferred":
+        # Not fetched, the upstream circuit was open: retry once it lets probes through
+        delay = BREAKER_RESET_TIMEOUT
+    elif outcome == "failed":
+        state["failures"] = state.get("failures", 0) + 1
+        delay = REFRESH_INTERVAL * 2 ** (state["failures"] - 1)
+    else:
+        state["failures"] = 0
+        if times and times[0] > state.get("newest", 0):
+            state["cadence"] = estimate_cadence(times) or state.get("cadence")
+            state["newest"] = times[0]
+            state["misses"] = 0
+        cadence = state.get("cadence") or REFRESH_INTERVAL
+        expected = state["newest"] + cadence if "newest" in state else now
+        if now >= expected + REFRESH_GRACE:
+            # No new point although one was due: late or offline
+            state["misses"] = state.get("misses", 0) + 1
+            delay = cadence * 2 ** state["misses"]
+        else:
+            delay = expected + REFRESH_GRACE - now
+        delay = max(delay, interval)
+    delay = min(delay, max_delay())
+    state["next_fetch"] = now + delay + random.uniform(0, REFRESH_JITTER)
+    return state
+
+
+def claim_due(entries):
+    """The sensors of `entries` whose next fetch is due, each claimed for its planned time; in priority order.
+
+    Sensors without a schedule yet are due at once.
+    """
+    now = time.time()
+    states = cache.get_many([state_key(sensor_id) for sensor_id in entries])
+    due = []
+    for sensor_id in entries:
+        state = states.get(state_key(sensor_id))
+        planned = 0 if state is None else state["next_fetch"]
+        if planned <= now and cache.add(dispatch_key(sensor_id, planned), True, DISPATCH_TIMEOUT):
+            due.append(sensor_id)
+    return due
+
+
+def record_outcomes(outcomes, intervals, times):
+    """Plans the next fetch of every refreshed sensor in one round trip each way.
+
+    `outcomes` maps sensor IDs to "changed", "unchanged", "failed" or
+    "deferred", `intervals` to their demand intervals and `times` the changed
+    ones to the timestamps (newest first) of their cached points.
+    """
+    if not outcomes:
+        return {}
+    now = time.time()
+    keys = {sensor_id: state_key(sensor_id) for sensor_id in outcomes}
+    states = cache.get_many(list(keys.values()))
+    planned = {
+        keys[sensor_id]: plan(
+            states.get(keys[sensor_id]), outcome, times.get(sensor_id), intervals.get(sensor_id, REFRESH_INTERVAL), now,
+        )
+        for sensor_id, outcome in outcomes.items()
+    }
+    cache.set_many(planned, STATE_TIMEOUT)
+    return planned
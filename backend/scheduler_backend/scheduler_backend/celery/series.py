@@ -0,0 +1,160 @@
+# series.py
+# Compact columnar encoding of the cached sensor series.
+# A cached payload (the upstream envelope plus its points, newest first) is
+# stored as MAGIC followed by a zstd frame holding, little-endian:
+#     uint32 envelope length, envelope as JSON
+#     uint32 point count n
+#     int64  newest timestamp (epoch seconds)
+#     int32  n - 1 gaps between consecutive timestamps, in seconds
+#     float32 n values per metric, in POINT_FIELDS order (NaN where missing)
+# The format is shared with sensor_data/series.py in the main project.
+# render_response() builds the sensor_data_api body from it, byte for byte as
+# the main project does, so responses.py can cache it pre-serialized.
+import json
+import math
+import struct
+import sys
+import time
+from array import array
+from typing import NamedTuple
+
+import zstandard
+
+MAGIC = b"SC1"
+ZSTD_LEVEL = 3
+
+_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+class SensorPoint(NamedTuple):
+    timestamp: float  # seconds since the epoch
+    temperature: float | None
+    humidity: float | None
+    pressure: float | None
+    soilMoisture20: float | None
+    soilMoisture5: float | None
+    soilTemperature: float | None
+    vcc: float | None
+
+
+POINT_FIELDS = SensorPoint._fields[1:]
+
+
+def _pack(typecode, values):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode, data, offset, count):
+    unpacked = array(typecode)
+    end = offset + count * unpacked.itemsize
+    unpacked.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked, end
+
+
+def is_encoded(value):
+    return isinstance(value, bytes) and value.startswith(MAGIC)
+
+
+def encode(envelope, points):
+    """Encodes an envelope dict and a newest-first list of SensorPoints."""
+    envelope_json = json.dumps(envelope).encode()
+    times = [round(point.timestamp) for point in points]
+    parts = [
+        struct.pack("<I", len(envelope_json)), envelope_json,
+        struct.pack("<Iq", len(points), times[0] if times else 0),
+        _pack("i", [newer - older for newer, older in zip(times, times[1:])]),
+    ]
+    nan = math.nan
+    for index in range(1, len(SensorPoint._fields)):
+        parts.append(_pack("f", [nan if point[index] is None else point[index] for point in points]))
+    return MAGIC + _compressor.compress(b"".join(parts))
+
+
+def _columns(blob):
+    if not is_encoded(blob):
+        raise ValueError("Not an encoded sensor series")
+    data = _decompressor.decompress(blob[len(MAGIC):])
+    (envelope_length,) = struct.unpack_from("<I", data, 0)
+    offset = 4 + envelope_length
+    envelope = json.loads(data[4:offset])
+    count, newest = struct.unpack_from("<Iq", data, offset)
+    gaps, offset = _unpack("i", data, offset + 12, max(count - 1, 0))
+    times = [newest] * count
+    for i, gap in enumerate(gaps, 1):
+        times[i] = times[i - 1] - gap
+    columns = []
+    for _ in POINT_FIELDS:
+        column, offset = _unpack("f", data, offset, count)
+        columns.append(column)
+    return envelope, times, columns
+
+
+def newest(blob):
+    """The newest point of an encoded payload as a dict (timestamp and POINT_FIELDS), or None without points."""
+    _, times, columns = _columns(blob)
+    if not times:
+        return None
+    # float32 holds ~7 significant digits; more would be representation noise
+    values = (None if column[0] != column[0] else float("%.7g" % column[0]) for column in columns)
+    return {"timestamp": times[0], **dict(zip(POINT_FIELDS, values))}
+
+
+def decode(blob):
+    """Returns (envelope, points) from an encoded payload, points as SensorPoints."""
+    envelope, times, columns = _columns(blob)
+    points = [
+        SensorPoint(float(timestamp), *(None if value != value else value for value in values))
+        for timestamp, *values in zip(times, *columns)
+    ]
+    return envelope, points
+
+
+def _json_value(value):
+    # As the upstream sends them: strings, "NaN" where missing. float32 holds
+    # ~7 significant digits; more would print representation noise
+    return '"%.7g"' % value if math.isfinite(value) else '"NaN"'
+
+
+def _format_column(column):
+    # Sensor readings repeat a lot, so each distinct value is formatted once
+    values = column.tolist()
+    formatted = {value: _json_value(value) for value in set(values)}
+    return [formatted[value] for value in values]
+
+
+_POINT_TEMPLATE = '{"esmcTime":"%sT%s:%sZ",' + ",".join(f'"{field}":%s' for field in POINT_FIELDS) + "}"
+_HOURS = [f"{hour:02d}" for hour in range(24)]
+_MINUTES_SECONDS = [f"{second // 60:02d}:{second % 60:02d}" for second in range(3600)]
+
+
+def _format_times(times):
+    """Splits epoch seconds into (date, hour, minutes:seconds) strings for _POINT_TEMPLATE."""
+    dates, hours, rest = [], [], []
+    day_strings = {}
+    for timestamp in times:
+        day, second = divmod(timestamp, 86400)
+        date = day_strings.get(day)
+        if date is None:
+            date = day_strings[day] = time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+        hour, second = divmod(second, 3600)
+        dates.append(date)
+        hours.append(_HOURS[hour])
+        rest.append(_MINUTES_SECONDS[second])
+    return dates, hours, rest
+
+
+def render_response(sensor_id, blob):
+    """The sensor_data_api body ({"sensor_id": ..., "data": payload}) for an encoded payload, as bytes."""
+    envelope, times, columns = _columns(blob)
+    columns = [_format_column(column) for column in columns]
+    points = ",".join(map(_POINT_TEMPLATE.__mod__, zip(*_format_times(times), *columns)))
+    fields = json.dumps(envelope)[1:-1]
+    return (
+        f'{{"sensor_id":{json.dumps(sensor_id)},"data":{{{fields}{"," if fields else ""}"points":[{points}]}}}}'
+    ).encode()
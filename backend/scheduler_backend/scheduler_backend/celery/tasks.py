@@ -1,49 +1,182 @@
 # tasks.py
 # This task is to update every sensor data according to the list
 # It should be triggered by beater
-import requests
-import json
 import logging
+import time
 
-from celery import shared_task, group
+from celery import shared_task
 from django.conf import settings
 from django.core.cache import cache  
-from .sensor_ids import SENSOR_LIST  # import sensor list[........]
+from . import breaker, latest, registry, responses, scheduling, series, upstream
+from .upstream import UNCHANGED, fetch_all
 
 logger = logging.getLogger(__name__)
 
 CACHE_TIMEOUT = getattr(settings, "CACHE_TIMEOUT", 1500)  # 25 min, then data expired and deleted
+FETCH_TIMEOUT = getattr(settings, "SENSOR_FETCH_TIMEOUT", upstream.FETCH_TIMEOUT)
+FETCH_CONCURRENCY = getattr(settings, "SENSOR_FETCH_CONCURRENCY", upstream.FETCH_CONCURRENCY)
+FETCH_RATE_PER_HOST = getattr(settings, "SENSOR_FETCH_RATE_PER_HOST", upstream.FETCH_RATE_PER_HOST)
+DELTA_SYNC = getattr(settings, "SENSOR_DELTA_SYNC", True)  # fetch only points newer than the cached ones
+CACHE_MAX_POINTS = getattr(settings, "SENSOR_CACHE_MAX_POINTS", 2000)  # newest points kept per sensor
+SOFT_TTL = getattr(settings, "SENSOR_SOFT_TTL", 180)  # data older than this is served stale and revalidated
+
+def sensor_key(sensor_id):
+    return f"sensor:{sensor_id}"
+
+
+def validators_key(sensor_id):
+    return f"sensor:{sensor_id}:validators"
 
-@shared_task
-def fetch_and_cache_sensor(sensor_id):
-    url = (
-        "https://esmc.uiowa.edu/esmc_services/data_base/"
-        f"querySensorInDB_working_reverse.php?sensorID={sensor_id}"
-    )
 
-    try:
-        response = requests.get(url, timeout=10, verify=False) 
-        if response.status_code == 200:
-            data = response.json()
-            cache_key = f"sensor:{sensor_id}"
-            cache.set(cache_key, data, CACHE_TIMEOUT)
-            logger.info(f"{sensor_id} data cached successfully.")
-            return f"{sensor_id} cached successfully"
+def fresh_key(sensor_id):
+    return f"sensor:{sensor_id}:fresh"
+
+
+def store_results(results):
+    """Writes fetch results to the cache and returns the number of sensors whose data changed.
+
+    Changed payloads, their pre-serialized responses and every sensor's
+    validators go out in one set_many, the version keys last. For unchanged
+    sensors only the TTL of the cached payload and response is extended; if
+    that payload has already expired, its validators are dropped so the next
+    refresh downloads it in full. Every sensor whose data was confirmed is
+    marked fresh for SOFT_TTL seconds (the main project serves data past that
+    as stale while it refreshes it). The newest point of every changed payload
+    is recorded as the sensor's latest reading (see latest.py).
+    """
+    writes, versions, fresh, newest = {}, {}, {}, {}
+    for sensor_id, (data, validators) in results.items():
+        if data is UNCHANGED:
+            if not cache.touch(sensor_key(sensor_id), CACHE_TIMEOUT):
+                cache.delete(validators_key(sensor_id))
+                continue
+            if not (cache.touch(responses.response_key(sensor_id), CACHE_TIMEOUT)
+                    and cache.touch(responses.version_key(sensor_id), CACHE_TIMEOUT)):
+                payload = cache.get(sensor_key(sensor_id))
+                if series.is_encoded(payload):
+                    response = responses.build(sensor_id, payload)
+                    writes[responses.response_key(sensor_id)] = response
+                    versions[responses.version_key(sensor_id)] = response["digest"]
         else:
-            logger.error(f"{sensor_id} fetch failed with status {response.status_code}")
-            return f"{sensor_id} fetch failed: {response.status_code}"
-    except requests.RequestException as e:
-        logger.error(f"{sensor_id} fetch exception: {e}")
-        return f"{sensor_id} fetch exception: {str(e)}"
+            payload = series.encode(*data)
+            response = responses.build(sensor_id, payload)
+            writes[sensor_key(sensor_id)] = payload
+            newest[sensor_id] = series.newest(payload)
+            writes[responses.response_key(sensor_id)] = response
+            versions[responses.version_key(sensor_id)] = response["digest"]
+        writes[validators_key(sensor_id)] = validators
+        fresh[fresh_key(sensor_id)] = True
+    writes.update(versions)
+    if writes:
+        cache.set_many(writes, CACHE_TIMEOUT)
+        cache.set_many(fresh, SOFT_TTL)
+    latest.record(newest)
+    return sum(data is not UNCHANGED for data, _ in results.values())
+
+
+def merge_deltas(results, known):
+    """Prepends delta-synced points to the cached payloads, keeping the newest CACHE_MAX_POINTS.
+
+    A sensor whose cached payload expired (or predates the series encoding)
+    although it had a watermark is left out and loses its validators, so the
+    next refresh syncs it from scratch.
+    """
+    incremental = [
+        sensor_id for sensor_id, (data, _) in results.items()
+        if data is not UNCHANGED and (known.get(sensor_id) or {}).get("watermark")
+    ]
+    cached = cache.get_many([sensor_key(sensor_id) for sensor_id in incremental])
+    merged = {}
+    for sensor_id, (data, validators) in results.items():
+        if sensor_id in incremental:
+            previous = cached.get(sensor_key(sensor_id))
+            if not series.is_encoded(previous):
+                cache.delete(validators_key(sensor_id))
+                continue
+            (envelope, points), (cached_envelope, cached_points) = data, series.decode(previous)
+            data = ({**cached_envelope, **envelope}, (points + cached_points)[:CACHE_MAX_POINTS])
+        merged[sensor_id] = (data, validators)
+    return merged
+
+
+def refresh(sensor_ids, known, **options):
+    """Fetches the given sensors and stores the results; returns (fetched results, number changed).
+
+    Nothing is fetched while the shared upstream circuit breaker is open (see
+    breaker.py); the results are then None.
+    """
+    if not sensor_ids:
+        return {}, 0
+    if not breaker.allow():
+        return None, 0
+    started = time.monotonic()
+    results = fetch_all(sensor_ids, validators=known, max_points=CACHE_MAX_POINTS, delta=DELTA_SYNC, **options)
+    breaker.record(bool(results), time.monotonic() - started)
+    if DELTA_SYNC:
+        results = merge_deltas(results, known)
+    return results, store_results(results)
+
+
+def record_schedule(sensor_ids, results, entries):
+    """Plans the next fetch of the given sensors from what their refresh returned (see scheduling.py)."""
+    if results is None:
+        outcomes = dict.fromkeys(sensor_ids, "deferred")
+    else:
+        outcomes = {
+            sensor_id: "failed" if sensor_id not in results
+            else "unchanged" if results[sensor_id][0] is UNCHANGED else "changed"
+            for sensor_id in sensor_ids
+        }
+    times = {
+        sensor_id: [point.timestamp for point in results[sensor_id][0][1]]
+        for sensor_id, outcome in outcomes.items() if outcome == "changed"
+    }
+    intervals = {sensor_id: registry.interval(entries, sensor_id) for sensor_id in sensor_ids}
+    scheduling.record_outcomes(outcomes, intervals, times)
 
 
-# This is to put all sensor update in parallel task
-# Equivelent to fetch_and_cache_sensor.s("a"), fetch_and_cache_sensor.s("b"), ....
 @shared_task
-def refresh_all_sensors():
+def fetch_and_cache_sensor(sensor_id):
+    results, changed = refresh([sensor_id], {sensor_id: cache.get(validators_key(sensor_id))}, timeout=FETCH_TIMEOUT)
+    record_schedule([sensor_id], results, registry.load())
+    if results is None:
+        return f"{sensor_id} deferred, upstream circuit open"
+    if sensor_id not in results:
+        return f"{sensor_id} fetch failed"
+    if changed:
+        logger.info(f"{sensor_id} data cached successfully.")
+        return f"{sensor_id} cached successfully"
+    return f"{sensor_id} unchanged"
+
 
-    tasks_group = group(
-        fetch_and_cache_sensor.s(sensor_id) for sensor_id in SENSOR_LIST
+# Refreshes every sensor in one task: the fetches run concurrently over one
+# keep-alive session (see upstream.py) and all results go to Redis in a single
+# pipelined set_many, instead of one Celery task and one cache round trip per sensor.
+# Sensors whose data did not change only get their TTL extended; with delta sync
+# only points newer than the cached ones are downloaded and merged in.
+# Only the sensors of the registry whose next fetch is due are claimed and
+# fetched, and every refresh plans the next one, in the schedule shared with the
+# main project (see scheduling.py). While the upstream circuit is open nothing
+# is claimed or fetched; once it is half-open the whole batch is the probe.
+@shared_task
+def refresh_all_sensors():
+    if breaker.state() == "open":
+        logger.info("Upstream circuit open, no sensors refreshed.")
+        return {"cached": 0, "unchanged": 0, "failed": [], "circuit": "open"}
+    entries = registry.load()
+    sensor_ids = scheduling.claim_due(entries)
+    known = cache.get_many([validators_key(sensor_id) for sensor_id in sensor_ids])
+    results, changed = refresh(
+        sensor_ids,
+        {sensor_id: known.get(validators_key(sensor_id)) for sensor_id in sensor_ids},
+        concurrency=FETCH_CONCURRENCY,
+        rate_per_host=FETCH_RATE_PER_HOST,
+        timeout=FETCH_TIMEOUT,
     )
-    result = tasks_group.apply_async()
-    return result
+    record_schedule(sensor_ids, results, entries)
+    if results is None:
+        logger.info(f"Upstream circuit open, {len(sensor_ids)} due sensors deferred.")
+        return {"cached": 0, "unchanged": 0, "failed": [], "circuit": "open"}
+    failed = [sensor_id for sensor_id in sensor_ids if sensor_id not in results]
+    logger.info(f"Refreshed {len(results)}/{len(sensor_ids)} due sensors, {changed} changed.")
+    return {"cached": changed, "unchanged": len(results) - changed, "failed": failed}
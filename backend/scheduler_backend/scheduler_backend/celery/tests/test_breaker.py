@@ -0,0 +1,58 @@
+import time
+
+import pytest
+from django.core.cache import cache
+
+from scheduler_backend.celery import breaker
+from scheduler_backend.celery import tasks
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def fail(times):
+    for _ in range(times):
+        breaker.record(False, 0.1)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    fail(breaker.FAILURE_THRESHOLD - 1)
+    assert breaker.state() == "closed"
+    breaker.record(True, 0.1)
+    fail(breaker.FAILURE_THRESHOLD - 1)
+    assert breaker.state() == "closed"  # the success reset the count
+    fail(1)
+    assert breaker.state() == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    cache.set(breaker.OPENED_KEY, time.time() - breaker.RESET_TIMEOUT - 1)
+    assert breaker.state() == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record(True, 0.1)
+    assert breaker.state() == "closed"
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_the_breaker_again():
+    cache.set(breaker.OPENED_KEY, time.time() - breaker.RESET_TIMEOUT - 1)
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state() == "open"
+    assert cache.get(breaker.PROBE_KEY) is None
+
+
+def test_refresh_records_the_batch_outcome(monkeypatch):
+    monkeypatch.setattr(tasks, "fetch_all", lambda sensor_ids, **options: {})
+    for _ in range(breaker.FAILURE_THRESHOLD):
+        assert tasks.refresh(["abc"], {}) == ({}, 0)
+    assert breaker.state() == "open"
+    assert tasks.refresh(["abc"], {}) == (None, 0)
+    assert cache.get(breaker.metric_key("rejected")) == 1
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from django.core.cache import cache
+
+from scheduler_backend.celery import scheduling
+from scheduler_backend.celery import tasks
+from scheduler_backend.celery.series import SensorPoint
+from scheduler_backend.celery.upstream import UNCHANGED
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_keys_are_the_main_projects():
+    # sensor_data/scheduling.py reads and writes the same keys
+    assert scheduling.state_key("abc") == "sensor:abc:schedule"
+    assert scheduling.dispatch_key("abc", 1746352800.7) == "sensor:abc:dispatched:1746352800"
+
+
+def test_due_sensors_are_claimed_once_per_planned_fetch():
+    now = time.time()
+    cache.set(scheduling.state_key("due"), {"next_fetch": now - 5})
+    cache.set(scheduling.state_key("later"), {"next_fetch": now + 600})
+    entries = {"new": {"interval": 60}, "due": {"interval": 60}, "later": {"interval": 60}}
+
+    assert scheduling.claim_due(entries) == ["new", "due"]
+    assert scheduling.claim_due(entries) == []
+
+
+def test_fetch_claimed_by_the_main_project_is_skipped():
+    planned = time.time() - 5
+    cache.set(scheduling.state_key("abc"), {"next_fetch": planned})
+    cache.add(scheduling.dispatch_key("abc", planned), True)
+    assert scheduling.claim_due({"abc": {"interval": 60}}) == []
+
+
+def test_plan_follows_the_reporting_cadence():
+    now = 1_000_000
+    times = [now - 10 - 300 * i for i in range(10)]  # a point every 5 minutes, the newest 10 s ago
+    state = scheduling.plan(None, "changed", times, 60, now)
+    assert state["cadence"] == 300
+    expected = now - 10 + 300 + scheduling.REFRESH_GRACE
+    assert expected <= state["next_fetch"] <= expected + scheduling.REFRESH_JITTER
+
+    failed = scheduling.plan(state, "failed", None, 60, now)
+    assert failed["failures"] == 1
+    assert failed["next_fetch"] - now <= scheduling.REFRESH_INTERVAL + scheduling.REFRESH_JITTER
+
+
+def test_backoff_ends_before_the_cached_payload_expires():
+    now = 1_000_000
+    state = None
+    for _ in range(10):
+        state = scheduling.plan(state, "failed", None, 60, now)
+    assert state["next_fetch"] - now < scheduling.CACHE_TIMEOUT
+    assert scheduling.max_delay() + scheduling.REFRESH_JITTER < scheduling.CACHE_TIMEOUT
+
+
+def test_refresh_records_the_shared_schedule(monkeypatch):
+    now = time.time()
+    points = [SensorPoint(now - 60 * i, 20.0, None, None, None, None, None, None) for i in range(5)]
+    results = {"changed": ({"status": 200}, points), "same": UNCHANGED}
+    monkeypatch.setattr(tasks.registry, "load", lambda: {
+        "changed": {"interval": 60}, "same": {"interval": 120}, "down": {"interval": 60},
+    })
+    monkeypatch.setattr(tasks, "fetch_all", lambda sensor_ids, **options: {
+        sensor_id: (results[sensor_id], {"digest": sensor_id}) for sensor_id in sensor_ids if sensor_id in results
+    })
+    monkeypatch.setattr(tasks.latest, "record", lambda readings: None)
+    monkeypatch.setattr(tasks, "DELTA_SYNC", False)
+
+    summary = tasks.refresh_all_sensors()
+
+    assert summary["failed"] == ["down"]
+    states = {sensor_id: cache.get(scheduling.state_key(sensor_id)) for sensor_id in ("changed", "same", "down")}
+    assert states["changed"]["cadence"] == 60
+    assert states["changed"]["newest"] == points[0].timestamp
+    assert states["same"]["next_fetch"] >= now + 120
+    assert states["down"]["failures"] == 1
+    # Nothing is due again before its planned fetch
+    assert tasks.refresh_all_sensors()["failed"] == []
+
+
+def test_fetches_the_breaker_refuses_are_deferred(monkeypatch):
+    monkeypatch.setattr(tasks.registry, "load", lambda: {"abc": {"interval": 60}})
+    monkeypatch.setattr(tasks.breaker, "allow", lambda: False)
+
+    assert tasks.refresh_all_sensors()["circuit"] == "open"
+    state = cache.get(scheduling.state_key("abc"))
+    assert "failures" not in state
+    assert state["next_fetch"] >= time.time() + scheduling.BREAKER_RESET_TIMEOUT - 1
@@ -0,0 +1,70 @@
+import pytest
+from django.core.cache import cache
+
+from scheduler_backend.celery import series
+from scheduler_backend.celery import tasks
+from scheduler_backend.celery.series import SensorPoint
+from scheduler_backend.celery.upstream import UNCHANGED
+
+NEWEST = 1746352800
+
+
+def points(newest, count):
+    return [SensorPoint(float(newest - 60 * i), float(i), None, None, None, None, None, None) for i in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache(monkeypatch):
+    monkeypatch.setattr(tasks.latest, "record", lambda readings: None)
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_merge_deltas_prepends_new_points_to_the_cached_payload(monkeypatch):
+    monkeypatch.setattr(tasks, "CACHE_MAX_POINTS", 10)
+    cache.set(tasks.sensor_key("abc"), series.encode({"status": 200, "message": "old"}, points(NEWEST, 10)))
+    known = {"abc": {"watermark": "2025-05-04T10:00:00+00:00"}}
+    results = {"abc": (({"message": "Success"}, points(NEWEST + 180, 3)), {"watermark": "new"})}
+
+    merged = tasks.merge_deltas(results, known)
+
+    (envelope, merged_points), validators = merged["abc"]
+    assert envelope == {"status": 200, "message": "Success"}
+    assert [p.timestamp for p in merged_points] == [float(NEWEST + 180 - 60 * i) for i in range(10)]
+    assert validators == {"watermark": "new"}
+
+
+def test_merge_deltas_keeps_first_syncs_and_unchanged_sensors():
+    results = {
+        "first": (({}, points(NEWEST, 3)), {"watermark": "w"}),
+        "same": (UNCHANGED, {"watermark": "w"}),
+    }
+    assert tasks.merge_deltas(results, {"same": {"watermark": "w"}}) == results
+
+
+def test_merge_deltas_drops_sensors_whose_cached_payload_expired():
+    cache.set(tasks.validators_key("abc"), {"watermark": "w"})
+    results = {"abc": (({}, points(NEWEST, 3)), {"watermark": "new"})}
+
+    assert tasks.merge_deltas(results, {"abc": {"watermark": "w"}}) == {}
+    # Synced from scratch next time
+    assert cache.get(tasks.validators_key("abc")) is None
+
+
+def test_store_results_writes_changed_and_touches_unchanged_payloads():
+    cache.set(tasks.sensor_key("same"), series.encode({}, points(NEWEST, 2)))
+    cache.set(tasks.validators_key("gone"), {"digest": "x"})
+    results = {
+        "changed": (({"status": 200}, points(NEWEST, 2)), {"digest": "a"}),
+        "same": (UNCHANGED, {"digest": "b"}),
+        "gone": (UNCHANGED, {"digest": "x"}),
+    }
+
+    assert tasks.store_results(results) == 1
+    assert series.decode(cache.get(tasks.sensor_key("changed"))) == ({"status": 200}, points(NEWEST, 2))
+    assert cache.get(tasks.validators_key("changed")) == {"digest": "a"}
+    assert cache.get(tasks.validators_key("same")) == {"digest": "b"}
+    assert cache.get(tasks.fresh_key("same")) is True
+    # An unchanged sensor whose payload expired is downloaded in full next time
+    assert cache.get(tasks.validators_key("gone")) is None
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+
+import requests
+
+from scheduler_backend.celery import upstream
+from scheduler_backend.celery.upstream import UNCHANGED
+
+NEWEST = datetime(2025, 5, 4, 10, tzinfo=UTC)
+
+
+def upstream_body(newest, count):
+    """An ESMC-style payload of `count` points a minute apart, newest first."""
+    return json.dumps({
+        "status": 200,
+        "message": "Success",
+        "points": [
+            {
+                "esmcTime": (newest - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "temperature": str(i),
+                "soilTemperature": "NaN",
+            }
+            for i in range(count)
+        ],
+    }).encode()
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+        self.consumed = 0
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            self.consumed = start + chunk_size
+            yield self.content[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Answers every sensor from `responses` (sensor_id -> FakeResponse or exception), recording the requests."""
+
+    def __init__(self, responses, delay=0):
+        self.responses = responses
+        self.delay = delay
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, **kwargs):
+        sensor_id = url.rsplit("=", 1)[1]
+        with self._lock:
+            self.requests.append((sensor_id, headers))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        response = self.responses[sensor_id]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_fetch_all_fetches_concurrently_and_drops_failures():
+    responses = {f"s{i}": FakeResponse(200, upstream_body(NEWEST, 3)) for i in range(8)}
+    responses["s7"] = FakeResponse(500)
+    responses["s6"] = requests.ConnectionError("refused")
+    session = FakeSession(responses, delay=0.1)
+
+    started = time.monotonic()
+    results = upstream.fetch_all(list(responses), session=session, concurrency=8, rate_per_host=0)
+
+    assert time.monotonic() - started < 0.5  # eight requests of 0.1 s, not one after the other
+    assert session.max_in_flight > 1
+    assert sorted(results) == [f"s{i}" for i in range(6)]
+    (envelope, points), validators = results["s0"]
+    assert envelope == {"status": 200, "message": "Success"}
+    assert [p.temperature for p in points] == [0.0, 1.0, 2.0]
+    assert points[0].soilTemperature is None
+    assert points[0].timestamp == NEWEST.timestamp()
+    assert validators["digest"] == upstream.body_digest(responses["s0"].content)
+
+
+def test_fetch_is_conditional_on_the_previous_validators():
+    body = upstream_body(NEWEST, 3)
+    session = FakeSession({
+        "etag": FakeResponse(304),
+        "same": FakeResponse(200, body),
+    })
+    validators = {
+        "etag": {"etag": '"v1"', "last_modified": "Sun, 04 May 2025 10:00:00 GMT"},
+        "same": {"digest": upstream.body_digest(body)},
+    }
+
+    results = upstream.fetch_all(["etag", "same"], session=session, validators=validators, rate_per_host=0)
+
+    assert results["etag"] == (UNCHANGED, validators["etag"])
+    assert results["same"][0] is UNCHANGED
+    headers = dict(session.requests)
+    assert headers["etag"] == {"If-None-Match": '"v1"', "If-Modified-Since": "Sun, 04 May 2025 10:00:00 GMT"}
+    assert headers["same"] == {}
+
+
+def test_sync_sensor_reads_only_points_past_the_watermark():
+    watermark = NEWEST - timedelta(minutes=3)
+    response = FakeResponse(200, upstream_body(NEWEST, 20000), {"ETag": '"v2"'})
+    validators = {"etag": '"v1"', "watermark": watermark.isoformat()}
+
+    payload, new_validators = upstream.sync_sensor(FakeSession({"abc": response}), "abc", validators=validators)
+
+    envelope, points = payload
+    assert [p.timestamp for p in points] == [(NEWEST - timedelta(minutes=i)).timestamp() for i in range(3)]
+    assert new_validators["watermark"] == NEWEST.isoformat()
+    assert new_validators["etag"] == '"v2"'
+    # The rest of the body is never downloaded
+    assert response.consumed < len(response.content) // 10
+
+
+def test_sync_sensor_without_new_points_is_unchanged():
+    validators = {"watermark": NEWEST.isoformat()}
+    session = FakeSession({"abc": FakeResponse(200, upstream_body(NEWEST, 50), {"ETag": '"v3"'})})
+
+    payload, new_validators = upstream.sync_sensor(session, "abc", validators=validators)
+
+    assert payload is UNCHANGED
+    assert new_validators == {"watermark": NEWEST.isoformat(), "etag": '"v3"', "last_modified": None}
+
+
+def test_fetch_all_delta_syncs_and_caps_points():
+    session = FakeSession({"abc": FakeResponse(200, upstream_body(NEWEST, 500))})
+    results = upstream.fetch_all(["abc"], session=session, max_points=100, delta=True, rate_per_host=0)
+    (_, points), validators = results["abc"]
+    assert len(points) == 100
+    assert validators["watermark"] == NEWEST.isoformat()
@@ -0,0 +1,256 @@
+# upstream.py
+# Concurrent fetching of sensor payloads from the ESMC endpoint.
+# One refresh fetches every sensor from a small thread pool over a shared
+# keep-alive session, instead of one Celery task (and one TCP/TLS handshake)
+# per sensor.
+# Each fetch is conditional: the ETag/Last-Modified and body digest of the
+# previous response are sent back / compared, so an unchanged payload comes
+# back as UNCHANGED without being parsed.
+# In delta-sync mode (max_points set) the response is parsed as it streams in
+# and abandoned at the first point not newer than the sensor's watermark, so
+# only the new points are downloaded and returned.
+# Points are parsed one at a time into compact SensorPoint records (numbers as
+# floats, "NaN" as None); parsing stops after max_points points. Payloads are
+# returned as (envelope, points) pairs, which the tasks store with series.encode.
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .jsonstream import JSONStream, iter_array, iter_object
+from .series import POINT_FIELDS, SensorPoint
+
+logger = logging.getLogger(__name__)
+
+ESMC_URL = (
+    "https://esmc.uiowa.edu/esmc_services/data_base/"
+    "querySensorInDB_working_reverse.php?sensorID={sensor_id}"
+)
+FETCH_TIMEOUT = 10  # seconds, per request
+FETCH_CONCURRENCY = 16  # requests in flight at once
+FETCH_RATE_PER_HOST = 20.0  # requests started per second per host; 0 disables the limit
+STREAM_CHUNK_SIZE = 64 * 1024
+
+UNCHANGED = object()  # returned instead of a payload when the upstream data did not change
+
+
+class HostRateLimiter:
+    """Spaces out request starts per host so a refresh never bursts more than `rate` req/s at one server."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(pool_size=FETCH_CONCURRENCY):
+    """A requests session whose connection pool keeps one keep-alive connection per worker thread."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def conditional_headers(validators):
+    """If-None-Match / If-Modified-Since headers from the validators of the previous response."""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def body_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def parse_time(value):
+    """Epoch seconds of an esmcTime string (naive values are UTC), or None."""
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number  # NaN
+
+
+def to_point(raw):
+    """A SensorPoint from one upstream point object, or None if it has no valid esmcTime."""
+    timestamp = parse_time(raw.get("esmcTime")) if isinstance(raw, dict) else None
+    if timestamp is None:
+        return None
+    return SensorPoint(timestamp, *map(_number, map(raw.get, POINT_FIELDS)))
+
+
+def _chunks(content, size=STREAM_CHUNK_SIZE):
+    view = memoryview(content)
+    for start in range(0, len(view), size):
+        yield view[start:start + size].tobytes()
+
+
+def fetch_sensor(session, sensor_id, url_template=ESMC_URL, timeout=FETCH_TIMEOUT, limiter=None, validators=None,
+                 max_points=None):
+    """Fetches one sensor's payload conditionally.
+
+    Returns (payload, validators), where payload is UNCHANGED if the upstream
+    answered 304 or sent the same body as last time, or None on any failure.
+    The payload keeps at most `max_points` points.
+    `session` may be None for a one-off request outside a refresh.
+    """
+    validators = validators or {}
+    url = url_template.format(sensor_id=sensor_id)
+    if limiter:
+        limiter.wait(urlsplit(url).netloc)
+    try:
+        response = (session or requests).get(
+            url, headers=conditional_headers(validators), timeout=timeout, verify=False,
+        )
+        if response.status_code == 304:
+            return UNCHANGED, validators
+        if response.status_code != 200:
+            logger.error(f"{sensor_id} fetch failed with status {response.status_code}")
+            return None, validators
+        latest = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "digest": body_digest(response.content),
+        }
+        if latest["digest"] == validators.get("digest"):
+            return UNCHANGED, latest
+        envelope, points = read_points(_chunks(response.content), limit=max_points)
+        return (envelope, points), latest
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"{sensor_id} fetch exception: {e}")
+        return None, validators
+
+
+def read_points(chunks, newer_than=None, limit=None):
+    """Parses an upstream payload from byte chunks into (envelope, SensorPoints).
+
+    Points are read newest first; reading stops at the first point not after
+    `newer_than` (epoch seconds), or once `limit` points were read. Points
+    without a valid esmcTime are dropped. `envelope` holds the other top-level
+    fields seen up to then.
+    """
+    stream = JSONStream(chunks)
+    envelope, points = {}, []
+    for key in iter_object(stream):
+        if key != "points":
+            envelope[key] = stream.value()
+            continue
+        for raw in iter_array(stream):
+            point = to_point(raw)
+            if point is None:
+                continue
+            if newer_than is not None and point.timestamp <= newer_than:
+                return envelope, points
+            points.append(point)
+            if limit and len(points) >= limit:
+                return envelope, points
+    return envelope, points
+
+
+def sync_sensor(session, sensor_id, url_template=ESMC_URL, timeout=FETCH_TIMEOUT, limiter=None, validators=None,
+                max_points=None):
+    """Fetches only the points newer than the watermark in `validators`.
+
+    Returns (payload, validators) like fetch_sensor, where payload holds just
+    the new points (at most `max_points`) and is UNCHANGED if there are none.
+    The new validators carry the updated watermark.
+    """
+    validators = validators or {}
+    watermark = parse_time(validators.get("watermark"))
+    url = url_template.format(sensor_id=sensor_id)
+    if limiter:
+        limiter.wait(urlsplit(url).netloc)
+    try:
+        with (session or requests).get(
+            url, headers=conditional_headers(validators), timeout=timeout, verify=False, stream=True,
+        ) as response:
+            if response.status_code == 304:
+                return UNCHANGED, validators
+            if response.status_code != 200:
+                logger.error(f"{sensor_id} fetch failed with status {response.status_code}")
+                return None, validators
+            envelope, points = read_points(response.iter_content(STREAM_CHUNK_SIZE), watermark, max_points)
+            latest = {
+                **validators,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"{sensor_id} fetch exception: {e}")
+        return None, validators
+    if points:
+        latest["watermark"] = datetime.fromtimestamp(max(p.timestamp for p in points), timezone.utc).isoformat()
+    if not points and watermark is not None:
+        return UNCHANGED, latest
+    return (envelope, points), latest
+
+
+def fetch_all(
+    sensor_ids,
+    url_template=ESMC_URL,
+    concurrency=FETCH_CONCURRENCY,
+    rate_per_host=FETCH_RATE_PER_HOST,
+    timeout=FETCH_TIMEOUT,
+    session=None,
+    validators=None,
+    max_points=None,
+    delta=False,
+):
+    """Fetches every sensor concurrently.
+
+    `validators` maps sensor IDs to the validators returned by their previous
+    fetch. Returns {sensor_id: (payload, validators)} for the sensors that did
+    not fail; payload is UNCHANGED where the data is the same as last time.
+    Payloads hold at most `max_points` points. With `delta`, sensors are
+    delta-synced (see sync_sensor) and payloads hold only the new points.
+    """
+    validators = validators or {}
+    sensor_ids = list(sensor_ids)
+    if not sensor_ids:
+        return {}
+    limiter = HostRateLimiter(rate_per_host)
+
+    def fetch(sensor_id):
+        sync = sync_sensor if delta else fetch_sensor
+        return sync(session, sensor_id, url_template, timeout, limiter, validators.get(sensor_id), max_points)
+
+    own_session = session is None
+    session = session or make_session(concurrency)
+    try:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(sensor_ids))) as pool:
+            payloads = pool.map(fetch, sensor_ids)
+            results = dict(zip(sensor_ids, payloads))
+    finally:
+        if own_session:
+            session.close()
+    return {sensor_id: result for sensor_id, result in results.items() if result[0] is not None}
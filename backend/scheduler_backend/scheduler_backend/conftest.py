@@ -1,7 +1,5 @@
 import pytest
-
-from scheduler_backend.users.models import User
-from scheduler_backend.users.tests.factories import UserFactory
+from django.apps import apps
 
 
 @pytest.fixture(autouse=True)
@@ -9,6 +7,11 @@ def _media_storage(settings, tmpdir) -> None:
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
-@pytest.fixture
-def user(db) -> User:
-    return UserFactory()
+# The users app is not installed (see LOCAL_APPS), so its models cannot be imported
+if apps.is_installed("scheduler_backend.users"):
+    from scheduler_backend.users.models import User
+    from scheduler_backend.users.tests.factories import UserFactory
+
+    @pytest.fixture
+    def user(db) -> User:
+        return UserFactory()
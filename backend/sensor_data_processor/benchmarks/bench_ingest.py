@@ -0,0 +1,182 @@
+"""Compares rows/sec of the per-row ingestion path against the batched COPY path.
+
+Runs against a local Postgres inside a scratch schema, so it never touches the
+real sensor_readings / weekly_sensor_averages / sensor_latest tables:
+
+    python benchmarks/bench_ingest.py --database-url postgresql://localhost/sensors \
+        --sensors 50 --rows-per-sensor 200
+
+The per-row path mirrors process_sensor_data: one INSERT, one weekly-sums
+upsert, one rollup upsert, one latest-reading upsert and one commit per
+reading. Pass --connect-per-row to also pay for a new connection per reading,
+as the task did before pooling.
+"""
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sensor_data_processor.ingest import (  # noqa: E402
+    ingest_readings, insert_reading, upsert_latest, upsert_rollups, upsert_weekly_sums,
+)
+from sensor_data_processor.tasks import generate_sensor_batch  # noqa: E402
+
+SCHEMA = "ingest_bench"
+
+SCHEMA_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path TO {SCHEMA};
+CREATE TABLE sensor_readings (
+    id bigserial PRIMARY KEY,
+    timestamp timestamptz NOT NULL,
+    sensor_id varchar(50) NOT NULL,
+    temperature double precision,
+    pressure double precision,
+    humidity double precision,
+    vcc integer
+);
+CREATE INDEX ON sensor_readings (sensor_id, timestamp);
+CREATE INDEX ON sensor_readings (timestamp);
+CREATE INDEX ON sensor_readings (sensor_id);
+CREATE TABLE weekly_sensor_averages (
+    id bigserial PRIMARY KEY,
+    sensor_id varchar(50) NOT NULL,
+    year integer NOT NULL,
+    week_number integer NOT NULL,
+    sum_temperature double precision NOT NULL DEFAULT 0,
+    count_temperature integer NOT NULL DEFAULT 0,
+    sum_pressure double precision NOT NULL DEFAULT 0,
+    count_pressure integer NOT NULL DEFAULT 0,
+    sum_humidity double precision NOT NULL DEFAULT 0,
+    count_humidity integer NOT NULL DEFAULT 0,
+    sum_vcc double precision NOT NULL DEFAULT 0,
+    count_vcc integer NOT NULL DEFAULT 0,
+    datapoints integer NOT NULL DEFAULT 0,
+    calculation_timestamp timestamptz NOT NULL,
+    UNIQUE (sensor_id, year, week_number)
+);
+CREATE TABLE sensor_rollups (
+    id bigserial PRIMARY KEY,
+    sensor_id varchar(50) NOT NULL,
+    resolution varchar(5) NOT NULL,
+    bucket_start timestamptz NOT NULL,
+    count_temperature integer NOT NULL DEFAULT 0,
+    sum_temperature double precision NOT NULL DEFAULT 0,
+    sum_sq_temperature double precision NOT NULL DEFAULT 0,
+    min_temperature double precision,
+    max_temperature double precision,
+    count_pressure integer NOT NULL DEFAULT 0,
+    sum_pressure double precision NOT NULL DEFAULT 0,
+    sum_sq_pressure double precision NOT NULL DEFAULT 0,
+    min_pressure double precision,
+    max_pressure double precision,
+    count_humidity integer NOT NULL DEFAULT 0,
+    sum_humidity double precision NOT NULL DEFAULT 0,
+    sum_sq_humidity double precision NOT NULL DEFAULT 0,
+    min_humidity double precision,
+    max_humidity double precision,
+    count_vcc integer NOT NULL DEFAULT 0,
+    sum_vcc double precision NOT NULL DEFAULT 0,
+    sum_sq_vcc double precision NOT NULL DEFAULT 0,
+    min_vcc double precision,
+    max_vcc double precision,
+    datapoints integer NOT NULL DEFAULT 0,
+    updated_at timestamptz NOT NULL,
+    UNIQUE (sensor_id, resolution, bucket_start)
+);
+CREATE TABLE sensor_latest (
+    sensor_id varchar(50) PRIMARY KEY,
+    timestamp timestamptz NOT NULL,
+    temperature double precision,
+    humidity double precision,
+    pressure double precision,
+    soil_moisture_20 double precision,
+    soil_moisture_5 double precision,
+    soil_temperature double precision,
+    vcc double precision,
+    updated_at timestamptz NOT NULL
+);
+"""
+
+
+def connect(database_url):
+    conn = psycopg2.connect(database_url, options=f"-c search_path={SCHEMA}")
+    return conn
+
+
+def reset(database_url):
+    conn = psycopg2.connect(database_url)
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+    conn.commit()
+    conn.close()
+
+
+def run_per_row(database_url, readings, connect_per_row):
+    conn = None if connect_per_row else connect(database_url)
+    start = time.perf_counter()
+    for reading in readings:
+        if connect_per_row:
+            conn = connect(database_url)
+        with conn.cursor() as cur:
+            insert_reading(cur, reading)
+            upsert_weekly_sums(cur, [reading])
+            upsert_rollups(cur, [reading])
+            upsert_latest(cur, [reading])
+        conn.commit()
+        if connect_per_row:
+            conn.close()
+    elapsed = time.perf_counter() - start
+    if not connect_per_row:
+        conn.close()
+    return elapsed
+
+
+def run_batched(database_url, readings, batch_size):
+    conn = connect(database_url)
+    start = time.perf_counter()
+    for i in range(0, len(readings), batch_size):
+        ingest_readings(conn, readings[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--sensors", type=int, default=50)
+    parser.add_argument("--rows-per-sensor", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5000, help="readings per COPY transaction")
+    parser.add_argument("--connect-per-row", action="store_true")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    sensor_ids = [f"bench-sensor-{i:04d}" for i in range(args.sensors)]
+    readings = generate_sensor_batch(args.rows_per_sensor, sensor_ids)
+    total = len(readings)
+    print(f"{total} readings for {args.sensors} sensors")
+
+    reset(args.database_url)
+    per_row = run_per_row(args.database_url, readings, args.connect_per_row)
+    print(f"per-row : {per_row:8.3f}s  {total / per_row:10.0f} rows/s")
+
+    reset(args.database_url)
+    batched = run_batched(args.database_url, readings, args.batch_size)
+    print(f"batched : {batched:8.3f}s  {total / batched:10.0f} rows/s  (x{per_row / batched:.1f})")
+
+    conn = psycopg2.connect(args.database_url)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Reports EXPLAIN buffers and latency of time-range reads on sensor_readings.
+
+Builds a scratch copy of sensor_readings (default 10M rows, readings appended
+in time order like production) inside its own schema, then times the same
+1h / 1d / 1w / 1y windows twice: with only the indexes Django creates for
+SensorReading, and again after adding the BRIN and covering indexes from the
+opt-in migration sensor_data.0005. A third pass drops the plain timestamp
+B-tree to show the BRIN index on its own:
+
+    python benchmarks/bench_reading_queries.py --database-url postgresql://localhost/sensors \
+        --rows 10000000 --sensors 100 --partitioned
+
+Two queries run per window: the raw readings of one sensor (what the history
+endpoints read) and an aggregate over all sensors (what the rollup backfill
+reads). Buffers are summed shared hits + reads from EXPLAIN (ANALYZE, BUFFERS).
+"""
+import argparse
+import datetime
+import os
+import statistics
+import time
+
+import psycopg2
+
+SCHEMA = "query_bench"
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Mirrors the model's indexes (sensor_data.0001) and the opt-in ones (sensor_data.0005)
+BASELINE_INDEXES = [
+    'CREATE INDEX sensor_readings_timestamp_btree ON sensor_readings ("timestamp")',
+    'CREATE INDEX sensor_readings_sensor_id_btree ON sensor_readings (sensor_id)',
+    'CREATE INDEX sensor_readings_sensor_ts_btree ON sensor_readings (sensor_id, "timestamp")',
+]
+EXTRA_INDEXES = [
+    'CREATE INDEX sensor_readings_timestamp_brin '
+    'ON sensor_readings USING brin ("timestamp") WITH (pages_per_range = 32)',
+    'CREATE INDEX sensor_readings_sensor_ts_covering '
+    'ON sensor_readings (sensor_id, "timestamp") INCLUDE (temperature, pressure, humidity, vcc)',
+]
+
+WINDOWS = [
+    ("1h", datetime.timedelta(hours=1)),
+    ("1d", datetime.timedelta(days=1)),
+    ("1w", datetime.timedelta(weeks=1)),
+    ("1y", datetime.timedelta(days=365)),
+]
+
+SENSOR_QUERY = """
+SELECT "timestamp", temperature, pressure, humidity, vcc FROM sensor_readings
+WHERE sensor_id = %s AND "timestamp" >= %s AND "timestamp" < %s
+ORDER BY "timestamp"
+"""
+ALL_SENSORS_QUERY = """
+SELECT count(*), avg(temperature) FROM sensor_readings
+WHERE "timestamp" >= %s AND "timestamp" < %s
+"""
+
+
+def _months(start, end):
+    while start < end:
+        following = (start + datetime.timedelta(days=32)).replace(day=1)
+        yield start, following
+        start = following
+
+
+def build_table(conn, rows, sensors, interval, partitioned):
+    per_sensor = rows // sensors
+    end = START + interval * per_sensor
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        cur.execute(
+            """
+            CREATE TABLE sensor_readings (
+                id bigserial,
+                "timestamp" timestamptz NOT NULL,
+                sensor_id varchar(50) NOT NULL,
+                temperature double precision,
+                pressure double precision,
+                humidity double precision,
+                vcc integer
+            )""" + (' PARTITION BY RANGE ("timestamp")' if partitioned else "")
+        )
+        if partitioned:
+            for lo, hi in _months(START, end):
+                cur.execute(
+                    f"CREATE TABLE sensor_readings_p{lo:%Y%m} PARTITION OF sensor_readings "
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    [lo, hi],
+                )
+        # Ordered by time so the heap is laid out the way appends produce it
+        cur.execute(
+            """
+            INSERT INTO sensor_readings ("timestamp", sensor_id, temperature, pressure, humidity, vcc)
+            SELECT %s + g * %s, 'bench-sensor-' || lpad(s::text, 4, '0'),
+                   15 + 10 * random(), 1000 + 20 * random(), 40 + 30 * random(), 3000 + (random() * 300)::int
+            FROM generate_series(0, %s - 1) g CROSS JOIN generate_series(0, %s - 1) s
+            ORDER BY g, s
+            """,
+            [START, interval, per_sensor, sensors],
+        )
+        inserted = cur.rowcount
+        for sql in BASELINE_INDEXES:
+            cur.execute(sql)
+        cur.execute("VACUUM ANALYZE sensor_readings")
+    return inserted, end
+
+
+def index_sizes(conn):
+    """Returns {index: bytes}, summing the per-partition indexes under their parent index."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT coalesce(pg_partition_root(i.indexrelid), i.indexrelid)::regclass::text, sum(pg_relation_size(i.indexrelid))
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            GROUP BY 1
+            """,
+            [SCHEMA],
+        )
+        return {name: int(size) for name, size in cur.fetchall()}
+
+
+def _buffers(plan):
+    return plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+
+
+def _scan_nodes(plan, found=None):
+    found = set() if found is None else found
+    if "Scan" in plan["Node Type"]:
+        found.add(plan["Node Type"])
+    for child in plan.get("Plans", []):
+        _scan_nodes(child, found)
+    return found
+
+
+def measure(conn, sql, params, repeat):
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]["Plan"]
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            timings.append(time.perf_counter() - start)
+    return {
+        "rows": plan.get("Actual Rows", 0),
+        "buffers": _buffers(plan),
+        "scans": ", ".join(sorted(_scan_nodes(plan))),
+        "ms": statistics.median(timings) * 1000,
+    }
+
+
+def run_queries(conn, end, sensor_id, repeat):
+    results = []
+    for label, width in WINDOWS:
+        lo = max(START, end - width)
+        results.append((label, "one sensor", measure(conn, SENSOR_QUERY, [sensor_id, lo, end], repeat)))
+        results.append((label, "all sensors", measure(conn, ALL_SENSORS_QUERY, [lo, end], repeat)))
+    return results
+
+
+def print_results(title, results):
+    print(f"\n{title}")
+    print(f"{'window':<7}{'query':<13}{'rows':>10}{'buffers':>10}{'p50 ms':>10}  scans")
+    for label, query, r in results:
+        print(f"{label:<7}{query:<13}{r['rows']:>10}{r['buffers']:>10}{r['ms']:>10.2f}  {r['scans']}")
+
+
+def print_sizes(sizes):
+    for name, size in sorted(sizes.items()):
+        print(f"  {name:<55}{size / 1024 / 1024:>10.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--sensors", type=int, default=100)
+    parser.add_argument("--interval-seconds", type=int, default=300, help="spacing between readings of one sensor")
+    parser.add_argument("--partitioned", action="store_true", help="partition the scratch table by month")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query (median reported)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    conn = psycopg2.connect(args.database_url, options=f"-c search_path={SCHEMA}")
+    conn.autocommit = True
+    interval = datetime.timedelta(seconds=args.interval_seconds)
+
+    start = time.perf_counter()
+    inserted, end = build_table(conn, args.rows, args.sensors, interval, args.partitioned)
+    print(f"{inserted} rows for {args.sensors} sensors up to {end:%Y-%m-%d} "
+          f"({'partitioned' if args.partitioned else 'plain'}), built in {time.perf_counter() - start:.1f}s")
+    sensor_id = "bench-sensor-0000"
+
+    print("\nindex sizes (model indexes)")
+    print_sizes(index_sizes(conn))
+    print_results("model indexes only", run_queries(conn, end, sensor_id, args.repeat))
+
+    with conn.cursor() as cur:
+        for sql in EXTRA_INDEXES:
+            cur.execute(sql)
+        cur.execute("VACUUM ANALYZE sensor_readings")
+    print("\nindex sizes (with BRIN + covering)")
+    print_sizes(index_sizes(conn))
+    print_results("with BRIN + covering indexes", run_queries(conn, end, sensor_id, args.repeat))
+
+    with conn.cursor() as cur:
+        cur.execute("DROP INDEX sensor_readings_timestamp_btree")
+    print_results("BRIN instead of the timestamp B-tree", run_queries(conn, end, sensor_id, args.repeat))
+
+    if not args.keep:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
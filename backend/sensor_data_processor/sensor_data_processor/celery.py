@@ -34,7 +34,8 @@ app.conf.update(
 # Define the beat schedule (runs every hour)
 app.conf.beat_schedule = {
     'process-sensor-data-every-hour': {
-        'task': 'sensor_data_processor.tasks.process_sensor_data',
+        # Batched path: SENSOR_BATCH_SIZE readings per sensor, written with a single COPY
+        'task': 'sensor_data_processor.tasks.process_sensor_data_batch',
         # 'schedule': crontab(minute=0), # Runs at the start of every hour
         # 'schedule': crontab(minute='*/1'), # Runs every minute for testing - CHANGE TO minute=0 for hourly
         'schedule': crontab(minute='*/10'), # Runs every 10 minutes
@@ -0,0 +1,146 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
+load_dotenv(dotenv_path=dotenv_path)
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+# Pool sizing is per worker process, so the total number of Postgres connections
+# is at most DB_POOL_MAXCONN * worker concurrency.
+DB_POOL_MINCONN = int(os.getenv('DB_POOL_MINCONN', '1'))
+DB_POOL_MAXCONN = int(os.getenv('DB_POOL_MAXCONN', '4'))
+# Set to 0 to skip the SELECT 1 ping when a connection is checked out
+DB_POOL_HEALTHCHECK = os.getenv('DB_POOL_HEALTHCHECK', '1') != '0'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_db_connection():
+    """Establishes a new (unpooled) connection to the PostgreSQL database."""
+    if not DATABASE_URL:
+        logger.error("DATABASE_URL environment variable is not set.")
+        raise ValueError("Database URL is not configured.")
+    try:
+        # Setting autocommit=False to manage transactions explicitly
+        conn = psycopg2.connect(DATABASE_URL)
+        logger.debug("Database connection established.")
+        return conn
+    except psycopg2.OperationalError as e:
+        logger.error(f"Error connecting to database: {e}")
+        raise
+
+
+def init_pool(minconn=None, maxconn=None):
+    """Creates the process-local connection pool if it does not exist yet."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if not DATABASE_URL:
+                logger.error("DATABASE_URL environment variable is not set.")
+                raise ValueError("Database URL is not configured.")
+            minconn = DB_POOL_MINCONN if minconn is None else minconn
+            maxconn = DB_POOL_MAXCONN if maxconn is None else maxconn
+            _pool = pool.ThreadedConnectionPool(minconn, maxconn, DATABASE_URL)
+            logger.info(f"Database pool created (min={minconn}, max={maxconn}, pid={os.getpid()}).")
+        return _pool
+
+
+def close_pool():
+    """Closes every connection held by the process-local pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+            logger.info(f"Database pool closed (pid={os.getpid()}).")
+        _pool = None
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    if not DB_POOL_HEALTHCHECK:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def checkout_connection():
+    """Takes a healthy connection out of the process-local pool.
+
+    Broken connections (server restart, idle timeout) are discarded and replaced
+    on checkout. Every checkout must be paired with release_connection().
+    """
+    db_pool = _pool or init_pool()
+    conn = db_pool.getconn()
+    # At most maxconn attempts: every stale connection is closed as it is found
+    for _ in range(db_pool.maxconn):
+        if _is_healthy(conn):
+            return conn
+        logger.warning("Discarding broken pooled database connection.")
+        db_pool.putconn(conn, close=True)
+        conn = db_pool.getconn()
+    db_pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("No healthy database connection available.")
+
+
+def release_connection(conn):
+    """Returns a connection to the pool, rolling back anything left open so the next borrower starts clean."""
+    close = bool(conn.closed)
+    if not close and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            close = True
+    if _pool is None or _pool.closed:
+        # The pool was shut down while this connection was out
+        if not close:
+            conn.close()
+        return
+    _pool.putconn(conn, close=close)
+
+
+@contextmanager
+def borrow_connection():
+    """Context manager around checkout_connection()/release_connection()."""
+    conn = checkout_connection()
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+
+@worker_process_init.connect
+def _init_worker_pool(**kwargs):
+    # Each prefork child gets its own pool; connections must never cross a fork,
+    # so any pool inherited from the parent is dropped rather than reused.
+    global _pool
+    _pool = None
+    init_pool()
+
+
+@worker_process_shutdown.connect
+def _close_worker_pool(**kwargs):
+    close_pool()
+
+
+@worker_shutdown.connect
+def _close_main_pool(**kwargs):
+    # solo/threads pools run tasks in the main process and never fire worker_process_*
+    close_pool()
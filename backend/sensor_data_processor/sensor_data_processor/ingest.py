@@ -0,0 +1,249 @@
+import csv
+import datetime
+import io
+import logging
+
+from psycopg2.extras import execute_values
+
+from .latest import newest_readings
+
+logger = logging.getLogger(__name__)
+
+# Column order used by both the single-row INSERT and the COPY path
+READING_COLUMNS = ("timestamp", "sensor_id", "temperature", "pressure", "humidity", "vcc")
+METRICS = ("temperature", "pressure", "humidity", "vcc")
+
+COPY_READINGS_SQL = (
+    f"COPY sensor_readings ({', '.join(READING_COLUMNS)}) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+
+def _as_row(reading):
+    """Maps a reading dict (as produced by generate_sensor_data) onto READING_COLUMNS."""
+    return (
+        reading["time"],
+        reading["sensor"],
+        reading.get("temperature"),
+        reading.get("pressure"),
+        reading.get("humidity"),
+        reading.get("vcc"),
+    )
+
+
+def insert_reading(cur, reading):
+    """Inserts one reading with a plain INSERT (one round trip per row)."""
+    insert_sql = """
+    INSERT INTO sensor_readings (timestamp, sensor_id, temperature, pressure, humidity, vcc)
+    VALUES (%s, %s, %s, %s, %s, %s);
+    """
+    cur.execute(insert_sql, _as_row(reading))
+
+
+def copy_readings(cur, readings):
+    """Streams all readings into sensor_readings with a single COPY ... FROM STDIN.
+
+    The rows are written as CSV into an in-memory buffer; an empty unquoted field
+    is read back by Postgres as NULL, which is how missing metrics are sent.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for reading in readings:
+        row = list(_as_row(reading))
+        row[0] = row[0].isoformat()
+        writer.writerow(row)
+    buf.seek(0)
+    cur.copy_expert(COPY_READINGS_SQL, buf)
+    return len(readings)
+
+
+def group_by_week(readings):
+    """Groups readings by (sensor_id, iso year, iso week) so each weekly row is touched once per batch."""
+    groups = {}
+    for reading in readings:
+        year, week_num, _ = reading["time"].isocalendar()
+        groups.setdefault((reading["sensor"], year, week_num), []).append(reading)
+    return groups
+
+
+UPSERT_WEEKLY_SUMS_SQL = """
+INSERT INTO weekly_sensor_averages AS w
+    (sensor_id, year, week_number,
+     sum_temperature, count_temperature, sum_pressure, count_pressure,
+     sum_humidity, count_humidity, sum_vcc, count_vcc,
+     datapoints, calculation_timestamp)
+VALUES %s
+ON CONFLICT (sensor_id, year, week_number) DO UPDATE SET
+    sum_temperature = w.sum_temperature + EXCLUDED.sum_temperature,
+    count_temperature = w.count_temperature + EXCLUDED.count_temperature,
+    sum_pressure = w.sum_pressure + EXCLUDED.sum_pressure,
+    count_pressure = w.count_pressure + EXCLUDED.count_pressure,
+    sum_humidity = w.sum_humidity + EXCLUDED.sum_humidity,
+    count_humidity = w.count_humidity + EXCLUDED.count_humidity,
+    sum_vcc = w.sum_vcc + EXCLUDED.sum_vcc,
+    count_vcc = w.count_vcc + EXCLUDED.count_vcc,
+    datapoints = w.datapoints + EXCLUDED.datapoints,
+    calculation_timestamp = GREATEST(w.calculation_timestamp, EXCLUDED.calculation_timestamp);
+"""
+
+
+def sum_and_count(values):
+    """Returns (sum, count) over the non-null values, so a missing field never dilutes a mean."""
+    values = [v for v in values if v is not None]
+    return float(sum(values)), len(values)
+
+
+def upsert_weekly_sums(cur, readings):
+    """Adds a batch to weekly_sensor_averages with one INSERT ... ON CONFLICT DO UPDATE.
+
+    Only running sums and per-metric non-null counts are stored; averages are
+    derived on read. Since every writer just adds its deltas, concurrent workers
+    never need SELECT ... FOR UPDATE. Rows are sent in key order so two batches
+    touching the same sensor-weeks always lock them in the same order.
+    """
+    calculation_time = datetime.datetime.now(datetime.timezone.utc)
+    groups = group_by_week(readings)
+
+    rows = []
+    for (sensor_id, year, week_num), group in sorted(groups.items()):
+        row = [sensor_id, year, week_num]
+        for metric in METRICS:
+            row.extend(sum_and_count(r.get(metric) for r in group))
+        row.extend([len(group), calculation_time])
+        rows.append(tuple(row))
+
+    execute_values(cur, UPSERT_WEEKLY_SUMS_SQL, rows, page_size=max(len(rows), 1))
+    return len(groups)
+
+
+# Rollup resolutions maintained next to the raw rows (see SensorRollup in the Django app)
+ROLLUP_RESOLUTIONS = ("hour", "day", "week", "month")
+
+
+def bucket_start(ts, resolution):
+    """Truncates a UTC timestamp to the start of its hour/day/ISO week/month bucket."""
+    ts = ts.astimezone(datetime.timezone.utc)
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+def _metric_stats(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return 0, 0.0, 0.0, None, None
+    return len(values), float(sum(values)), float(sum(v * v for v in values)), min(values), max(values)
+
+
+UPSERT_ROLLUPS_SQL = """
+INSERT INTO sensor_rollups AS r
+    (sensor_id, resolution, bucket_start,
+     {columns},
+     datapoints, updated_at)
+VALUES %s
+ON CONFLICT (sensor_id, resolution, bucket_start) DO UPDATE SET
+    {updates},
+    datapoints = r.datapoints + EXCLUDED.datapoints,
+    updated_at = EXCLUDED.updated_at;
+""".format(
+    columns=",\n     ".join(
+        f"count_{m}, sum_{m}, sum_sq_{m}, min_{m}, max_{m}" for m in METRICS
+    ),
+    updates=",\n    ".join(
+        f"count_{m} = r.count_{m} + EXCLUDED.count_{m}, "
+        f"sum_{m} = r.sum_{m} + EXCLUDED.sum_{m}, "
+        f"sum_sq_{m} = r.sum_sq_{m} + EXCLUDED.sum_sq_{m}, "
+        f"min_{m} = LEAST(r.min_{m}, EXCLUDED.min_{m}), "
+        f"max_{m} = GREATEST(r.max_{m}, EXCLUDED.max_{m})"
+        for m in METRICS
+    ),
+)
+
+
+def upsert_rollups(cur, readings, resolutions=ROLLUP_RESOLUTIONS):
+    """Folds a batch into the hourly/daily/weekly/monthly rollups with one upsert.
+
+    Each bucket keeps count, sum, sum of squares, min and max per metric, which
+    merge by plain addition (LEAST/GREATEST for the extremes, both of which skip
+    NULLs), so mean and stddev can be derived on read at any time.
+    """
+    updated_at = datetime.datetime.now(datetime.timezone.utc)
+    groups = {}
+    for reading in readings:
+        for resolution in resolutions:
+            key = (reading["sensor"], resolution, bucket_start(reading["time"], resolution))
+            groups.setdefault(key, []).append(reading)
+
+    rows = []
+    for (sensor_id, resolution, start), group in sorted(groups.items()):
+        row = [sensor_id, resolution, start]
+        for metric in METRICS:
+            row.extend(_metric_stats([r.get(metric) for r in group]))
+        row.extend([len(group), updated_at])
+        rows.append(tuple(row))
+
+    execute_values(cur, UPSERT_ROLLUPS_SQL, rows, page_size=max(len(rows), 1))
+    return len(groups)
+
+
+# The main project's sensor_latest table (SensorLatest); this service fills the metrics it has
+LATEST_COLUMNS = ("temperature", "humidity", "pressure", "soil_moisture_20", "soil_moisture_5", "soil_temperature", "vcc")
+
+UPSERT_LATEST_SQL = """
+INSERT INTO sensor_latest AS l (sensor_id, timestamp, {columns}, updated_at)
+VALUES %s
+ON CONFLICT (sensor_id) DO UPDATE SET
+    timestamp = EXCLUDED.timestamp,
+    {updates},
+    updated_at = EXCLUDED.updated_at
+WHERE l.timestamp < EXCLUDED.timestamp;
+""".format(
+    columns=", ".join(LATEST_COLUMNS),
+    updates=",\n    ".join(f"{column} = EXCLUDED.{column}" for column in LATEST_COLUMNS),
+)
+
+
+def upsert_latest(cur, readings):
+    """Makes the newest reading of each sensor in a batch its sensor_latest row, unless that row is newer.
+
+    The row holds one whole reading, so metrics this service does not
+    produce are NULL.
+    """
+    updated_at = datetime.datetime.now(datetime.timezone.utc)
+    rows = [
+        (sensor_id, reading["time"], *(reading.get(column) for column in LATEST_COLUMNS), updated_at)
+        for sensor_id, reading in sorted(newest_readings(readings).items())
+    ]
+    execute_values(cur, UPSERT_LATEST_SQL, rows, page_size=max(len(rows), 1))
+    return len(rows)
+
+
+def ingest_readings(conn, readings):
+    """Writes a batch of readings, its weekly sums, its rollups and the latest readings in one transaction.
+
+    Raw rows go through a single COPY, the weekly sums, the rollups and the
+    sensor_latest rows through one upsert each, so a batch costs four
+    statements however many sensors it covers.
+    The caller owns the connection.
+    """
+    if not readings:
+        return 0
+    try:
+        with conn.cursor() as cur:
+            copy_readings(cur, readings)
+            groups = upsert_weekly_sums(cur, readings)
+            upsert_rollups(cur, readings)
+            upsert_latest(cur, readings)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Ingested {len(readings)} readings across {groups} sensor-weeks.")
+    return len(readings)
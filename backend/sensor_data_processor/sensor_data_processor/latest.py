@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import threading
+
+import redis
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
+load_dotenv(dotenv_path=dotenv_path)
+
+# The main project's Redis, where its latest readings hash lives (sensor_data/latest.py)
+REDIS_URL = os.getenv('REDIS_URL')
+
+HASH_KEY = "sensors:latest"
+# Reading fields of the hash values, as the main project names them
+FIELDS = ("temperature", "humidity", "pressure", "soilMoisture20", "soilMoisture5", "soilTemperature", "vcc")
+
+# KEYS[1] the hash; ARGV (sensor_id, timestamp, reading JSON) triples.
+# A reading replaces the sensor's field only if it is newer (same script as the main project's).
+RECORD_SCRIPT = """
+local written = 0
+for i = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or tonumber(cjson.decode(current)['timestamp']) < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+        written = written + 1
+    end
+end
+return written
+"""
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process' Redis client, or None when REDIS_URL is not set."""
+    global _client
+    if not REDIS_URL:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(REDIS_URL)
+        return _client
+
+
+def newest_readings(readings):
+    """The newest reading of each sensor in a batch, by sensor ID."""
+    newest = {}
+    for reading in readings:
+        current = newest.get(reading["sensor"])
+        if current is None or reading["time"] > current["time"]:
+            newest[reading["sensor"]] = reading
+    return newest
+
+
+def record_in_hash(readings):
+    """Writes the newest reading of each sensor in a batch to the latest readings hash.
+
+    Call it after the batch (and its sensor_latest upsert) was committed. A
+    Redis error is logged rather than raised: the readings are stored by then.
+    """
+    client = get_client()
+    if client is None:
+        logger.debug("REDIS_URL is not set, latest readings hash not updated.")
+        return
+    args = []
+    for sensor_id, reading in sorted(newest_readings(readings).items()):
+        timestamp = reading["time"].timestamp()
+        value = {"timestamp": timestamp, **{field: reading.get(field) for field in FIELDS}}
+        args += [sensor_id, timestamp, json.dumps(value)]
+    if not args:
+        return
+    try:
+        client.eval(RECORD_SCRIPT, 1, HASH_KEY, *args)
+    except redis.RedisError as e:
+        logger.error(f"Could not update the latest readings hash: {e}")
@@ -0,0 +1,105 @@
+"""Checks the lifecycle of the process-local connection pool, against a faked psycopg2 pool.
+
+Run from backend/sensor_data_processor:
+
+    python -m unittest discover tests
+"""
+import unittest
+from unittest.mock import patch
+
+import psycopg2
+from psycopg2 import extensions
+
+from sensor_data_processor import db
+
+
+class FakeConnection:
+    def __init__(self, healthy=True, status=extensions.TRANSACTION_STATUS_IDLE):
+        self.healthy = healthy
+        self.closed = 0
+        self.info = type("Info", (), {"transaction_status": status})()
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        if not self.healthy:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakePool:
+    def __init__(self, minconn, maxconn, dsn, connections=()):
+        self.maxconn = maxconn
+        self.closed = False
+        self.idle = list(connections)
+        self.returned = []
+
+    def getconn(self):
+        return self.idle.pop(0) if self.idle else FakeConnection()
+
+    def putconn(self, conn, close=False):
+        self.returned.append((conn, close))
+        if close:
+            conn.close()
+
+    def closeall(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        for patcher in (
+            patch.object(db, "DATABASE_URL", "postgresql://localhost/test"),
+            patch.object(db.pool, "ThreadedConnectionPool", FakePool),
+            patch.object(db, "_pool", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_broken_connections_are_replaced_on_checkout(self):
+        broken, good = FakeConnection(healthy=False), FakeConnection()
+        db.init_pool(maxconn=4).idle = [broken, good]
+        with db.borrow_connection() as conn:
+            self.assertIs(conn, good)
+        self.assertEqual(db._pool.returned, [(broken, True), (good, False)])
+        self.assertTrue(broken.closed)
+
+    def test_release_rolls_back_an_open_transaction(self):
+        conn = db.checkout_connection()
+        rollbacks = conn.rollbacks
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS  # the borrower left it open
+        db.release_connection(conn)
+        self.assertEqual(conn.rollbacks, rollbacks + 1)
+        self.assertEqual(db._pool.returned, [(conn, False)])
+
+    def test_connection_out_while_the_pool_closes_is_closed_on_release(self):
+        db.init_pool()
+        conn = db.checkout_connection()
+        db.close_pool()
+        self.assertIsNone(db._pool)
+        db.release_connection(conn)
+        self.assertTrue(conn.closed)
+
+    def test_forked_worker_gets_its_own_pool(self):
+        inherited = db.init_pool()
+        db._init_worker_pool()
+        self.assertIsNot(db._pool, inherited)
+        self.assertFalse(inherited.closed)  # the parent's connections are left alone
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Checks the statements the batched ingestion path sends, against a faked cursor.
+
+Run from backend/sensor_data_processor:
+
+    python -m unittest discover tests
+"""
+import datetime
+import unittest
+from unittest.mock import patch
+
+from sensor_data_processor import ingest
+
+MONDAY = datetime.datetime(2025, 3, 3, 10, 0, tzinfo=datetime.timezone.utc)
+
+
+def reading(sensor_id, ts, temperature=20.0, humidity=None):
+    return {"time": ts, "sensor": sensor_id, "temperature": temperature, "pressure": 1000.0,
+            "humidity": humidity, "vcc": 4100}
+
+
+class FakeCursor:
+    def __init__(self, fail_on=None):
+        self.copies = []
+        self.fail_on = fail_on
+
+    def copy_expert(self, sql, buf):
+        if self.fail_on == "copy":
+            raise RuntimeError("COPY failed")
+        self.copies.append((sql, buf.read()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class IngestReadingsTests(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(ingest, "execute_values")
+        self.execute_values = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.readings = [
+            reading("a", MONDAY, temperature=20.0, humidity=50.0),
+            reading("a", MONDAY + datetime.timedelta(minutes=1), temperature=22.0),
+            reading("b", MONDAY - datetime.timedelta(days=1), temperature=None),  # the Sunday before: previous ISO week
+        ]
+
+    def upserts(self):
+        return {call.args[1]: call.args[2] for call in self.execute_values.call_args_list}
+
+    def test_batch_is_one_copy_and_one_upsert_per_table_in_one_transaction(self):
+        cursor = FakeCursor()
+        conn = FakeConnection(cursor)
+        self.assertEqual(ingest.ingest_readings(conn, self.readings), 3)
+
+        ((sql, csv),) = cursor.copies
+        self.assertEqual(sql, "COPY sensor_readings (timestamp, sensor_id, temperature, pressure, humidity, vcc) "
+                              "FROM STDIN WITH (FORMAT csv)")
+        self.assertEqual(csv.splitlines()[0], "2025-03-03T10:00:00+00:00,a,20.0,1000.0,50.0,4100")
+        # A missing metric is an empty unquoted field, which COPY reads as NULL
+        self.assertEqual(csv.splitlines()[1], "2025-03-03T10:01:00+00:00,a,22.0,1000.0,,4100")
+        self.assertEqual(set(self.upserts()), {ingest.UPSERT_WEEKLY_SUMS_SQL, ingest.UPSERT_ROLLUPS_SQL, ingest.UPSERT_LATEST_SQL})
+        self.assertEqual((conn.commits, conn.rollbacks), (1, 0))
+
+    def test_weekly_sums_keep_a_non_null_count_per_metric(self):
+        ingest.ingest_readings(FakeConnection(FakeCursor()), self.readings)
+        rows = self.upserts()[ingest.UPSERT_WEEKLY_SUMS_SQL]
+        # Sorted by (sensor_id, year, week), so concurrent batches lock in the same order
+        self.assertEqual([row[:3] for row in rows], [("a", 2025, 10), ("b", 2025, 9)])
+        a = rows[0]
+        self.assertEqual(a[3:11], (42.0, 2, 2000.0, 2, 50.0, 1, 8200.0, 2))
+        self.assertEqual(a[11], 2)  # datapoints
+        self.assertEqual(rows[1][3:5], (0.0, 0))
+
+    def test_weekly_sums_sql_only_adds_to_the_stored_row(self):
+        sql = ingest.UPSERT_WEEKLY_SUMS_SQL
+        self.assertIn("ON CONFLICT (sensor_id, year, week_number) DO UPDATE", sql)
+        for column in ("sum_temperature", "count_humidity", "datapoints"):
+            self.assertIn(f"{column} = w.{column} + EXCLUDED.{column}", sql)
+        self.assertNotIn("FOR UPDATE", sql)
+
+    def test_rollups_and_latest_rows(self):
+        ingest.ingest_readings(FakeConnection(FakeCursor()), self.readings)
+        upserts = self.upserts()
+        rollups = upserts[ingest.UPSERT_ROLLUPS_SQL]
+        self.assertEqual(len(rollups), 2 * len(ingest.ROLLUP_RESOLUTIONS))
+        hour = next(row for row in rollups if row[:2] == ("a", "hour"))
+        self.assertEqual(hour[2], MONDAY)
+        self.assertEqual(hour[3:8], (2, 42.0, 884.0, 20.0, 22.0))  # temperature count, sum, sum of squares, min, max
+
+        latest = upserts[ingest.UPSERT_LATEST_SQL]
+        self.assertEqual([row[:2] for row in latest], [("a", MONDAY + datetime.timedelta(minutes=1)), ("b", MONDAY - datetime.timedelta(days=1))])
+        self.assertIn("WHERE l.timestamp < EXCLUDED.timestamp", ingest.UPSERT_LATEST_SQL)
+
+    def test_failed_batch_is_rolled_back(self):
+        conn = FakeConnection(FakeCursor(fail_on="copy"))
+        with self.assertRaises(RuntimeError):
+            ingest.ingest_readings(conn, self.readings)
+        self.assertEqual((conn.commits, conn.rollbacks), (0, 1))
+        self.execute_values.assert_not_called()
+
+    def test_empty_batch_sends_nothing(self):
+        conn = FakeConnection(FakeCursor())
+        self.assertEqual(ingest.ingest_readings(conn, []), 0)
+        self.assertEqual(conn.commits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
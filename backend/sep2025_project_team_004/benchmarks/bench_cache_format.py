@@ -0,0 +1,110 @@
+"""Cache size and CPU per sensor payload: JSON/pickle entries vs the columnar series encoding.
+
+Builds a payload of --points points in the upstream format and compares the
+ways it has been cached:
+
+  json string   sensor_data.tasks before: json.dumps(payload), served through
+                JsonResponse (which encodes the string once more)
+  pickled dict  scheduler_backend before: the decoded dict, pickled by
+                django-redis' PickleSerializer and re-encoded by JsonResponse
+  series        sensor_data.series.encode(), served with render_response();
+                "cold" is the first request after a refresh, before the
+                rendered body is memoized
+  response      series plus the gzipped response body cached next to it
+                (sensor_data.responses), served as is
+
+Sizes are what Redis stores (the pickled value). "write" is the cost of
+producing the cache value, "read" the cost of one sensor_data_api request
+from the bytes fetched out of Redis to the response body.
+
+    python benchmarks/bench_cache_format.py --points 2000
+"""
+import argparse
+import json
+import os
+import pickle
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sep2025_project_team_004.sensor_data import responses, series  # noqa: E402
+from sep2025_project_team_004.sensor_data.upstream import read_points  # noqa: E402
+
+
+def upstream_payload(count):
+    newest = datetime(2025, 5, 4, 10, tzinfo=timezone.utc)
+    return {
+        "status": 200,
+        "message": "Success",
+        "sensorID": "usda-air-w06",
+        "points": [
+            {
+                "esmcTime": (newest - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "temperature": f"{20 + (i % 97) / 10:.2f}",
+                "humidity": f"{40 + (i % 301) / 10:.2f}",
+                "pressure": f"{100 + (i % 53) / 10:.2f}",
+                "soilMoisture20": f"{30 + (i % 11) / 10:.2f}",
+                "soilMoisture5": f"{35 + (i % 13) / 10:.2f}",
+                "soilTemperature": f"{18 + (i % 17) / 10:.2f}",
+                "vcc": f"{3 + (i % 30) / 100:.2f}",
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = upstream_payload(args.points)
+    body = json.dumps(payload).encode()
+    envelope, points = read_points([body])
+    sensor_id = payload["sensorID"]
+
+    cases = {
+        "json string": (
+            lambda: pickle.dumps(json.dumps(payload)),
+            lambda stored: json.dumps({"sensor_id": sensor_id, "data": pickle.loads(stored)}).encode(),
+        ),
+        "pickled dict": (
+            lambda: pickle.dumps(payload),
+            lambda stored: json.dumps({"sensor_id": sensor_id, "data": pickle.loads(stored)}).encode(),
+        ),
+        "series (cold)": (
+            lambda: pickle.dumps(series.encode(envelope, points)),
+            lambda stored: series.render_response.__wrapped__(sensor_id, pickle.loads(stored)),
+        ),
+        "series": (
+            lambda: pickle.dumps(series.encode(envelope, points)),
+            lambda stored: series.render_response(sensor_id, pickle.loads(stored)),
+        ),
+        "response": (
+            lambda: pickle.dumps(responses.build(sensor_id, series.encode(envelope, points))),
+            lambda stored: pickle.loads(stored)["body"],
+        ),
+    }
+
+    print(f"{args.points} points, upstream body {len(body) / 1024:.1f} KiB")
+    print(f"{'format':<15}{'stored KiB':>12}{'write ms':>10}{'read ms':>10}")
+    for name, (write, read) in cases.items():
+        stored = write()
+        print(f"{name:<15}{len(stored) / 1024:>12.1f}{timed(write, args.repeat):>10.2f}"
+              f"{timed(lambda: read(stored), args.repeat):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
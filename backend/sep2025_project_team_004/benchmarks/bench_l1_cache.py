@@ -0,0 +1,95 @@
+"""sensor_data_api latency with the per-process L1 cache on and off.
+
+Caches --sensors sensors of --points points each in Redis the way the refresh
+task does, then sends --requests requests through the full middleware stack
+(django.test.Client), --hot-share of them to the first --hot sensors (the
+default favorites get most of the traffic), and reports p50/p99 per request
+and the L1 hit ratio. Needs a Redis server:
+
+    python benchmarks/bench_l1_cache.py --redis-url redis://localhost:6379/15
+
+The Redis database is flushed first.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.test")
+
+
+def percentile(timings, q):
+    return statistics.quantiles(timings, n=100)[q - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--hot", type=int, default=3)
+    parser.add_argument("--hot-share", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    from django.core.cache import cache
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    from sep2025_project_team_004.sensor_data import localcache, upstream
+    from sep2025_project_team_004.sensor_data.sensors import SENSOR_LIST
+    from sep2025_project_team_004.sensor_data.series import SensorPoint
+
+    setup_test_environment()
+    redis_cache = {"default": {**settings.CACHES["default"], "LOCATION": args.redis_url}}
+    newest = datetime(2025, 5, 4, 10, tzinfo=timezone.utc)
+    points = [
+        SensorPoint((newest - timedelta(minutes=i)).timestamp(), 20 + (i % 97) / 10, 40 + (i % 301) / 10,
+                    100 + (i % 53) / 10, None, None, None, 3 + (i % 30) / 100)
+        for i in range(args.points)
+    ]
+    sensor_ids = list(SENSOR_LIST)[:args.sensors]
+    rng = random.Random(args.seed)
+    workload = [
+        rng.choice(sensor_ids[:args.hot]) if rng.random() < args.hot_share else rng.choice(sensor_ids)
+        for _ in range(args.requests)
+    ]
+
+    with override_settings(CACHES=redis_cache):
+        cache.clear()
+        for sensor_id in sensor_ids:
+            envelope = {"status": 200, "message": "Success", "sensorID": sensor_id}
+            upstream.store_payload(sensor_id, upstream.series.encode(envelope, points), {}, 600)
+
+        client = Client(HTTP_ACCEPT_ENCODING="gzip")
+        urls = {sensor_id: reverse("sensor_data:sensor-data", args=[sensor_id]) for sensor_id in sensor_ids}
+        print(f"{len(sensor_ids)} sensors x {args.points} points, {args.requests} requests, "
+              f"{args.hot_share:.0%} to {args.hot} hot sensors")
+        print(f"{'L1':<6}{'p50 ms':>9}{'p99 ms':>9}{'hit ratio':>11}")
+        for enabled in (False, True):
+            localcache.local_cache().clear()
+            timings = []
+            with override_settings(SENSOR_L1_CACHE=enabled):
+                for sensor_id in workload:
+                    start = time.perf_counter()
+                    response = client.get(urls[sensor_id])
+                    timings.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.status_code
+            ratio = localcache.stats()["hit_ratio"]
+            print(f"{'on' if enabled else 'off':<6}{percentile(timings, 50):>9.3f}{percentile(timings, 99):>9.3f}"
+                  f"{'' if ratio is None else f'{ratio:.1%}':>11}")
+        cache.clear()
+
+
+if __name__ == "__main__":
+    main()
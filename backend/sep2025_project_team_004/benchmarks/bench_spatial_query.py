@@ -0,0 +1,123 @@
+"""Map viewport and nearby queries over the Belongs `cell` index.
+
+Creates a throwaway test database with --sensors sensors scattered over the
+contiguous US (half of them in a few dense metro areas), then runs
+--queries random city-sized viewports (about --viewport-km wide) and
+radius queries (--radius-km) through sensors.spatial, as the map endpoint
+does, and reports p50/p99 per query. For comparison the same viewports are
+also run as a plain latitude/longitude range filter, which can use no index:
+
+    python benchmarks/bench_spatial_query.py --sensors 1000000
+
+The test settings use SQLite; point DATABASE_URL at PostgreSQL and use
+settings that read it to measure the production database.
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.test")
+
+METROS = [(41.66, -91.53), (41.88, -87.63), (40.71, -74.01), (34.05, -118.24), (29.76, -95.37)]
+
+
+def percentile(timings, q):
+    return statistics.quantiles(timings, n=100)[q - 1] * 1000
+
+
+def timed(queries, run):
+    timings, rows = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        rows += len(run(*query))
+        timings.append(time.perf_counter() - start)
+    return timings, rows / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--viewport-km", type=float, default=5)
+    parser.add_argument("--radius-km", type=float, default=2)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import django
+
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    from sep2025_project_team_004.sensors import spatial
+    from sep2025_project_team_004.sensors.models import Belongs
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        rng = random.Random(args.seed)
+        user = get_user_model().objects.create_user(username="bench", password="bench", email="bench@example.com")
+
+        def point():
+            if rng.random() < 0.5:
+                lat, lon = rng.choice(METROS)
+                return lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2)
+            return rng.uniform(25, 49), rng.uniform(-124, -67)
+
+        start = time.perf_counter()
+        batch = []
+        for n in range(args.sensors):
+            lat, lon = (round(value, 6) for value in point())
+            batch.append(Belongs(sensor_id=f"b{n}", sensor_type="air", user=user, address="",
+                                 latitude=Decimal(str(lat)), longitude=Decimal(str(lon)), cell=spatial.encode(lat, lon)))
+            if len(batch) == 10000:
+                Belongs.objects.bulk_create(batch)
+                batch = []
+        Belongs.objects.bulk_create(batch)
+        print(f"{args.sensors} sensors inserted in {time.perf_counter() - start:.1f} s ({connection.vendor})")
+
+        centers = [point() for _ in range(args.queries)]
+        viewports = []
+        for lat, lon in centers:
+            half_lat = args.viewport_km / 2 / spatial.KM_PER_DEGREE
+            half_lon = half_lat / math.cos(math.radians(lat))
+            viewports.append((lat - half_lat, lon - half_lon, lat + half_lat, lon + half_lon))
+        columns = ("id", "sensor_id", "sensor_type", "latitude", "longitude")
+        sensors = Belongs.objects.all()
+
+        def by_cell(min_lat, min_lon, max_lat, max_lon):
+            qs = spatial.in_viewport(sensors, min_lat, min_lon, max_lat, max_lon)
+            return list(qs.order_by("latitude", "id").values_list(*columns)[:args.limit + 1])
+
+        def by_range(min_lat, min_lon, max_lat, max_lon):
+            qs = sensors.filter(latitude__range=(Decimal(str(min_lat)), Decimal(str(max_lat))),
+                                longitude__range=(Decimal(str(min_lon)), Decimal(str(max_lon))))
+            return list(qs.order_by("latitude", "id").values_list(*columns)[:args.limit + 1])
+
+        def nearby(lat, lon):
+            qs = spatial.nearby(sensors, lat, lon, args.radius_km)
+            return list(qs.order_by("distance2", "id").values_list(*columns)[:args.limit + 1])
+
+        print(f"{args.queries} queries, {args.viewport_km} km viewports, {args.radius_km} km radius, limit {args.limit}")
+        print(f"{'query':<20}{'p50 ms':>9}{'p99 ms':>9}{'rows':>8}")
+        for name, run, queries in [
+            ("viewport (cell)", by_cell, viewports),
+            ("viewport (lat/lon)", by_range, viewports),
+            ("nearby (cell)", nearby, centers),
+        ]:
+            timings, rows = timed(queries, run)
+            print(f"{name:<20}{percentile(timings, 50):>9.3f}{percentile(timings, 99):>9.3f}{rows:>8.0f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
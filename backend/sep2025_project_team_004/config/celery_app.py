@@ -27,5 +27,6 @@ def config_loggers(*args, **kwargs):
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks([
     'sep2025_project_team_004.sensor_data',
+    'sep2025_project_team_004.sensors',
     'sep2025_project_team_004.users',
 ])
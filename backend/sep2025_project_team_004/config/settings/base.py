@@ -136,6 +136,7 @@ LOCAL_APPS = [
     "sep2025_project_team_004.payment",
     "sep2025_project_team_004.friends",
     "sep2025_project_team_004.sensors",
+    "sep2025_project_team_004.geocoding",
     # Your stuff: custom apps go here
     'sep2025_project_team_004.sensor_data.apps.SensorDataConfig',
 ]
@@ -383,3 +384,92 @@ AUTH_USER_MODEL = "users.User"
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+
+# sensor_data
+# ------------------------------------------------------------------------------
+# Monthly sensor_readings partitions are created this many months ahead
+SENSOR_READINGS_PREMAKE_MONTHS = env.int("SENSOR_READINGS_PREMAKE_MONTHS", default=3)
+# Partitions entirely older than this many months are retired; 0 keeps everything
+SENSOR_READINGS_RETENTION_MONTHS = env.int("SENSOR_READINGS_RETENTION_MONTHS", default=0)
+# "detach" keeps retired partitions as standalone tables, "drop" deletes them
+SENSOR_READINGS_RETENTION_MODE = env("SENSOR_READINGS_RETENTION_MODE", default="detach")
+# Adds a BRIN index on timestamp and a covering (sensor_id, timestamp) INCLUDE (metrics)
+# index to sensor_readings when migration sensor_data.0005 runs; see that migration
+SENSOR_READINGS_TIME_RANGE_INDEXES = env.bool("SENSOR_READINGS_TIME_RANGE_INDEXES", default=False)
+# Closed sensor-weeks older than this many weeks are compacted into Parquet archives
+SENSOR_ARCHIVE_HOT_WEEKS = env.int("SENSOR_ARCHIVE_HOT_WEEKS", default=8)
+# Alias in STORAGES the archives are written to (local filesystem or S3)
+SENSOR_ARCHIVE_STORAGE = env("SENSOR_ARCHIVE_STORAGE", default="default")
+# Local copies of remote archives, so they can be memory-mapped; empty means the temp dir
+SENSOR_ARCHIVE_CACHE_DIR = env("SENSOR_ARCHIVE_CACHE_DIR", default="")
+# Delete archived rows from sensor_readings instead of leaving them to partition retention
+SENSOR_ARCHIVE_DELETE_ROWS = env.bool("SENSOR_ARCHIVE_DELETE_ROWS", default=False)
+# Refresh cached sensor payloads incrementally: only points newer than the newest
+# cached one are read from the upstream response and merged into the cache
+SENSOR_DELTA_SYNC = env.bool("SENSOR_DELTA_SYNC", default=True)
+# Most recent points kept per sensor in the cached payload
+SENSOR_CACHE_MAX_POINTS = env.int("SENSOR_CACHE_MAX_POINTS", default=2000)
+# Keep recently read sensor cache entries in each web process (see sensor_data/localcache.py)
+SENSOR_L1_CACHE = env.bool("SENSOR_L1_CACHE", default=True)
+# Total size of the values one process keeps in its L1 cache
+SENSOR_L1_MAX_BYTES = env.int("SENSOR_L1_MAX_BYTES", default=32 * 1024 * 1024)
+# Seconds an L1 entry is served before it is revalidated against the sensor's version key
+SENSOR_L1_TTL = env.int("SENSOR_L1_TTL", default=5)
+# Seconds after its last successful refresh that cached sensor data counts as fresh; past
+# that it is still served (until the 25 min hard TTL) while one background refresh runs
+SENSOR_SOFT_TTL = env.int("SENSOR_SOFT_TTL", default=180)
+# Seconds a per-sensor refresh lock is held at most (single-flight refreshes)
+SENSOR_REFRESH_LOCK_TIMEOUT = env.int("SENSOR_REFRESH_LOCK_TIMEOUT", default=30)
+# Seconds a request waits for another request's refresh of a missing sensor before a 503
+SENSOR_SINGLE_FLIGHT_WAIT = env.int("SENSOR_SINGLE_FLIGHT_WAIT", default=12)
+# Seconds between refreshes of a sensor queried within the last SENSOR_ACTIVE_WINDOW seconds
+SENSOR_REFRESH_INTERVAL = env.int("SENSOR_REFRESH_INTERVAL", default=60)
+SENSOR_ACTIVE_WINDOW = env.int("SENSOR_ACTIVE_WINDOW", default=15 * 60)
+# Seconds between refreshes of an idle sensor nobody has as a favorite; divided by
+# 1 + its number of favorites (see sensor_data/registry.py)
+SENSOR_IDLE_REFRESH_INTERVAL = env.int("SENSOR_IDLE_REFRESH_INTERVAL", default=20 * 60)
+# Seconds between two runs of refresh_all_sensors, which queues the sensors due before the next run
+SENSOR_SCHEDULER_TICK = env.int("SENSOR_SCHEDULER_TICK", default=15)
+# Seconds after a sensor's expected next point its fetch is planned
+SENSOR_REFRESH_GRACE = env.int("SENSOR_REFRESH_GRACE", default=15)
+# Up to this many seconds of random delay are added to every planned fetch
+SENSOR_REFRESH_JITTER = env.int("SENSOR_REFRESH_JITTER", default=20)
+# Longest delay between two fetches of a late, offline or failing sensor; fetches are
+# planned before its cached payload expires anyway (see sensor_data/scheduling.py)
+SENSOR_MAX_BACKOFF = env.int("SENSOR_MAX_BACKOFF", default=30 * 60)
+# Upstream failures (timeouts, connection errors, 5xx) in a row that open the shared
+# ESMC circuit breaker; while open, fetches fail fast (see sensor_data/breaker.py)
+SENSOR_BREAKER_FAILURES = env.int("SENSOR_BREAKER_FAILURES", default=5)
+# Seconds the breaker stays open before one probe request may close it again
+SENSOR_BREAKER_RESET_TIMEOUT = env.int("SENSOR_BREAKER_RESET_TIMEOUT", default=60)
+# Celery queue of the upstream fetches (a bulkhead); needs a worker started with -Q <queue>
+SENSOR_UPSTREAM_QUEUE = env("SENSOR_UPSTREAM_QUEUE", default="sensor-upstream")
+CELERY_TASK_ROUTES = {
+    "sep2025_project_team_004.sensor_data.tasks.fetch_and_cache_sensor": {"queue": SENSOR_UPSTREAM_QUEUE},
+}
+
+# geocoding
+# ------------------------------------------------------------------------------
+GEOCODING_URL = env("GEOCODING_URL", default="https://us-street.api.smartystreets.com/street-address")
+# Seconds to connect to / wait for an answer from SmartyStreets
+GEOCODING_CONNECT_TIMEOUT = env.float("GEOCODING_CONNECT_TIMEOUT", default=3.05)
+GEOCODING_READ_TIMEOUT = env.float("GEOCODING_READ_TIMEOUT", default=5)
+# Seconds a geocoded address stays in Redis (it is kept in the GeocodedAddress table for good)
+GEOCODING_CACHE_TTL = env.int("GEOCODING_CACHE_TTL", default=30 * 24 * 60 * 60)
+# Seconds an address SmartyStreets did not match is remembered as such
+GEOCODING_NOT_FOUND_TTL = env.int("GEOCODING_NOT_FOUND_TTL", default=24 * 60 * 60)
+# Register and relocate sensors without waiting for SmartyStreets; a Celery task
+# fills in the coordinates (see sensors/tasks.py)
+GEOCODING_ASYNC = env.bool("GEOCODING_ASYNC", default=False)
+
+# sensor map
+# ------------------------------------------------------------------------------
+# Most sensors per page of /api/sensors/map/
+SENSOR_MAP_PAGE_SIZE = env.int("SENSOR_MAP_PAGE_SIZE", default=500)
+# Largest radius of a nearby query
+SENSOR_NEARBY_MAX_RADIUS_KM = env.float("SENSOR_NEARBY_MAX_RADIUS_KM", default=50)
+# Below this map zoom level sensors are returned as clusters
+SENSOR_MAP_CLUSTER_MAX_ZOOM = env.int("SENSOR_MAP_CLUSTER_MAX_ZOOM", default=12)
+# Seconds between rebuilds of every map tile; their readings are at most this old
+# (the tiles of a sensor that registers or moves are rebuilt right away)
+SENSOR_TILE_TTL = env.int("SENSOR_TILE_TTL", default=120)
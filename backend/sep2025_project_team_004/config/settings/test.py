@@ -278,3 +278,5 @@ SPECTACULAR_SETTINGS["SERVERS"] = [
 ]
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Tests write to the cache directly; an L1 surviving from an earlier test would hide that
+SENSOR_L1_CACHE = False
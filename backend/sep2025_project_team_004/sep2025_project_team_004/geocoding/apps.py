@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class GeocodingConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sep2025_project_team_004.geocoding'
@@ -0,0 +1,148 @@
+"""Address geocoding through SmartyStreets, shared by sensor registration and address validation.
+
+lookup() answers from, in order:
+
+- the cache (Redis), under cache_key() of the normalized address, for
+  GEOCODING_CACHE_TTL seconds; addresses SmartyStreets did not match are
+  remembered there too, for GEOCODING_NOT_FOUND_TTL seconds;
+- the GeocodedAddress table, which keeps every match for good;
+- SmartyStreets itself, over one pooled keep-alive session per process with
+  connect/read timeouts, retrying connection errors and 5xx answers a couple of
+  times.
+
+Addresses are normalized first (case, whitespace and punctuation), so
+"123 Main St." and "123  MAIN ST" cost one request between them. A request
+that fails raises GeocodingError; a valid request without a match returns None.
+
+Views that geocode opt out of ATOMIC_REQUESTS (transaction.non_atomic_requests),
+so no database transaction stays open while SmartyStreets answers. With
+GEOCODING_ASYNC, sensor registration does not wait for it at all: the sensor is
+saved with the address as entered and sensors.tasks.geocode_sensor fills in the
+coordinates.
+"""
+import hashlib
+import re
+import threading
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from .models import GeocodedAddress
+
+NOT_FOUND = 'not-found'  # cached instead of a match for addresses SmartyStreets does not know
+POOL_SIZE = 8
+RETRIES = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class GeocodingError(Exception):
+    """SmartyStreets could not be reached or answered with an error."""
+
+
+def normalize(street, city=None, state=None, zip_code=None):
+    """The address as one lowercase string without punctuation or repeated whitespace."""
+    parts = (re.sub(r"[^\w#/-]+", " ", part or "").lower().split() for part in (street, city, state, zip_code))
+    return "|".join(" ".join(words) for words in parts).rstrip("|")[:255]
+
+
+def cache_key(normalized):
+    return f"geocode:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+def session():
+    """The process' requests session, with a connection pool kept alive between requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=RETRIES)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def query(street, city=None, state=None, zip_code=None):
+    """The first SmartyStreets candidate for an address (a dict), or None if it has no match."""
+    params = {
+        "street": street,
+        "city": city,
+        "state": state,
+        "zipcode": zip_code,
+        "auth-id": settings.SMARTY_AUTH_ID,
+        "auth-token": settings.SMARTY_AUTH_TOKEN,
+    }
+    try:
+        res = session().get(
+            settings.GEOCODING_URL,
+            params={key: value for key, value in params.items() if value},
+            timeout=(settings.GEOCODING_CONNECT_TIMEOUT, settings.GEOCODING_READ_TIMEOUT),
+        )
+        if res.status_code == 400:
+            return None  # the address itself was rejected
+        if res.status_code != 200:
+            raise GeocodingError(f"SmartyStreets answered {res.status_code}")
+        candidates = res.json()
+    except (requests.RequestException, ValueError) as e:
+        raise GeocodingError(str(e)) from e
+    return candidates[0] if candidates else None
+
+
+def _store(normalized, candidate):
+    components = candidate.get("components", {})
+    metadata = candidate.get("metadata", {})
+    fields = {
+        'delivery_line_1': candidate.get("delivery_line_1", "")[:100],
+        'city': components.get("city_name", "")[:64],
+        'state': components.get("state_abbreviation", "")[:2],
+        'zip_code': components.get("zipcode", "")[:10],
+        'latitude': metadata.get("latitude"),
+        'longitude': metadata.get("longitude"),
+    }
+    address, _ = GeocodedAddress.objects.update_or_create(normalized=normalized, defaults=fields)
+    return address
+
+
+def _cache_value(address):
+    # Plain field values rather than a pickled model instance
+    return {field.attname: getattr(address, field.attname) for field in GeocodedAddress._meta.concrete_fields}
+
+
+def cached(street, city=None, state=None, zip_code=None):
+    """The GeocodedAddress of an address if it is known, NOT_FOUND if it has no match, else None.
+
+    Never calls SmartyStreets.
+    """
+    normalized = normalize(street, city, state, zip_code)
+    key = cache_key(normalized)
+    value = cache.get(key)
+    if value == NOT_FOUND:
+        return NOT_FOUND
+    if value is not None:
+        return GeocodedAddress(**value)
+    address = GeocodedAddress.objects.filter(normalized=normalized).first()
+    if address is not None:
+        cache.set(key, _cache_value(address), settings.GEOCODING_CACHE_TTL)
+    return address
+
+
+def lookup(street, city=None, state=None, zip_code=None):
+    """The GeocodedAddress of an address, or None if SmartyStreets has no match for it.
+
+    Raises GeocodingError if SmartyStreets could not be asked.
+    """
+    address = cached(street, city, state, zip_code)
+    if address is not None:
+        return None if address is NOT_FOUND else address
+    normalized = normalize(street, city, state, zip_code)
+    candidate = query(street, city, state, zip_code)
+    if candidate is None:
+        cache.set(cache_key(normalized), NOT_FOUND, settings.GEOCODING_NOT_FOUND_TTL)
+        return None
+    address = _store(normalized, candidate)
+    cache.set(cache_key(normalized), _cache_value(address), settings.GEOCODING_CACHE_TTL)
+    return address
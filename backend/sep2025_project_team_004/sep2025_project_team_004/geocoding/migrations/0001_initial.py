@@ -0,0 +1,28 @@
+# Generated by Django 5.0.12 on 2026-10-17 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedAddress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized', models.CharField(max_length=255, unique=True)),
+                ('delivery_line_1', models.CharField(max_length=100)),
+                ('city', models.CharField(blank=True, max_length=64)),
+                ('state', models.CharField(blank=True, max_length=2)),
+                ('zip_code', models.CharField(blank=True, max_length=10)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('geocoded_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
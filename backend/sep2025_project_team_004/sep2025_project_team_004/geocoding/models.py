@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class GeocodedAddress(models.Model):
+    """A SmartyStreets match for an address, keyed by the normalized address (see geocoder.normalize)."""
+    normalized = models.CharField(max_length=255, unique=True)
+    delivery_line_1 = models.CharField(max_length=100)
+    city = models.CharField(max_length=64, blank=True)
+    state = models.CharField(max_length=2, blank=True)
+    zip_code = models.CharField(max_length=10, blank=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geocoded_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.normalized} -> {self.delivery_line_1} ({self.latitude}, {self.longitude})"
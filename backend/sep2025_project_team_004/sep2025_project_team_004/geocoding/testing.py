@@ -0,0 +1,71 @@
+"""A local stand-in for the SmartyStreets street-address API, for tests.
+
+    with StubGeocoder({"123 main st": (41.66, -91.53)}) as stub, override_settings(GEOCODING_URL=stub.url):
+        ...
+
+Streets are matched by geocoder.normalize() and standardized to the spelling
+given here; every other street gets an empty candidate list (no match). `requests` lists the query parameters of
+every request received; `status` makes the stub answer with that status code
+instead.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from .geocoder import normalize
+
+
+class StubGeocoder:
+    def __init__(self, addresses=None, status=200):
+        self.addresses = {normalize(street): (street, location) for street, location in (addresses or {}).items()}
+        self.status = status
+        self.requests = []
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/street-address"
+
+    def candidates(self, params):
+        match = self.addresses.get(normalize(params.get("street")))
+        if match is None:
+            return []
+        street, (latitude, longitude) = match
+        return [{
+            "delivery_line_1": street,
+            "components": {
+                "city_name": (params.get("city") or "Iowa City").title(),
+                "state_abbreviation": (params.get("state") or "IA").upper(),
+                "zipcode": params.get("zipcode") or "52242",
+            },
+            "metadata": {"latitude": latitude, "longitude": longitude},
+        }]
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def do_GET(self):
+                params = dict(parse_qsl(urlsplit(self.path).query))
+                stub.requests.append(params)
+                body = json.dumps(stub.candidates(params) if stub.status == 200 else {}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
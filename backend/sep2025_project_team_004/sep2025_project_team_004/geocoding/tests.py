@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from sep2025_project_team_004.geocoding import geocoder
+from sep2025_project_team_004.geocoding.models import GeocodedAddress
+from sep2025_project_team_004.geocoding.testing import StubGeocoder
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class GeocoderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = self.enterContext(StubGeocoder({"123 Main St": (41.6611, -91.5302)}))
+        self.enterContext(override_settings(GEOCODING_URL=self.stub.url))
+
+    def test_repeat_addresses_are_answered_from_the_cache_and_the_table(self):
+        location = geocoder.lookup("123 Main St", "Iowa City", "IA")
+        self.assertEqual((location.delivery_line_1, location.city, location.state), ("123 Main St", "Iowa City", "IA"))
+        self.assertEqual(float(location.latitude), 41.6611)
+        self.assertEqual(len(self.stub.requests), 1)
+
+        with self.assertNumQueries(0):
+            again = geocoder.lookup("  123 MAIN st. ", "iowa city", "ia")
+        self.assertEqual(again.delivery_line_1, "123 Main St")
+
+        cache.clear()
+        self.assertEqual(geocoder.lookup("123 Main St", "Iowa City", "IA").pk, location.pk)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(GeocodedAddress.objects.count(), 1)
+
+    def test_unknown_addresses_are_remembered_as_not_found(self):
+        self.assertIsNone(geocoder.lookup("1 Nowhere Rd"))
+        self.assertIsNone(geocoder.lookup("1 nowhere rd"))
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertIs(geocoder.cached("1 Nowhere Rd"), geocoder.NOT_FOUND)
+        self.assertFalse(GeocodedAddress.objects.exists())
+
+    def test_failures_raise_and_are_not_cached(self):
+        self.stub.status = 500
+        with self.assertRaises(geocoder.GeocodingError):
+            geocoder.lookup("123 Main St")
+        self.stub.status = 200
+        self.assertIsNotNone(geocoder.lookup("123 Main St"))
+
+    def test_normalize(self):
+        self.assertEqual(geocoder.normalize("123  Main St.,", "Iowa City", "IA", "52242"), "123 main st|iowa city|ia|52242")
+        self.assertEqual(geocoder.normalize("Apt #4, 5 Elm"), "apt #4 5 elm")
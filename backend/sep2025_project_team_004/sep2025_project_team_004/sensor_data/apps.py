@@ -6,6 +6,7 @@ class SensorDataConfig(AppConfig):
     name = 'sep2025_project_team_004.sensor_data'
 
     def ready(self):
+        from . import signals  # noqa: F401
         from .tasks_setup import setup_periodic_tasks
         try:
             setup_periodic_tasks()
@@ -0,0 +1,235 @@
+"""Parquet archives of closed sensor-weeks.
+
+Each closed ISO week of a sensor's readings is compacted into one
+zstd-compressed Parquet file in the SENSOR_ARCHIVE_STORAGE storage and recorded
+in SensorReadingArchive. History reads go through iter_history(), which serves
+archived weeks from their files (memory-mapped, filtered to the requested
+range) and every other week from sensor_readings.
+
+Readings can still arrive for a week after it was archived. Its weekly rollup
+then counts more datapoints than the archive holds, which puts the week back
+in pending_weeks(), and the next run archives it again with the late rows.
+"""
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .export import EXPORT_COLUMNS, export_rows
+from .models import SensorReading, SensorReadingArchive, SensorRollup
+from .rollups import bucket_start
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.int64()),  # of the sensor_readings row, which keyset paging goes by
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('temperature', pa.float64()),
+    ('pressure', pa.float64()),
+    ('humidity', pa.float64()),
+    ('vcc', pa.int32()),
+])
+ARCHIVE_COLUMNS = ARCHIVE_SCHEMA.names
+ARCHIVE_PREFIX = 'sensor_archives'
+WEEK = datetime.timedelta(weeks=1)
+DELETE_BATCH = 5000  # rows read, and deleted, per query
+
+
+def _storage():
+    return storages[settings.SENSOR_ARCHIVE_STORAGE]
+
+
+def archive_name(sensor_id, week_start):
+    iso = week_start.isocalendar()
+    return f"{ARCHIVE_PREFIX}/{sensor_id}/{iso.year}-W{iso.week:02d}.parquet"
+
+
+def archive_week(sensor_id, week_start):
+    """Writes one sensor-week to Parquet and records it in the manifest.
+
+    Returns the SensorReadingArchive entry, or None if the week has no
+    readings. Re-archiving a week replaces its file; if the rows of the
+    previous archive were deleted from sensor_readings, they are read back from
+    it and merged with the rows that arrived since, which are then deleted too.
+    Only the rows that were read are deleted, by id: a reading arriving for the
+    week while it is being archived stays for the next run.
+    """
+    week_end = week_start + WEEK
+    iso = week_start.isocalendar()
+    readings = SensorReading.objects.filter(
+        sensor_id=sensor_id, timestamp__gte=week_start, timestamp__lt=week_end,
+    ).order_by('timestamp', 'id')
+    previous = SensorReadingArchive.objects.filter(sensor_id=sensor_id, year=iso.year, week_number=iso.week).first()
+    delete_rows = settings.SENSOR_ARCHIVE_DELETE_ROWS or (previous is not None and previous.rows_deleted)
+
+    columns = {name: [] for name in ARCHIVE_COLUMNS}
+    for row in readings.values_list(*ARCHIVE_COLUMNS).iterator(chunk_size=DELETE_BATCH):
+        for name, value in zip(ARCHIVE_COLUMNS, row):
+            columns[name].append(value)
+    ids = columns['id']
+    table = pa.table(columns, schema=ARCHIVE_SCHEMA)
+    if previous is not None and previous.rows_deleted:
+        table = pa.concat_tables([read_archive(previous, week_start, week_end), table])
+        table = table.take(pc.sort_indices(table, [('timestamp', 'ascending'), ('id', 'ascending')]))
+    row_count = table.num_rows
+    if not row_count:
+        return None
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression='zstd')
+    data = sink.getvalue().to_pybytes()
+
+    storage = _storage()
+    name = archive_name(sensor_id, week_start)
+    if storage.exists(name):
+        storage.delete(name)
+    name = storage.save(name, ContentFile(data))
+    _drop_local_copy(name)
+
+    with transaction.atomic():
+        entry, _ = SensorReadingArchive.objects.update_or_create(
+            sensor_id=sensor_id, year=iso.year, week_number=iso.week,
+            defaults={
+                'period_start': week_start,
+                'period_end': week_end,
+                'file': name,
+                'row_count': row_count,
+                'size_bytes': len(data),
+                'rows_deleted': delete_rows,
+            },
+        )
+        if delete_rows:
+            for start in range(0, len(ids), DELETE_BATCH):
+                SensorReading.objects.filter(id__in=ids[start:start + DELETE_BATCH]).delete()
+    logger.info(f"Archived {row_count} readings of {sensor_id} {iso.year}W{iso.week:02d} to {name} ({len(data)} bytes).")
+    return entry
+
+
+def pending_weeks(cutoff):
+    """(sensor_id, week_start) pairs with readings before `cutoff` that are not archived, or not all of them.
+
+    Uses the weekly rollups as the index of which sensor-weeks hold data, so
+    finding work never scans sensor_readings: a week is archived once its
+    archive holds at least as many rows as its rollup counts datapoints.
+    """
+    archived = SensorReadingArchive.objects.filter(
+        sensor_id=OuterRef('sensor_id'), period_start=OuterRef('bucket_start'), row_count__gte=OuterRef('datapoints'),
+    )
+    return (
+        SensorRollup.objects
+        .filter(resolution=SensorRollup.WEEK, bucket_start__lte=cutoff - WEEK)
+        .filter(datapoints__gt=0)
+        .exclude(Exists(archived))
+        .order_by('bucket_start', 'sensor_id')
+        .values_list('sensor_id', 'bucket_start')
+    )
+
+
+def archive_closed_weeks(now=None, hot_weeks=None, limit=500):
+    """Archives up to `limit` sensor-weeks that ended more than `hot_weeks` weeks ago."""
+    hot_weeks = settings.SENSOR_ARCHIVE_HOT_WEEKS if hot_weeks is None else hot_weeks
+    cutoff = bucket_start(now or timezone.now(), SensorRollup.WEEK) - hot_weeks * WEEK
+    entries = []
+    for sensor_id, week_start in pending_weeks(cutoff)[:limit]:
+        entry = archive_week(sensor_id, week_start)
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def _cache_path(name):
+    cache_dir = settings.SENSOR_ARCHIVE_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'sensor_archives')
+    return os.path.join(cache_dir, name)
+
+
+def _drop_local_copy(name):
+    """Removes the cached copy of a remote archive that was just rewritten."""
+    try:
+        os.remove(_cache_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def _local_path(name):
+    """Filesystem path of an archive; archives not on local disk (e.g. S3) are copied into the cache dir once."""
+    storage = _storage()
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path and os.path.exists(path):
+        return path
+    path = _cache_path(name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.part"
+        with storage.open(name, 'rb') as src, open(partial, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(partial, path)
+    return path
+
+
+def read_archive(entry, start, end):
+    """Returns the rows of an archive within [start, end) as an Arrow table, reading the file via mmap."""
+    return pq.read_table(
+        _local_path(entry.file),
+        memory_map=True,
+        filters=[('timestamp', '>=', start), ('timestamp', '<', end)],
+    )
+
+
+def _archive_rows(sensor_id, table, batch_size, columns):
+    for batch in table.to_batches(max_chunksize=batch_size):
+        values = [
+            [sensor_id] * batch.num_rows if name == 'sensor_id' else batch.column(name).to_pylist()
+            for name in columns
+        ]
+        yield from zip(*values)
+
+
+def _db_rows(sensor_id, start, end, columns):
+    readings = SensorReading.objects.filter(
+        sensor_id=sensor_id, timestamp__gte=start, timestamp__lt=end,
+    ).order_by('timestamp', 'id')
+    return export_rows(readings, columns)
+
+
+def iter_history(sensor_id, start, end, batch_size=5000, columns=EXPORT_COLUMNS):
+    """Yields a sensor's readings in [start, end) in (timestamp, id) order, as tuples of `columns`.
+
+    `columns` are sensor_id and ARCHIVE_COLUMNS names. Archived weeks come from
+    their Parquet files; runs of weeks that are not archived are read from
+    sensor_readings with one query each.
+    """
+    archives = {
+        entry.period_start: entry
+        for entry in SensorReadingArchive.objects.filter(
+            sensor_id=sensor_id, period_end__gt=start, period_start__lt=end,
+        )
+    }
+    db_from = None
+    week = bucket_start(start, SensorRollup.WEEK)
+    while week < end:
+        entry = archives.get(week)
+        if entry is None:
+            db_from = db_from or max(week, start)
+        else:
+            if db_from:
+                yield from _db_rows(sensor_id, db_from, week, columns)
+                db_from = None
+            table = read_archive(entry, max(week, start), min(week + WEEK, end))
+            yield from _archive_rows(sensor_id, table, batch_size, columns)
+        week += WEEK
+    if db_from:
+        yield from _db_rows(sensor_id, db_from, end, columns)
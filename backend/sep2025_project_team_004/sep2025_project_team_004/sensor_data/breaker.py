@@ -0,0 +1,159 @@
+"""Circuit breaker for the ESMC upstream, shared by every process through the cache.
+
+Every upstream request goes through upstream.get_sensor(), which asks allow()
+first and reports the outcome with record_success() / record_failure(). A
+failure is a timeout, a connection error or a 5xx answer; any other answer
+shows the upstream is up and counts as a success.
+
+    closed     requests go through; SENSOR_BREAKER_FAILURES failures in a row
+               open the breaker
+    open       requests fail fast with CircuitOpen for
+               SENSOR_BREAKER_RESET_TIMEOUT seconds, without touching the network
+    half_open  after that, one probe request at a time goes through: a success
+               closes the breaker, a failure opens it again
+
+The state lives in three keys, so all web and worker processes see the same
+breaker: the failure count, the time the breaker opened (present until it
+closes) and the probe lock, a cache.add() (SET NX in Redis) that expires
+after PROBE_TIMEOUT seconds so a crashed probe cannot hold the breaker
+half-open.
+
+Counters of successes, failures, rejected requests and state changes, and a
+histogram of upstream response times, are kept next to it; stats() reports
+them with the current state.
+"""
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+FAILURES_KEY = "upstream:breaker:failures"
+OPENED_KEY = "upstream:breaker:opened"
+PROBE_KEY = "upstream:breaker:probe"
+STATE_TIMEOUT = 24 * 60 * 60
+PROBE_TIMEOUT = 30  # seconds a probe may take before another request probes instead
+COUNTERS = ('successes', 'failures', 'rejected', 'opened', 'closed')
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # upper bounds in seconds; slower responses go to "inf"
+
+_UNKNOWN = object()
+
+
+class CircuitOpen(requests.RequestException):
+    """The upstream breaker is open: the request was not sent."""
+
+
+def metric_key(name):
+    return f"upstream:metrics:{name}"
+
+
+def _bucket(elapsed):
+    return next((f"le_{bound}" for bound in LATENCY_BUCKETS if elapsed <= bound), "le_inf")
+
+
+def _incr(name, delta=1):
+    key = metric_key(name)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Missing: create it, unless another process just did
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def _observe(outcome, elapsed):
+    _incr(outcome)
+    _incr(_bucket(elapsed))
+    _incr('latency_ms', round(elapsed * 1000))
+
+
+def state(opened_at=_UNKNOWN, now=None):
+    """'closed', 'open' or 'half_open'; `opened_at` is read from the cache unless given."""
+    if opened_at is _UNKNOWN:
+        opened_at = cache.get(OPENED_KEY)
+    if opened_at is None:
+        return 'closed'
+    if (now or time.time()) < opened_at + settings.SENSOR_BREAKER_RESET_TIMEOUT:
+        return 'open'
+    return 'half_open'
+
+
+def is_open():
+    """True while requests would fail fast (a half-open breaker lets a probe through)."""
+    return state() == 'open'
+
+
+def retry_after():
+    """Seconds until an open breaker lets a probe through (0 unless it is open)."""
+    opened_at = cache.get(OPENED_KEY)
+    if opened_at is None:
+        return 0
+    return max(opened_at + settings.SENSOR_BREAKER_RESET_TIMEOUT - time.time(), 0)
+
+
+def allow():
+    """Whether an upstream request may be sent now; counts it as rejected if not."""
+    current = state()
+    if current == 'closed' or (current == 'half_open' and cache.add(PROBE_KEY, True, PROBE_TIMEOUT)):
+        return True
+    _incr('rejected')
+    return False
+
+
+def record_success(elapsed):
+    _observe('successes', elapsed)
+    values = cache.get_many([FAILURES_KEY, OPENED_KEY])
+    if OPENED_KEY in values:
+        cache.delete_many([OPENED_KEY, PROBE_KEY, FAILURES_KEY])
+        _incr('closed')
+        logger.info("ESMC upstream answered again, circuit closed")
+    elif values.get(FAILURES_KEY):
+        cache.delete(FAILURES_KEY)
+
+
+def record_failure(elapsed):
+    _observe('failures', elapsed)
+    now = time.time()
+    opened_at = cache.get(OPENED_KEY)
+    if opened_at is not None:
+        if state(opened_at, now) == 'half_open':
+            # The probe failed: open again for another reset timeout
+            cache.set(OPENED_KEY, now, STATE_TIMEOUT)
+            cache.delete(PROBE_KEY)
+            _incr('opened')
+            logger.warning("ESMC upstream probe failed, circuit open again")
+        return
+    try:
+        failures = cache.incr(FAILURES_KEY)
+    except ValueError:
+        failures = 1 if cache.add(FAILURES_KEY, 1, STATE_TIMEOUT) else cache.incr(FAILURES_KEY)
+    if failures >= settings.SENSOR_BREAKER_FAILURES and cache.add(OPENED_KEY, now, STATE_TIMEOUT):
+        _incr('opened')
+        logger.warning(f"ESMC upstream failed {failures} times in a row, circuit open")
+
+
+def stats():
+    """The breaker state and its upstream request counters and timings."""
+    bucket_names = [_bucket(bound) for bound in LATENCY_BUCKETS] + ['le_inf']
+    values = cache.get_many(
+        [OPENED_KEY, FAILURES_KEY] + [metric_key(name) for name in COUNTERS + ('latency_ms', *bucket_names)]
+    )
+    buckets = {name: values.get(metric_key(name), 0) for name in bucket_names}
+    timed = sum(buckets.values())
+    opened_at = values.get(OPENED_KEY)
+    now = time.time()
+    return {
+        'state': state(opened_at, now),
+        'consecutive_failures': values.get(FAILURES_KEY, 0),
+        'opened_at': opened_at,
+        'retry_after': 0 if opened_at is None else max(opened_at + settings.SENSOR_BREAKER_RESET_TIMEOUT - now, 0),
+        **{name: values.get(metric_key(name), 0) for name in COUNTERS},
+        'latency': {
+            'count': timed,
+            'mean_ms': values.get(metric_key('latency_ms'), 0) / timed if timed else None,
+            'buckets': buckets,  # responses per response time bucket (upper bound in seconds)
+        },
+    }
@@ -0,0 +1,131 @@
+"""Server-side downsampling of reading rows for chart-sized responses.
+
+Both functions take rows in timestamp order plus accessors for the x value
+(seconds) and the y value of the charted metric, and return a subset of the
+original rows, so every returned point is a real reading. They split
+[start, end) into equal time buckets and only hold a few rows per bucket, so
+the rows can be streamed straight from a database cursor whatever the size
+of the range.
+
+Rows with a null y cannot be charted, but a bucket holding nothing else keeps
+its first row, so the chart shows a gap there rather than a line across it.
+"""
+
+
+def _bucket_index(start, end, buckets):
+    width = (end - start) / buckets
+
+    def index(value):
+        return min(max(int((value - start) / width), 0), buckets - 1)
+    return index
+
+
+def _with_gaps(sampled, gaps, x):
+    return sorted(sampled + list(gaps.values()), key=x)
+
+
+def lttb(rows, threshold, start, end, x, y):
+    """Largest-Triangle-Three-Buckets: keeps at most `threshold` rows that best preserve the visual shape.
+
+    `rows` is a callable returning a fresh iterable of the rows, which are read
+    twice. The first pass finds the first and last rows and the average of
+    each of the threshold - 2 time buckets; the second keeps the first and last
+    rows and, from each bucket, the row forming the largest triangle with the
+    previously kept row and the average of the next non-empty bucket. Only the
+    per-bucket sums stay in memory.
+
+    The second pass should see the rows of the first; the caller bounds it (a
+    database cursor is a new query). Rows it sees beyond the first pass's count,
+    or in a bucket the first pass found empty, are skipped.
+    """
+    buckets = max(threshold - 2, 1)
+    index = _bucket_index(start, end, buckets)
+    count = 0
+    first = last = None
+    sums = {}  # bucket -> [sum of x, sum of y, rows]
+    gaps = {}  # bucket -> its first row, while it has no y
+    for row in rows():
+        value = y(row)
+        bucket = index(x(row))
+        if value is None:
+            gaps.setdefault(bucket, row)
+            continue
+        count += 1
+        first = first or row
+        last = row
+        totals = sums.setdefault(bucket, [0.0, 0.0, 0])
+        totals[0] += x(row)
+        totals[1] += value
+        totals[2] += 1
+    gaps = {bucket: row for bucket, row in gaps.items() if bucket not in sums}
+    if count <= 2 or threshold <= 2:
+        return _with_gaps([first, last][:min(count, threshold)], gaps, x)[:max(threshold, 0)]
+
+    order = sorted(sums)
+    targets = {}
+    for bucket, following in zip(order, order[1:] + [None]):
+        if following is None:
+            targets[bucket] = (x(last), y(last))
+        else:
+            sum_x, sum_y, rows_in = sums[following]
+            targets[bucket] = (sum_x / rows_in, sum_y / rows_in)
+
+    sampled = [first]
+    ax, ay = x(first), y(first)
+    current = chosen = None
+    max_area = -1.0
+    position = 0
+    for row in rows():
+        value = y(row)
+        if value is None:
+            continue
+        position += 1
+        if position >= count:
+            break  # the last row is kept anyway
+        if position == 1:
+            continue  # so is the first
+        row_x = x(row)
+        bucket = index(row_x)
+        if bucket not in targets:
+            continue
+        if bucket != current:
+            if chosen is not None:
+                sampled.append(chosen)
+                ax, ay = x(chosen), y(chosen)
+            current, chosen, max_area = bucket, None, -1.0
+        tx, ty = targets[bucket]
+        area = abs((ax - tx) * (value - ay) - (ax - row_x) * (ty - ay))
+        if area > max_area:
+            max_area, chosen = area, row
+    if chosen is not None and chosen != last:
+        sampled.append(chosen)
+    sampled.append(last)
+    return _with_gaps(sampled, gaps, x)
+
+
+def min_max_buckets(rows, start, end, max_points, x, y):
+    """Splits [start, end) (in seconds) into max_points // 2 equal time buckets and keeps each bucket's min and max row.
+
+    Works on any iterable in one pass, holding only two rows per bucket.
+    """
+    buckets = max(max_points // 2, 1)
+    index = _bucket_index(start, end, buckets)
+    extremes = {}
+    gaps = {}
+    for row in rows:
+        value = y(row)
+        bucket = index(x(row))
+        if value is None:
+            gaps.setdefault(bucket, row)
+            continue
+        low, high = extremes.get(bucket, (row, row))
+        if value < y(low):
+            low = row
+        if value > y(high):
+            high = row
+        extremes[bucket] = (low, high)
+
+    sampled = []
+    for low, high in extremes.values():
+        sampled.extend([low] if low is high else [low, high])
+    return _with_gaps(sampled, {bucket: row for bucket, row in gaps.items() if bucket not in extremes}, x)
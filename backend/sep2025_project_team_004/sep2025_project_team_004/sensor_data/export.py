@@ -0,0 +1,72 @@
+"""Chunked CSV/NDJSON encoders for streaming sensor history downloads.
+
+Everything here is a generator: rows are pulled from the database with
+QuerySet.iterator(), which uses a named server-side cursor on Postgres, and
+written out EXPORT_CHUNK_SIZE rows at a time, so memory stays flat whatever
+the size of the export.
+"""
+import csv
+import io
+import json
+import zlib
+
+EXPORT_COLUMNS = ('timestamp', 'sensor_id', 'temperature', 'pressure', 'humidity', 'vcc')
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_rows(queryset, columns=EXPORT_COLUMNS):
+    """Yields value tuples in `columns` order, fetched EXPORT_CHUNK_SIZE rows at a time."""
+    return queryset.values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _chunked(rows, make_writer, header=None):
+    # make_writer(buffer) returns the function that appends one row to buffer
+    buffer = io.StringIO()
+    write_row = make_writer(buffer)
+    if header:
+        buffer.write(header)
+    for count, row in enumerate(rows, 1):
+        write_row(row)
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def csv_chunks(rows):
+    """CSV with a header line; timestamps in ISO 8601, missing metrics as empty fields."""
+    def make_writer(buffer):
+        writer = csv.writer(buffer)
+        return lambda row: writer.writerow((row[0].isoformat(), *row[1:]))
+
+    return _chunked(rows, make_writer, header=','.join(EXPORT_COLUMNS) + '\r\n')
+
+
+def ndjson_chunks(rows):
+    """One JSON object per line."""
+    def make_writer(buffer):
+        def write_row(row):
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record['timestamp'] = row[0].isoformat()
+            buffer.write(json.dumps(record))
+            buffer.write('\n')
+        return write_row
+
+    return _chunked(rows, make_writer)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compresses a stream of text chunks into a single gzip member on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,98 @@
+"""Incremental JSON parsing over a stream of byte chunks.
+
+JSONStream keeps only the unparsed tail of the input in memory and decodes
+one value at a time with json.JSONDecoder.raw_decode, so a caller can walk a
+large document (e.g. an upstream response read with iter_content) and stop
+reading as soon as it has what it needs.
+"""
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class JSONStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Appends the next chunk to the buffer; returns False at the end of the input."""
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk)
+            if text:
+                self._buffer = self._buffer[self._pos:] + text
+                self._pos = 0
+                return True
+        self._eof = True
+        return False
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            buffer, pos = self._buffer, self._pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def accept(self, char):
+        if self.peek() == char:
+            self._pos += 1
+            return True
+        return False
+
+    def expect(self, char):
+        if not self.accept(char):
+            raise ValueError(f"Expected {char!r} in JSON input, got {self.peek()!r}")
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number that ends the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_object(stream):
+    """Yields the keys of the object at the stream's position; the caller consumes each value before the next key."""
+    stream.expect('{')
+    if stream.accept('}'):
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        yield key
+        if not stream.accept(','):
+            stream.expect('}')
+            return
+
+
+def iter_array(stream):
+    """Yields the items of the array at the stream's position, one decoded value at a time."""
+    stream.expect('[')
+    if stream.accept(']'):
+        return
+    while True:
+        yield stream.value()
+        if not stream.accept(','):
+            stream.expect(']')
+            return
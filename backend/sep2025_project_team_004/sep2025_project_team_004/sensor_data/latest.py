@@ -0,0 +1,127 @@
+"""Latest reading per sensor: the sensor_latest table behind a Redis hash.
+
+A reading is a dict of its timestamp (epoch seconds) and POINT_FIELDS values.
+record() stores the newest readings of a batch of sensors in both places,
+each only if it is newer than the one already there, so writers racing each
+other never go back in time:
+
+- sensor_latest (SensorLatest), one row per sensor, with one
+  INSERT ... ON CONFLICT DO UPDATE ... WHERE;
+- the hash under HASH_KEY, field sensor_id, value the reading as JSON, with
+  one Lua script call (RECORD_SCRIPT).
+
+The refresh tasks record the newest point of every payload they store (see
+upstream.store_payload), and sensor_data_processor records the newest
+reading of every batch it ingests; scheduler_backend updates the hash only.
+get_many() reads the hash with one HMGET and falls back to the table for the
+sensors it misses, copying them into the hash. Without a Redis cache (tests)
+it reads the table.
+"""
+import datetime
+import json
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import SensorLatest
+from .series import POINT_FIELDS
+
+HASH_KEY = "sensors:latest"
+COLUMNS = dict(zip(POINT_FIELDS, (
+    'temperature', 'humidity', 'pressure', 'soil_moisture_20', 'soil_moisture_5', 'soil_temperature', 'vcc',
+)))
+
+# KEYS[1] the hash; ARGV (sensor_id, timestamp, reading JSON) triples.
+# A reading replaces the sensor's field only if it is newer.
+RECORD_SCRIPT = """
+local written = 0
+for i = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or tonumber(cjson.decode(current)['timestamp']) < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+        written = written + 1
+    end
+end
+return written
+"""
+
+UPSERT_SQL = """
+INSERT INTO sensor_latest (sensor_id, timestamp, {columns}, updated_at)
+VALUES (%s, %s, {placeholders}, %s)
+ON CONFLICT (sensor_id) DO UPDATE SET
+    timestamp = excluded.timestamp, {updates}, updated_at = excluded.updated_at
+WHERE sensor_latest.timestamp < excluded.timestamp
+""".format(
+    columns=', '.join(COLUMNS.values()),
+    placeholders=', '.join(['%s'] * len(COLUMNS)),
+    updates=', '.join(f"{column} = excluded.{column}" for column in COLUMNS.values()),
+)
+
+
+def _redis():
+    """The Redis client behind the default cache, or None if the cache is not Redis."""
+    from django_redis import get_redis_connection
+
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        return None
+
+
+def _store_in_hash(client, readings):
+    args = []
+    for sensor_id, reading in readings.items():
+        args += [sensor_id, reading['timestamp'], json.dumps(reading)]
+    if args:
+        client.eval(RECORD_SCRIPT, 1, HASH_KEY, *args)
+
+
+def _from_row(row):
+    return {'timestamp': row.timestamp.timestamp(), **{field: getattr(row, column) for field, column in COLUMNS.items()}}
+
+
+def record(readings):
+    """Stores {sensor_id: reading} wherever each reading is newer; None readings are skipped."""
+    readings = {
+        sensor_id: {'timestamp': reading['timestamp'], **{field: reading.get(field) for field in COLUMNS}}
+        for sensor_id, reading in readings.items() if reading is not None
+    }
+    if not readings:
+        return
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = [
+        (
+            sensor_id,
+            connection.ops.adapt_datetimefield_value(
+                datetime.datetime.fromtimestamp(reading['timestamp'], datetime.timezone.utc)
+            ),
+            *(reading.get(field) for field in COLUMNS),
+            now,
+        )
+        for sensor_id, reading in sorted(readings.items())
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(UPSERT_SQL, rows)
+    client = _redis()
+    if client is not None:
+        _store_in_hash(client, readings)
+
+
+def get_many(sensor_ids):
+    """{sensor_id: reading} for the sensors of `sensor_ids` that have one."""
+    sensor_ids = list(dict.fromkeys(sensor_ids))
+    if not sensor_ids:
+        return {}
+    client = _redis()
+    found = {}
+    if client is not None:
+        for sensor_id, value in zip(sensor_ids, client.hmget(HASH_KEY, sensor_ids)):
+            if value is not None:
+                found[sensor_id] = json.loads(value)
+    missing = [sensor_id for sensor_id in sensor_ids if sensor_id not in found]
+    if missing:
+        from_table = {row.sensor_id: _from_row(row) for row in SensorLatest.objects.filter(sensor_id__in=missing)}
+        if client is not None:
+            _store_in_hash(client, from_table)
+        found.update(from_table)
+    return found
@@ -0,0 +1,150 @@
+"""Per-process L1 cache in front of Redis for hot sensor keys.
+
+Most sensor_data_api traffic goes to a handful of sensors (the default
+favorites), so each web process keeps the values it last read from Redis in
+a small LRU bounded by SENSOR_L1_MAX_BYTES. For SENSOR_L1_TTL seconds after a
+read an entry is served without touching Redis at all. After that it is
+revalidated against the sensor's version key, a short string the refresh
+tasks rewrite (last, in the same set_many) whenever they write the sensor's
+payload; only if the version moved is the full value fetched again. A
+refresh is therefore visible within SENSOR_L1_TTL seconds, and an unchanged
+value is never transferred or unpickled twice.
+
+stats() reports the hits, revalidations and misses of this process.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .responses import version_key
+
+
+def _sizeof(value):
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class LocalCache:
+    """A thread-safe LRU of (value, version) bounded by the total size of the values."""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> [value, version, size, fresh_until]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.revalidations = self.misses = self.evictions = 0
+
+    def lookup(self, key, now):
+        """Returns (value, version, fresh) for a cached key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1], now < entry[3]
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def renew(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[3] = now + self.ttl
+
+    def store(self, key, value, version, now):
+        size = _sizeof(value)
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = [value, version, size, now + self.ttl]
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.revalidations = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.revalidations + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                # revalidated entries were served from memory too, after one small GET
+                'hit_ratio': (self.hits + self.revalidations) / lookups if lookups else None,
+            }
+
+
+_local_cache = None
+_local_cache_lock = threading.Lock()
+
+
+def local_cache():
+    """The LocalCache of this process, created on first use from the settings."""
+    global _local_cache
+    if _local_cache is None:
+        with _local_cache_lock:
+            if _local_cache is None:
+                _local_cache = LocalCache(settings.SENSOR_L1_MAX_BYTES, settings.SENSOR_L1_TTL)
+    return _local_cache
+
+
+def get(sensor_id, key):
+    """cache.get(key) for one of a sensor's keys, answered from the L1 while it is current."""
+    if not settings.SENSOR_L1_CACHE:
+        return cache.get(key)
+    l1 = local_cache()
+    now = time.monotonic()
+    cached = l1.lookup(key, now)
+    if cached is not None:
+        value, version, fresh = cached
+        if fresh:
+            l1.record('hits')
+            return value
+        if version is not None and cache.get(version_key(sensor_id)) == version:
+            l1.renew(key, now)
+            l1.record('revalidations')
+            return value
+
+    l1.record('misses')
+    values = cache.get_many([key, version_key(sensor_id)])
+    value = values.get(key)
+    if value is None:
+        l1.discard(key)
+    else:
+        l1.store(key, value, values.get(version_key(sensor_id)), now)
+    return value
+
+
+def stats():
+    return local_cache().stats()
@@ -0,0 +1,68 @@
+# To run this, use:
+# python manage.py backfill_sensor_rollups --since 2025-01-01
+# python manage.py backfill_sensor_rollups --sensor usda-air-w05 --resolution day --chunk-days 30
+
+# sensor_data/management/commands/backfill_sensor_rollups.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+
+from sep2025_project_team_004.sensor_data.models import SensorReading
+from sep2025_project_team_004.sensor_data.rollups import RESOLUTION_NAMES, backfill_rollups
+
+
+def _parse_when(value):
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date/time: {value}")
+        when = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when, datetime.timezone.utc)
+    return when
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly/daily/weekly/monthly sensor rollups from sensor_readings, in bucket-aligned chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', help='Only rebuild this sensor ID (default: all sensors)')
+        parser.add_argument(
+            '--resolution', action='append', choices=RESOLUTION_NAMES,
+            help='Resolution to rebuild; repeat for several (default: all)',
+        )
+        parser.add_argument('--since', help='Start date/time, UTC (default: oldest reading)')
+        parser.add_argument('--until', help='End date/time, UTC, exclusive (default: newest reading)')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days of readings aggregated per query')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError("--chunk-days must be at least 1")
+
+        readings = SensorReading.objects.all()
+        if options['sensor']:
+            readings = readings.filter(sensor_id=options['sensor'])
+        bounds = readings.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        if bounds['first'] is None:
+            self.stdout.write("No readings to roll up.")
+            return
+
+        start = _parse_when(options['since']) if options['since'] else bounds['first']
+        end = _parse_when(options['until']) if options['until'] else bounds['last'] + datetime.timedelta(microseconds=1)
+        if start >= end:
+            raise CommandError("--since must be before --until")
+
+        chunk = datetime.timedelta(days=options['chunk_days'])
+        for resolution in options['resolution'] or RESOLUTION_NAMES:
+            total = 0
+            for chunk_start, chunk_end, written in backfill_rollups(
+                resolution, start, end, sensor_id=options['sensor'], chunk=chunk
+            ):
+                total += written
+                self.stdout.write(f"{resolution}: {chunk_start:%Y-%m-%d %H:%M} - {chunk_end:%Y-%m-%d %H:%M} -> {written} buckets")
+            self.stdout.write(self.style.SUCCESS(f"{resolution}: rebuilt {total} buckets"))
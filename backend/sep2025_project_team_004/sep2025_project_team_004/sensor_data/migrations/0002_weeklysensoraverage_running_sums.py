@@ -0,0 +1,97 @@
+# Generated by Django 5.0.12 on 2026-10-17 22:31
+
+from django.db import migrations, models
+from django.db.models import Case, F, FloatField, When
+from django.db.models.functions import Cast
+
+METRICS = ("temperature", "pressure", "humidity", "vcc")
+
+
+def averages_to_sums(apps, schema_editor):
+    # The old averages were all divided by the shared datapoints count, so that
+    # is the best available count for every non-null metric.
+    WeeklySensorAverage = apps.get_model("sensor_data", "WeeklySensorAverage")
+    for metric in METRICS:
+        WeeklySensorAverage.objects.filter(**{f"avg_{metric}__isnull": False}).update(**{
+            f"sum_{metric}": F(f"avg_{metric}") * F("datapoints"),
+            f"count_{metric}": F("datapoints"),
+        })
+
+
+def sums_to_averages(apps, schema_editor):
+    WeeklySensorAverage = apps.get_model("sensor_data", "WeeklySensorAverage")
+    WeeklySensorAverage.objects.update(**{
+        f"avg_{metric}": Case(
+            When(**{f"count_{metric}__gt": 0},
+                 then=F(f"sum_{metric}") / Cast(f"count_{metric}", FloatField())),
+            default=None,
+        )
+        for metric in METRICS
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensor_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='count_humidity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='count_pressure',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='count_temperature',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='count_vcc',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='sum_humidity',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='sum_pressure',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='sum_temperature',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysensoraverage',
+            name='sum_vcc',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(averages_to_sums, sums_to_averages),
+        migrations.RemoveField(
+            model_name='weeklysensoraverage',
+            name='avg_humidity',
+        ),
+        migrations.RemoveField(
+            model_name='weeklysensoraverage',
+            name='avg_pressure',
+        ),
+        migrations.RemoveField(
+            model_name='weeklysensoraverage',
+            name='avg_temperature',
+        ),
+        migrations.RemoveField(
+            model_name='weeklysensoraverage',
+            name='avg_vcc',
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.12 on 2026-10-17 22:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensor_data', '0002_weeklysensoraverage_running_sums'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(max_length=50)),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily'), ('week', 'Weekly'), ('month', 'Monthly')], max_length=5)),
+                ('bucket_start', models.DateTimeField()),
+                ('count_temperature', models.PositiveIntegerField(default=0)),
+                ('sum_temperature', models.FloatField(default=0)),
+                ('sum_sq_temperature', models.FloatField(default=0)),
+                ('min_temperature', models.FloatField(blank=True, null=True)),
+                ('max_temperature', models.FloatField(blank=True, null=True)),
+                ('count_pressure', models.PositiveIntegerField(default=0)),
+                ('sum_pressure', models.FloatField(default=0)),
+                ('sum_sq_pressure', models.FloatField(default=0)),
+                ('min_pressure', models.FloatField(blank=True, null=True)),
+                ('max_pressure', models.FloatField(blank=True, null=True)),
+                ('count_humidity', models.PositiveIntegerField(default=0)),
+                ('sum_humidity', models.FloatField(default=0)),
+                ('sum_sq_humidity', models.FloatField(default=0)),
+                ('min_humidity', models.FloatField(blank=True, null=True)),
+                ('max_humidity', models.FloatField(blank=True, null=True)),
+                ('count_vcc', models.PositiveIntegerField(default=0)),
+                ('sum_vcc', models.FloatField(default=0)),
+                ('sum_sq_vcc', models.FloatField(default=0)),
+                ('min_vcc', models.FloatField(blank=True, null=True)),
+                ('max_vcc', models.FloatField(blank=True, null=True)),
+                ('datapoints', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'sensor_rollups',
+                'ordering': ['sensor_id', 'resolution', 'bucket_start'],
+                'unique_together': {('sensor_id', 'resolution', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,135 @@
+"""Rebuilds sensor_readings as a table range-partitioned by month on `timestamp`.
+
+Postgres only; on any other backend (e.g. the SQLite test database) this is a
+no-op and the model keeps its plain table. The SensorReading model itself is
+unchanged, so there is no state operation. Postgres requires the primary key
+of a partitioned table to contain the partition key, so it becomes
+(id, timestamp); ids keep coming from a single sequence and stay unique.
+
+Existing rows are copied into the new partitions, so the migration holds an
+exclusive lock for as long as that copy takes.
+"""
+import datetime
+
+from django.db import migrations
+
+# Months created ahead of the newest reading; the beat task keeps this going afterwards
+PREMAKE_MONTHS = 3
+
+COLUMNS = 'id, "timestamp", sensor_id, temperature, pressure, humidity, vcc'
+
+
+def _month_start(ts):
+    ts = ts.astimezone(datetime.timezone.utc)
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_month(start):
+    return (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _copy_indexes(cur, table):
+    # Everything except the primary key, so the parent keeps the names Django generated
+    cur.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+        [table, f'{table}_pkey'],
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def partition_sensor_readings(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cur:
+        index_defs = _copy_indexes(cur, 'sensor_readings')
+        cur.execute('SELECT min("timestamp"), max("timestamp"), max(id) FROM sensor_readings')
+        first, last, max_id = cur.fetchone()
+
+        cur.execute('ALTER TABLE sensor_readings RENAME TO sensor_readings_unpartitioned')
+        cur.execute('CREATE SEQUENCE sensor_readings_partitioned_id_seq')
+        cur.execute(
+            """
+            CREATE TABLE sensor_readings (
+                id bigint NOT NULL DEFAULT nextval('sensor_readings_partitioned_id_seq'),
+                "timestamp" timestamp with time zone NOT NULL,
+                sensor_id varchar(50) NOT NULL,
+                temperature double precision NULL,
+                pressure double precision NULL,
+                humidity double precision NULL,
+                vcc integer NULL
+            ) PARTITION BY RANGE ("timestamp")
+            """
+        )
+        cur.execute('CREATE TABLE sensor_readings_default PARTITION OF sensor_readings DEFAULT')
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        start = _month_start(min(first or now, now))
+        stop = _month_start(max(last or now, now))
+        for _ in range(PREMAKE_MONTHS):
+            stop = _add_month(stop)
+        while start <= stop:
+            end = _add_month(start)
+            cur.execute(
+                f'CREATE TABLE sensor_readings_p{start:%Y%m} PARTITION OF sensor_readings '
+                'FOR VALUES FROM (%s) TO (%s)',
+                [start, end],
+            )
+            start = end
+
+        cur.execute(f'INSERT INTO sensor_readings ({COLUMNS}) SELECT {COLUMNS} FROM sensor_readings_unpartitioned')
+        cur.execute('DROP TABLE sensor_readings_unpartitioned')
+        cur.execute('ALTER SEQUENCE sensor_readings_partitioned_id_seq RENAME TO sensor_readings_id_seq')
+        cur.execute('ALTER SEQUENCE sensor_readings_id_seq OWNED BY sensor_readings.id')
+        cur.execute("SELECT setval('sensor_readings_id_seq', %s, false)", [(max_id or 0) + 1])
+
+        cur.execute('ALTER TABLE sensor_readings ADD CONSTRAINT sensor_readings_pkey PRIMARY KEY (id, "timestamp")')
+        for index_def in index_defs:
+            cur.execute(index_def)
+
+
+def unpartition_sensor_readings(apps, schema_editor):
+    # Partitions detached by the retention task are not part of the table any more and are not copied back
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cur:
+        index_defs = _copy_indexes(cur, 'sensor_readings')
+        cur.execute('SELECT max(id) FROM sensor_readings')
+        max_id = cur.fetchone()[0]
+
+        cur.execute('ALTER TABLE sensor_readings RENAME TO sensor_readings_partitioned')
+        cur.execute('ALTER TABLE sensor_readings_partitioned DROP CONSTRAINT sensor_readings_pkey')
+        for index_def in index_defs:
+            name = index_def.split()[2]
+            cur.execute(f'DROP INDEX {name}')
+        cur.execute(
+            """
+            CREATE TABLE sensor_readings (
+                id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+                "timestamp" timestamp with time zone NOT NULL,
+                sensor_id varchar(50) NOT NULL,
+                temperature double precision NULL,
+                pressure double precision NULL,
+                humidity double precision NULL,
+                vcc integer NULL
+            )
+            """
+        )
+        cur.execute(f'INSERT INTO sensor_readings ({COLUMNS}) SELECT {COLUMNS} FROM sensor_readings_partitioned')
+        cur.execute('DROP TABLE sensor_readings_partitioned CASCADE')
+        cur.execute(
+            "SELECT setval(pg_get_serial_sequence('sensor_readings', 'id'), %s, false)",
+            [(max_id or 0) + 1],
+        )
+        for index_def in index_defs:
+            cur.execute(index_def)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensor_data', '0003_sensorrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_sensor_readings, unpartition_sensor_readings),
+    ]
@@ -0,0 +1,59 @@
+"""Opt-in BRIN and covering indexes for time-range scans of sensor_readings.
+
+Only runs on Postgres with SENSOR_READINGS_TIME_RANGE_INDEXES=True:
+
+- a BRIN index on timestamp, a few pages in size, for scans over all sensors
+  since readings arrive in time order;
+- a (sensor_id, timestamp) B-tree that INCLUDEs the metric columns, so a
+  per-sensor window is answered by an index-only scan (once vacuum has set the
+  visibility map).
+
+The indexes are not part of the model state. To opt in after this migration
+was already applied with the setting off, enable it and re-run it:
+
+    python manage.py migrate sensor_data 0004
+    python manage.py migrate sensor_data
+
+benchmarks/bench_reading_queries.py (in sensor_data_processor) measures both.
+"""
+from django.conf import settings
+from django.db import migrations
+
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS sensor_readings_timestamp_brin '
+    'ON sensor_readings USING brin ("timestamp") WITH (pages_per_range = 32)',
+    'CREATE INDEX IF NOT EXISTS sensor_readings_sensor_ts_covering '
+    'ON sensor_readings (sensor_id, "timestamp") INCLUDE (temperature, pressure, humidity, vcc)',
+]
+
+DROP_INDEXES = [
+    'DROP INDEX IF EXISTS sensor_readings_timestamp_brin',
+    'DROP INDEX IF EXISTS sensor_readings_sensor_ts_covering',
+]
+
+
+def create_time_range_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql' or not settings.SENSOR_READINGS_TIME_RANGE_INDEXES:
+        return
+    with schema_editor.connection.cursor() as cur:
+        for sql in CREATE_INDEXES:
+            cur.execute(sql)
+
+
+def drop_time_range_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cur:
+        for sql in DROP_INDEXES:
+            cur.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensor_data', '0004_partition_sensor_readings'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_time_range_indexes, drop_time_range_indexes),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.12 on 2026-10-17 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensor_data', '0005_sensor_readings_time_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorReadingArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(max_length=50)),
+                ('year', models.IntegerField()),
+                ('week_number', models.IntegerField()),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('file', models.CharField(max_length=255)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('size_bytes', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sensor_reading_archives',
+                'ordering': ['sensor_id', 'period_start'],
+                'unique_together': {('sensor_id', 'year', 'week_number')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.12 on 2026-10-18 00:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensor_data', '0006_sensorreadingarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorLatest',
+            fields=[
+                ('sensor_id', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField()),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('humidity', models.FloatField(blank=True, null=True)),
+                ('pressure', models.FloatField(blank=True, null=True)),
+                ('soil_moisture_20', models.FloatField(blank=True, null=True)),
+                ('soil_moisture_5', models.FloatField(blank=True, null=True)),
+                ('soil_temperature', models.FloatField(blank=True, null=True)),
+                ('vcc', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'sensor_latest',
+            },
+        ),
+    ]
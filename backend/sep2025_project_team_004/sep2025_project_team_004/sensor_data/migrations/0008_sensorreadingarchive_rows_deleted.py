@@ -0,0 +1,18 @@
+# Generated by Django 5.0.12 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensor_data', '0007_sensorlatest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorreadingarchive',
+            name='rows_deleted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -21,14 +21,18 @@ class SensorReading(models.Model):
         return f"{self.sensor_id} at {self.timestamp}"
 
 class WeeklySensorAverage(models.Model):
-    """Stores calculated weekly averages for each sensor."""
+    """Stores running sums and counts per sensor and ISO week; the averages are derived on read."""
     sensor_id = models.CharField(max_length=50)
     year = models.IntegerField()
     week_number = models.IntegerField()
-    avg_temperature = models.FloatField(null=True, blank=True)
-    avg_pressure = models.FloatField(null=True, blank=True)
-    avg_humidity = models.FloatField(null=True, blank=True)
-    avg_vcc = models.FloatField(null=True, blank=True) # Average of integer might be float
+    sum_temperature = models.FloatField(default=0)
+    count_temperature = models.PositiveIntegerField(default=0)
+    sum_pressure = models.FloatField(default=0)
+    count_pressure = models.PositiveIntegerField(default=0)
+    sum_humidity = models.FloatField(default=0)
+    count_humidity = models.PositiveIntegerField(default=0)
+    sum_vcc = models.FloatField(default=0)
+    count_vcc = models.PositiveIntegerField(default=0)
     datapoints = models.PositiveIntegerField(default=0) # Use PositiveIntegerField for counts
     calculation_timestamp = models.DateTimeField() # Timestamp of the last update
 
@@ -39,4 +43,132 @@ class WeeklySensorAverage(models.Model):
         ordering = ['sensor_id', 'year', 'week_number'] # Optional: Default ordering
 
     def __str__(self):
-        return f"{self.sensor_id} - {self.year}W{self.week_number:02d}" 
\ No newline at end of file
+        return f"{self.sensor_id} - {self.year}W{self.week_number:02d}"
+
+    @staticmethod
+    def _mean(total, count):
+        return total / count if count else None
+
+    @property
+    def avg_temperature(self):
+        return self._mean(self.sum_temperature, self.count_temperature)
+
+    @property
+    def avg_pressure(self):
+        return self._mean(self.sum_pressure, self.count_pressure)
+
+    @property
+    def avg_humidity(self):
+        return self._mean(self.sum_humidity, self.count_humidity)
+
+    @property
+    def avg_vcc(self):
+        return self._mean(self.sum_vcc, self.count_vcc)
+
+
+class SensorRollup(models.Model):
+    """Mergeable aggregates of readings per sensor and hour/day/ISO week/month bucket."""
+    HOUR = 'hour'
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    RESOLUTION_CHOICES = [
+        (HOUR, 'Hourly'),
+        (DAY, 'Daily'),
+        (WEEK, 'Weekly'),
+        (MONTH, 'Monthly'),
+    ]
+    METRICS = ('temperature', 'pressure', 'humidity', 'vcc')
+
+    sensor_id = models.CharField(max_length=50)
+    resolution = models.CharField(max_length=5, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField() # UTC start of the bucket
+    count_temperature = models.PositiveIntegerField(default=0)
+    sum_temperature = models.FloatField(default=0)
+    sum_sq_temperature = models.FloatField(default=0)
+    min_temperature = models.FloatField(null=True, blank=True)
+    max_temperature = models.FloatField(null=True, blank=True)
+    count_pressure = models.PositiveIntegerField(default=0)
+    sum_pressure = models.FloatField(default=0)
+    sum_sq_pressure = models.FloatField(default=0)
+    min_pressure = models.FloatField(null=True, blank=True)
+    max_pressure = models.FloatField(null=True, blank=True)
+    count_humidity = models.PositiveIntegerField(default=0)
+    sum_humidity = models.FloatField(default=0)
+    sum_sq_humidity = models.FloatField(default=0)
+    min_humidity = models.FloatField(null=True, blank=True)
+    max_humidity = models.FloatField(null=True, blank=True)
+    count_vcc = models.PositiveIntegerField(default=0)
+    sum_vcc = models.FloatField(default=0)
+    sum_sq_vcc = models.FloatField(default=0)
+    min_vcc = models.FloatField(null=True, blank=True)
+    max_vcc = models.FloatField(null=True, blank=True)
+    datapoints = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'sensor_rollups'
+        unique_together = ('sensor_id', 'resolution', 'bucket_start')
+        ordering = ['sensor_id', 'resolution', 'bucket_start']
+
+    def __str__(self):
+        return f"{self.sensor_id} {self.resolution} {self.bucket_start:%Y-%m-%d %H:%M}"
+
+    def stats(self, metric):
+        """Returns count/min/max/mean/stddev (population) for one metric, or None if it was never reported."""
+        count = getattr(self, f'count_{metric}')
+        if not count:
+            return None
+        total = getattr(self, f'sum_{metric}')
+        mean = total / count
+        # Clamp float noise so a constant series never yields sqrt of a tiny negative
+        variance = max(getattr(self, f'sum_sq_{metric}') / count - mean * mean, 0.0)
+        return {
+            'count': count,
+            'min': getattr(self, f'min_{metric}'),
+            'max': getattr(self, f'max_{metric}'),
+            'mean': mean,
+            'stddev': variance ** 0.5,
+        }
+
+
+class SensorReadingArchive(models.Model):
+    """Manifest of closed sensor-weeks compacted into Parquet files (see archive.py)."""
+    sensor_id = models.CharField(max_length=50)
+    year = models.IntegerField()
+    week_number = models.IntegerField()
+    period_start = models.DateTimeField() # Monday 00:00 UTC
+    period_end = models.DateTimeField()
+    file = models.CharField(max_length=255)
+    row_count = models.PositiveIntegerField(default=0)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    rows_deleted = models.BooleanField(default=False) # whether its rows left sensor_readings
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sensor_reading_archives'
+        unique_together = ('sensor_id', 'year', 'week_number')
+        ordering = ['sensor_id', 'period_start']
+
+    def __str__(self):
+        return f"{self.sensor_id} - {self.year}W{self.week_number:02d} ({self.row_count} rows)"
+
+
+class SensorLatest(models.Model):
+    """Stores the newest reading of each sensor (see latest.py)."""
+    sensor_id = models.CharField(max_length=50, primary_key=True)
+    timestamp = models.DateTimeField()
+    temperature = models.FloatField(null=True, blank=True)
+    humidity = models.FloatField(null=True, blank=True)
+    pressure = models.FloatField(null=True, blank=True)
+    soil_moisture_20 = models.FloatField(null=True, blank=True)
+    soil_moisture_5 = models.FloatField(null=True, blank=True)
+    soil_temperature = models.FloatField(null=True, blank=True)
+    vcc = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'sensor_latest'
+
+    def __str__(self):
+        return f"{self.sensor_id} at {self.timestamp}"
@@ -0,0 +1,138 @@
+"""Monthly range partitions of sensor_readings (Postgres only).
+
+Migration 0004 turns sensor_readings into a table partitioned by month on
+`timestamp`, one child per month named sensor_readings_pYYYYMM plus a
+sensor_readings_default catch-all. The model is unchanged: Django and the
+processor keep reading and writing the parent table and Postgres routes rows
+to the right child. The maintenance task keeps partitions created ahead of
+time and retires old months by detaching or dropping whole partitions.
+"""
+import datetime
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'sensor_readings'
+DEFAULT_PARTITION = 'sensor_readings_default'
+PARTITION_RE = re.compile(r'^sensor_readings_p(\d{4})(\d{2})$')
+
+
+def month_start(ts):
+    """Returns the UTC start of the month containing `ts`."""
+    ts = ts.astimezone(datetime.timezone.utc)
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(start, months):
+    """Shifts a month start by a (possibly negative) number of months."""
+    index = start.year * 12 + start.month - 1 + months
+    return start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(start):
+    return f'{PARENT_TABLE}_p{start:%Y%m}'
+
+
+def is_partitioned(connection=default_connection):
+    """True when sensor_readings exists as a partitioned table on this database."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [PARENT_TABLE],
+        )
+        return cur.fetchone() is not None
+
+
+def list_partitions(connection=default_connection):
+    """Returns {month_start: table_name} for the monthly partitions currently attached."""
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cur.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            start = datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)
+            partitions[start] = name
+    return partitions
+
+
+def create_partition(start, connection=default_connection):
+    """Creates and attaches the partition for the month starting at `start`.
+
+    Rows for that month may already sit in the default partition (written before
+    the month was pre-created); they are moved into the new table before it is
+    attached, since Postgres refuses to attach a range the default still holds.
+    """
+    name = partition_name(start)
+    end = add_months(start, 1)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        cur.execute(f'CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)')
+        cur.execute(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved',
+            [start, end],
+        )
+        moved = cur.rowcount
+        cur.execute(
+            f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    logger.info(f"Created partition {name} ({moved} rows moved from {DEFAULT_PARTITION}).")
+    return name
+
+
+def ensure_partitions(months_ahead=None, now=None, connection=default_connection):
+    """Makes sure partitions exist from the current month through `months_ahead` months later."""
+    months_ahead = settings.SENSOR_READINGS_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    current = month_start(now or timezone.now())
+    existing = list_partitions(connection)
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current, offset)
+        if start not in existing:
+            created.append(create_partition(start, connection))
+    return created
+
+
+def retire_partitions(keep_months=None, mode=None, now=None, connection=default_connection):
+    """Detaches (or drops) monthly partitions that end before the retention window.
+
+    The current month plus `keep_months - 1` previous months are kept. A
+    detached partition stays around as a standalone table, e.g. for archiving,
+    and can be re-attached by hand. `keep_months` of 0 disables retention.
+    """
+    keep_months = settings.SENSOR_READINGS_RETENTION_MONTHS if keep_months is None else keep_months
+    mode = mode or settings.SENSOR_READINGS_RETENTION_MODE
+    if mode not in ('detach', 'drop'):
+        raise ValueError(f"Unknown retention mode: {mode}")
+    if keep_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(now or timezone.now()), -(keep_months - 1))
+    retired = []
+    for start, name in sorted(list_partitions(connection).items()):
+        if start >= cutoff:
+            break
+        with connection.cursor() as cur:
+            cur.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}')
+            if mode == 'drop':
+                cur.execute(f'DROP TABLE {name}')
+        logger.info(f"Retired partition {name} ({mode}).")
+        retired.append(name)
+    return retired
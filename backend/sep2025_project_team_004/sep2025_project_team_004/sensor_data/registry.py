@@ -0,0 +1,109 @@
+"""Registry of the sensors whose data is cached and served.
+
+The working set is every sensor registered in sensors.Belongs plus the public
+SENSOR_LIST. Each sensor gets a refresh interval from its demand: sensors
+queried within SENSOR_ACTIVE_WINDOW seconds refresh every
+SENSOR_REFRESH_INTERVAL seconds, the others back off towards
+SENSOR_IDLE_REFRESH_INTERVAL, less the more users have them as a favorite.
+The interval is the shortest time between two fetches; when a sensor is
+actually fetched is planned from its reporting cadence (see scheduling.py).
+
+publish() computes the registry ({sensor_id: entry}, busiest sensors first)
+and caches it under REGISTRY_KEY, where scheduler_backend reads it too.
+valid_sensor_ids() is the set of its keys, kept per process for
+SENSOR_L1_TTL seconds, so validating a sensor ID is a set lookup. Once a
+saved or deleted Belongs row is committed, the cached registry is dropped
+(see signals.py).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from sep2025_project_team_004.sensors.models import Belongs, Fav_Sensor
+
+from .sensors import SENSOR_LIST
+
+REGISTRY_KEY = "sensors:registry"
+REGISTRY_TIMEOUT = 60 * 60
+QUERY_RECORD_INTERVAL = 60  # seconds between two query records of a sensor from one process
+
+_valid_ids = (0, frozenset())  # (time.monotonic() it expires at, ids) in this process
+_recorded = {}  # sensor_id -> time.monotonic() of this process' last query record
+
+
+def queried_key(sensor_id):
+    return f"sensor:{sensor_id}:queried"
+
+
+def refresh_interval(favorites, last_queried, now):
+    """Seconds between refreshes of a sensor with `favorites` favorites, last queried at `last_queried`."""
+    if last_queried is not None and now - last_queried < settings.SENSOR_ACTIVE_WINDOW:
+        return settings.SENSOR_REFRESH_INTERVAL
+    return max(settings.SENSOR_REFRESH_INTERVAL, settings.SENSOR_IDLE_REFRESH_INTERVAL // (1 + favorites))
+
+
+def build():
+    """The registry from the database, busiest sensors first."""
+    sensor_ids = set(SENSOR_LIST)
+    sensor_ids.update(Belongs.objects.values_list('sensor_id', flat=True))
+    favorites = dict(
+        Fav_Sensor.objects.filter(sensor_id__in=sensor_ids)
+        .values_list('sensor_id')
+        .annotate(count=Count('id'))
+    )
+    queried = cache.get_many([queried_key(sensor_id) for sensor_id in sensor_ids])
+    now = time.time()
+    entries = {}
+    for sensor_id in sensor_ids:
+        last_queried = queried.get(queried_key(sensor_id))
+        entries[sensor_id] = {
+            'favorites': favorites.get(sensor_id, 0),
+            'last_queried': last_queried,
+            'interval': refresh_interval(favorites.get(sensor_id, 0), last_queried, now),
+        }
+    return dict(sorted(
+        entries.items(),
+        key=lambda item: (item[1]['interval'], -item[1]['favorites'], -(item[1]['last_queried'] or 0), item[0]),
+    ))
+
+
+def publish():
+    """Rebuilds the registry and caches it for this and the other processes; returns it."""
+    global _valid_ids
+    entries = build()
+    cache.set(REGISTRY_KEY, entries, REGISTRY_TIMEOUT)
+    _valid_ids = (time.monotonic() + settings.SENSOR_L1_TTL, frozenset(entries))
+    return entries
+
+
+def invalidate():
+    global _valid_ids
+    cache.delete(REGISTRY_KEY)
+    _valid_ids = (0, frozenset())
+
+
+def valid_sensor_ids():
+    """A frozenset of the registered sensor IDs."""
+    global _valid_ids
+    now = time.monotonic()
+    expires, ids = _valid_ids
+    if now < expires:
+        return ids
+    entries = cache.get(REGISTRY_KEY)
+    if entries is None:
+        publish()
+        return _valid_ids[1]
+    _valid_ids = (now + settings.SENSOR_L1_TTL, frozenset(entries))
+    return _valid_ids[1]
+
+
+def record_query(sensor_id):
+    """Notes that a sensor was just queried, at most once per QUERY_RECORD_INTERVAL from one process."""
+    now = time.monotonic()
+    if now < _recorded.get(sensor_id, 0):
+        return
+    _recorded[sensor_id] = now + QUERY_RECORD_INTERVAL
+    cache.set(queried_key(sensor_id), time.time(), settings.SENSOR_IDLE_REFRESH_INTERVAL * 2)
+
@@ -0,0 +1,63 @@
+"""Pre-serialized sensor_data_api responses.
+
+Whenever a refresh task writes a sensor's payload it also renders the final
+response body once, gzips it and caches it under response_key() together with
+the SHA-256 digest of the JSON. sensor_data_api serves those bytes as they
+are: no JSON encoding happens on the read path, and a client that sends the
+ETag back in If-None-Match gets a 304 without any body at all.
+
+The ETag is strong and differs per representation ("<digest>-gzip" for the
+compressed body), so the rare client that does not accept gzip gets the
+decompressed bytes under the plain "<digest>" tag.
+
+The digest is also written to version_key() (after the payload and response,
+in the same set_many), so per-process caches can tell cheaply whether the
+sensor's cached entries changed (see localcache.py).
+"""
+import gzip
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from . import series
+
+GZIP_LEVEL = 6
+
+
+def response_key(sensor_id):
+    return f"sensor:{sensor_id}:response"
+
+
+def version_key(sensor_id):
+    return f"sensor:{sensor_id}:version"
+
+
+def build(sensor_id, blob):
+    """The cache entry for an encoded payload: {'digest': sha256 of the JSON body, 'body': gzipped body}."""
+    body = series.render_response(sensor_id, blob)
+    return {
+        'digest': hashlib.sha256(body).hexdigest(),
+        'body': gzip.compress(body, GZIP_LEVEL, mtime=0),
+    }
+
+
+def entity_tag(entry, gzipped):
+    return f'"{entry["digest"]}-gzip"' if gzipped else f'"{entry["digest"]}"'
+
+
+def serve(request, entry):
+    """An HttpResponse (or a 304) for a cached entry, honouring Accept-Encoding and If-None-Match."""
+    gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = entity_tag(entry, gzipped)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            entry['body'] if gzipped else gzip.decompress(entry['body']),
+            content_type="application/json",
+        )
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
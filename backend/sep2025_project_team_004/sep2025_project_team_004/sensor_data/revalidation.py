@@ -0,0 +1,87 @@
+"""Stale-while-revalidate and single-flight refreshes of cached sensor data.
+
+A sensor's cached data lives for the hard TTL (tasks.CACHE_TIMEOUT), and
+every refresh that confirms it also sets upstream.fresh_key() for the soft
+TTL (SENSOR_SOFT_TTL). sensor_data_api then:
+
+- serves fresh data as is;
+- serves soft-expired data too (the beat task fell behind), but the first
+  request to take the sensor's refresh lock queues one background
+  fetch_and_cache_sensor;
+- on a hard miss, lets only the request holding the lock fetch upstream;
+  concurrent requests wait up to SENSOR_SINGLE_FLIGHT_WAIT seconds for its
+  result instead of all hitting the upstream at once. sensor_data_api opts
+  out of ATOMIC_REQUESTS, so neither holds a database transaction open.
+
+The lock is a cache.add() (SET NX in Redis) that expires after
+SENSOR_REFRESH_LOCK_TIMEOUT seconds, so a crashed holder cannot block
+refreshes for long, and at most one background refresh per sensor is queued
+in that time. While the upstream circuit is open (see breaker.py) stale data
+is served without queueing refreshes that would fail fast. With the L1 cache
+on, each process checks the soft TTL of a sensor at most once per
+SENSOR_L1_TTL seconds.
+"""
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from . import breaker, responses, upstream
+from .tasks import fetch_and_cache_sensor
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05  # seconds between checks while waiting for another request's refresh
+
+_next_check = {}  # sensor_id -> time.monotonic() of the next soft TTL check in this process
+
+
+def acquire(sensor_id):
+    return cache.add(upstream.lock_key(sensor_id), True, settings.SENSOR_REFRESH_LOCK_TIMEOUT)
+
+
+def release(sensor_id):
+    cache.delete(upstream.lock_key(sensor_id))
+
+
+def revalidate_if_stale(sensor_id):
+    """Queues one background refresh if the sensor's cached data is past its soft TTL."""
+    if settings.SENSOR_L1_CACHE:
+        now = time.monotonic()
+        if now < _next_check.get(sensor_id, 0):
+            return
+        _next_check[sensor_id] = now + settings.SENSOR_L1_TTL
+    if cache.get(upstream.fresh_key(sensor_id)) is not None or breaker.is_open():
+        return
+    if acquire(sensor_id):
+        logger.info(f"{sensor_id} data is stale, refreshing in the background")
+        fetch_and_cache_sensor.delay(sensor_id)
+
+
+def refresh_once(sensor_id):
+    """Refreshes a sensor whose data is missing, once across all requests; returns its response entry or None.
+
+    If the refresh fails, whatever entry is cached by then (possibly stale) is returned.
+    """
+    key = responses.response_key(sensor_id)
+    if acquire(sensor_id):
+        try:
+            fetch_and_cache_sensor(sensor_id)
+        except (requests.RequestException, ValueError) as e:  # ValueError: an unreadable payload
+            logger.error(f"{sensor_id} refresh failed: {e}")
+        finally:
+            release(sensor_id)
+        return cache.get(key)
+
+    deadline = time.monotonic() + settings.SENSOR_SINGLE_FLIGHT_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(upstream.lock_key(sensor_id)) is None:
+            # The holder finished without data; one more look in case it raced the release
+            return cache.get(key)
+    return None
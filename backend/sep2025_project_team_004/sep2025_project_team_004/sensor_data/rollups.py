@@ -0,0 +1,124 @@
+import datetime
+import logging
+
+from django.db.models import Count, F, FloatField, Max, Min, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import SensorReading, SensorRollup
+
+logger = logging.getLogger(__name__)
+
+# Finest first; month uses its shortest length so a window never gets more buckets than estimated
+RESOLUTIONS = [
+    (SensorRollup.HOUR, datetime.timedelta(hours=1)),
+    (SensorRollup.DAY, datetime.timedelta(days=1)),
+    (SensorRollup.WEEK, datetime.timedelta(weeks=1)),
+    (SensorRollup.MONTH, datetime.timedelta(days=28)),
+]
+RESOLUTION_NAMES = [name for name, _ in RESOLUTIONS]
+
+
+def bucket_start(ts, resolution):
+    """Truncates a timestamp to the UTC start of its hour/day/ISO week/month bucket."""
+    ts = ts.astimezone(datetime.timezone.utc)
+    if resolution == SensorRollup.HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == SensorRollup.DAY:
+        return day
+    if resolution == SensorRollup.WEEK:
+        return day - datetime.timedelta(days=day.weekday())
+    if resolution == SensorRollup.MONTH:
+        return day.replace(day=1)
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+def next_bucket(start, resolution):
+    """Returns the start of the bucket following the one starting at `start`."""
+    if resolution == SensorRollup.MONTH:
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + dict(RESOLUTIONS)[resolution]
+
+
+def choose_resolution(start, end, max_points):
+    """Picks the finest rollup whose bucket count over [start, end) stays within max_points.
+
+    Falls back to monthly buckets when even those exceed the budget.
+    """
+    span = end - start
+    for name, width in RESOLUTIONS:
+        if span / width <= max_points:
+            return name
+    return SensorRollup.MONTH
+
+
+def _aggregate_buckets(readings, resolution):
+    aggregates = {'datapoints': Count('id')}
+    for metric in SensorRollup.METRICS:
+        aggregates.update({
+            f'count_{metric}': Count(metric),
+            f'sum_{metric}': Sum(metric, output_field=FloatField()),
+            f'sum_sq_{metric}': Sum(F(metric) * F(metric), output_field=FloatField()),
+            f'min_{metric}': Min(metric),
+            f'max_{metric}': Max(metric),
+        })
+    return (
+        readings
+        .annotate(bucket=Trunc('timestamp', resolution, tzinfo=datetime.timezone.utc))
+        .values('sensor_id', 'bucket')
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def rebuild_rollups(resolution, start, end, sensor_id=None):
+    """Recomputes every `resolution` bucket in [start, end) from sensor_readings.
+
+    `start` and `end` must be bucket boundaries: buckets are then computed whole
+    and overwritten, so re-running a range is idempotent. Returns the number of
+    buckets written.
+    """
+    readings = SensorReading.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if sensor_id:
+        readings = readings.filter(sensor_id=sensor_id)
+
+    now = timezone.now()
+    rollups = []
+    for row in _aggregate_buckets(readings, resolution):
+        bucket = row.pop('bucket')
+        for metric in SensorRollup.METRICS:
+            row[f'sum_{metric}'] = row[f'sum_{metric}'] or 0.0
+            row[f'sum_sq_{metric}'] = row[f'sum_sq_{metric}'] or 0.0
+        rollups.append(SensorRollup(resolution=resolution, bucket_start=bucket, updated_at=now, **row))
+
+    update_fields = [
+        f.name for f in SensorRollup._meta.concrete_fields
+        if f.name not in ('id', 'sensor_id', 'resolution', 'bucket_start')
+    ]
+    SensorRollup.objects.bulk_create(
+        rollups,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['sensor_id', 'resolution', 'bucket_start'],
+        update_fields=update_fields,
+    )
+    return len(rollups)
+
+
+def backfill_rollups(resolution, start, end, sensor_id=None, chunk=datetime.timedelta(days=7)):
+    """Rebuilds rollups over [start, end) one chunk at a time so no single query scans the whole table.
+
+    The range is widened to whole buckets and every chunk edge is snapped to a
+    bucket boundary, so a bucket is never split across two chunks. Yields
+    (chunk_start, chunk_end, buckets_written) as it goes.
+    """
+    cursor = bucket_start(start, resolution)
+    while cursor < end:
+        chunk_end = cursor + chunk
+        # Always advance by at least one bucket, e.g. a monthly rebuild with a 7-day chunk
+        chunk_end = max(bucket_start(chunk_end, resolution), next_bucket(cursor, resolution))
+        written = rebuild_rollups(resolution, cursor, chunk_end, sensor_id=sensor_id)
+        logger.info(f"Rebuilt {written} {resolution} rollups for {cursor} - {chunk_end}.")
+        yield cursor, chunk_end, written
+        cursor = chunk_end
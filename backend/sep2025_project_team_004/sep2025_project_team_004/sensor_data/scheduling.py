@@ -0,0 +1,137 @@
+"""Adaptive per-sensor refresh scheduling.
+
+Every refresh records a schedule state for its sensor under state_key():
+
+    cadence     median gap between the sensor's newest points (its reporting
+                interval), learned from the timestamps of the cached payload
+    newest      timestamp of its newest point
+    misses      refreshes in a row that found no new point although one was due
+    failures    refreshes in a row that failed
+    next_fetch  when to fetch it next (epoch seconds)
+
+The next fetch is planned GRACE seconds after the expected next point
+(newest + cadence), but never sooner than the sensor's demand interval from
+the registry, so idle sensors still back off. A sensor that is late or
+offline (misses) or erroring (failures) backs off exponentially, up to
+max_delay(): SENSOR_MAX_BACKOFF seconds, but always early enough that its
+cached payload has not expired yet. A fetch skipped because the upstream circuit was
+open (see breaker.py) is planned again SENSOR_BREAKER_RESET_TIMEOUT seconds
+later, without counting as a failure of the sensor. Up to SENSOR_REFRESH_JITTER seconds of random
+jitter spread the fetches of sensors reporting on the same clock.
+
+refresh_all_sensors runs every SENSOR_SCHEDULER_TICK seconds and queues the
+sensors whose next fetch falls before the next tick with a countdown to it.
+A queued fetch is claimed under dispatch_key() (per planned time), so it is
+queued once, and queued again after DISPATCH_TIMEOUT if it never ran.
+"""
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import series, upstream
+from .utils import CACHE_TIMEOUT
+
+STATE_TIMEOUT = 24 * 60 * 60
+DISPATCH_TIMEOUT = 5 * 60  # seconds after its planned time a lost fetch is queued again
+CADENCE_POINTS = 32  # newest points the cadence is estimated from
+EXPIRY_MARGIN = 60  # seconds a planned fetch comes at least before the cached payload expires
+
+
+def state_key(sensor_id):
+    return f"sensor:{sensor_id}:schedule"
+
+
+def dispatch_key(sensor_id, next_fetch):
+    return f"sensor:{sensor_id}:dispatched:{int(next_fetch)}"
+
+
+def estimate_cadence(times):
+    """Median gap in seconds between the newest CADENCE_POINTS timestamps (newest first), or None."""
+    newest = times[:CADENCE_POINTS]
+    gaps = [newer - older for newer, older in zip(newest, newest[1:]) if newer > older]
+    return statistics.median(gaps) if gaps else None
+
+
+def max_delay():
+    """The longest delay before a fetch, jitter included, that still finds the sensor's payload cached."""
+    return min(settings.SENSOR_MAX_BACKOFF, CACHE_TIMEOUT - settings.SENSOR_REFRESH_JITTER - EXPIRY_MARGIN)
+
+
+def plan(state, outcome, times, interval, now):
+    """The schedule state after a refresh with `outcome` that left the points at `times` cached.
+
+    `times` is None unless the refresh changed the cached payload.
+    """
+    state = dict(state or {})
+    if outcome == 'deferred':
+        # Not fetched, the upstream circuit was open: retry once it lets probes through
+        delay = settings.SENSOR_BREAKER_RESET_TIMEOUT
+    elif outcome == 'failed':
+        state['failures'] = state.get('failures', 0) + 1
+        delay = settings.SENSOR_REFRESH_INTERVAL * 2 ** (state['failures'] - 1)
+    else:
+        state['failures'] = 0
+        if times and times[0] > state.get('newest', 0):
+            state['cadence'] = estimate_cadence(times) or state.get('cadence')
+            state['newest'] = times[0]
+            state['misses'] = 0
+        cadence = state.get('cadence') or settings.SENSOR_REFRESH_INTERVAL
+        expected = state['newest'] + cadence if 'newest' in state else now
+        if now >= expected + settings.SENSOR_REFRESH_GRACE:
+            # No new point although one was due: late or offline
+            state['misses'] = state.get('misses', 0) + 1
+            delay = cadence * 2 ** state['misses']
+        else:
+            delay = expected + settings.SENSOR_REFRESH_GRACE - now
+        delay = max(delay, interval)
+    delay = min(delay, max_delay())
+    state['next_fetch'] = now + delay + random.uniform(0, settings.SENSOR_REFRESH_JITTER)
+    return state
+
+
+def record_outcome(sensor_id, outcome, interval=None):
+    """Plans a sensor's next fetch after a refresh; returns the new schedule state."""
+    times = None
+    if outcome == 'changed':
+        payload = cache.get(upstream.sensor_key(sensor_id))
+        if series.is_encoded(payload):
+            times = series.timestamps(payload)
+    state = plan(
+        cache.get(state_key(sensor_id)),
+        outcome,
+        times,
+        interval or settings.SENSOR_REFRESH_INTERVAL,
+        time.time(),
+    )
+    cache.set(state_key(sensor_id), state, STATE_TIMEOUT)
+    return state
+
+
+def claim_due(entries, limit=None):
+    """[(sensor_id, seconds until its fetch)] for the sensors of `entries` due before the next tick.
+
+    Sensors without a schedule yet are due at once, spread over the jitter
+    window. Sensors keep the priority order of `entries`; at most `limit` are
+    claimed.
+    """
+    now = time.time()
+    horizon = now + settings.SENSOR_SCHEDULER_TICK
+    states = cache.get_many([state_key(sensor_id) for sensor_id in entries])
+    due = []
+    for sensor_id in entries:
+        if limit is not None and len(due) >= limit:
+            break
+        state = states.get(state_key(sensor_id))
+        if state is None:
+            planned, countdown = 0, random.uniform(0, settings.SENSOR_REFRESH_JITTER)
+        else:
+            planned = state['next_fetch']
+            if planned >= horizon:
+                continue
+            countdown = max(planned - now, 0)
+        if cache.add(dispatch_key(sensor_id, planned), True, countdown + DISPATCH_TIMEOUT):
+            due.append((sensor_id, countdown))
+    return due
@@ -0,0 +1,15 @@
+"""Keeps the sensor registry in step with sensor registrations."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from sep2025_project_team_004.sensors.models import Belongs
+
+from . import registry
+
+
+@receiver(post_save, sender=Belongs)
+@receiver(post_delete, sender=Belongs)
+def invalidate_registry(sender, **kwargs):
+    # After the commit, so no process can rebuild the registry from the old rows
+    transaction.on_commit(registry.invalidate)
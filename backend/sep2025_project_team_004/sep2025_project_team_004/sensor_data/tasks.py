@@ -1,30 +1,77 @@
 # sep2025_project_team_004/sensor_data/tasks.py
 
-from celery import shared_task, group
-from django.core.cache import cache
-import requests
-import json
+from celery import shared_task
+from django.conf import settings
 import logging
+import requests
 
 logger = logging.getLogger(__name__)
 
-from .sensors import SENSOR_LIST  # import sensor list[........]
+from . import archive, breaker, partitions, registry, scheduling, upstream
 
 CACHE_TIMEOUT = 1500  # 25min
 
 @shared_task
-def fetch_and_cache_sensor(sensor_id):
-    url = f"https://esmc.uiowa.edu/esmc_services/data_base/querySensorInDB_working_reverse.php?sensorID={sensor_id}"
-    response = requests.get(url, timeout=10, verify=False)
-    if response.status_code == 200:
-        data = response.json()
-        cache_key = f"sensor:{sensor_id}"
-        cache.set(cache_key, json.dumps(data), CACHE_TIMEOUT)
+def fetch_and_cache_sensor(sensor_id, interval=None):
+    """Refreshes one sensor's cached payload; unchanged upstream data only extends the TTL.
+
+    Afterwards the sensor's next fetch is planned, no sooner than `interval`
+    seconds from now (its demand interval in the registry). Runs on the
+    SENSOR_UPSTREAM_QUEUE workers (see CELERY_TASK_ROUTES) and fails fast
+    while the upstream circuit is open (see breaker.py).
+    """
+    try:
+        if settings.SENSOR_DELTA_SYNC:
+            outcome = upstream.sync_sensor(sensor_id, CACHE_TIMEOUT, settings.SENSOR_CACHE_MAX_POINTS)
+        else:
+            outcome = upstream.refresh_sensor(sensor_id, CACHE_TIMEOUT, settings.SENSOR_CACHE_MAX_POINTS)
+    except breaker.CircuitOpen:
+        outcome = 'deferred'
+    except requests.RequestException as e:
+        logger.error(f"{sensor_id} fetch exception: {e}")
+        outcome = 'failed'
+    except ValueError as e:
+        # A malformed or truncated body, e.g. an error page served with a 200
+        logger.error(f"{sensor_id} unreadable upstream payload: {e}")
+        outcome = 'failed'
+    scheduling.record_outcome(sensor_id, outcome, interval)
+    if outcome == 'changed':
         return f"{sensor_id} cached successfully"
-    else:
-        return f"{sensor_id} fetch failed"
+    if outcome == 'unchanged':
+        return f"{sensor_id} unchanged"
+    if outcome == 'deferred':
+        return f"{sensor_id} deferred, upstream circuit open"
+    return f"{sensor_id} fetch failed"
 
 @shared_task
 def refresh_all_sensors():
-    tasks = group(fetch_and_cache_sensor.s(sensor_id) for sensor_id in SENSOR_LIST)
-    tasks.apply_async()
+    """Queues the registered sensors whose next fetch is due before the next tick, busiest first.
+
+    Each fetch is queued with a countdown to its planned time (see scheduling.py).
+    Nothing is queued while the upstream circuit is open, and only the busiest
+    due sensor (as the probe) while it is half-open, so fetches that would
+    fail fast do not pile up in the queue.
+    """
+    entries = registry.publish()
+    state = breaker.state()
+    if state == 'open':
+        return f"upstream circuit open, 0/{len(entries)} sensors queued"
+    due = scheduling.claim_due(entries, limit=1 if state == 'half_open' else None)
+    for sensor_id, countdown in due:
+        fetch_and_cache_sensor.apply_async((sensor_id,), {'interval': entries[sensor_id]['interval']}, countdown=countdown)
+    return f"refreshing {len(due)}/{len(entries)} sensors"
+
+@shared_task
+def maintain_sensor_reading_partitions():
+    """Pre-creates the upcoming monthly sensor_readings partitions and retires expired ones."""
+    if not partitions.is_partitioned():
+        return "sensor_readings is not partitioned"
+    created = partitions.ensure_partitions()
+    retired = partitions.retire_partitions()
+    return f"created {len(created)} partitions, retired {len(retired)}"
+
+@shared_task
+def archive_cold_sensor_weeks():
+    """Compacts closed sensor-weeks older than SENSOR_ARCHIVE_HOT_WEEKS into Parquet archives."""
+    entries = archive.archive_closed_weeks()
+    return f"archived {len(entries)} sensor-weeks"
@@ -1,16 +1,18 @@
+from django.conf import settings
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
 
 def setup_periodic_tasks():
+    # A short tick: each sensor's fetch is planned from its own cadence (see scheduling.py)
     schedule_qs = IntervalSchedule.objects.filter(
-        every=1,
-        period=IntervalSchedule.MINUTES,
+        every=settings.SENSOR_SCHEDULER_TICK,
+        period=IntervalSchedule.SECONDS,
     )
     if schedule_qs.exists():
         schedule = schedule_qs.first()
     else:
         schedule, _ = IntervalSchedule.objects.get_or_create(
-            every=1,
-            period=IntervalSchedule.MINUTES,
+            every=settings.SENSOR_SCHEDULER_TICK,
+            period=IntervalSchedule.SECONDS,
         )
 
     PeriodicTask.objects.update_or_create(
@@ -20,3 +22,37 @@ def setup_periodic_tasks():
             'task': 'sep2025_project_team_004.sensor_data.tasks.refresh_all_sensors',
         },
     )
+
+    daily, _ = IntervalSchedule.objects.get_or_create(
+        every=1,
+        period=IntervalSchedule.DAYS,
+    )
+
+    PeriodicTask.objects.update_or_create(
+        name='Maintain Sensor Reading Partitions',
+        defaults={
+            'interval': daily,
+            'task': 'sep2025_project_team_004.sensor_data.tasks.maintain_sensor_reading_partitions',
+        },
+    )
+
+    PeriodicTask.objects.update_or_create(
+        name='Archive Cold Sensor Weeks',
+        defaults={
+            'interval': daily,
+            'task': 'sep2025_project_team_004.sensor_data.tasks.archive_cold_sensor_weeks',
+        },
+    )
+
+    tile_schedule, _ = IntervalSchedule.objects.get_or_create(
+        every=settings.SENSOR_TILE_TTL,
+        period=IntervalSchedule.SECONDS,
+    )
+
+    PeriodicTask.objects.update_or_create(
+        name='Rebuild Sensor Map Tiles',
+        defaults={
+            'interval': tile_schedule,
+            'task': 'sep2025_project_team_004.sensors.tasks.rebuild_all_tiles',
+        },
+    )
@@ -0,0 +1,1233 @@
+import datetime
+import gzip
+import importlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from sep2025_project_team_004.sensor_data import archive, breaker, latest, localcache, registry, responses, revalidation, scheduling, tasks, upstream
+from sep2025_project_team_004.sensors.models import Belongs, Fav_Sensor
+from sep2025_project_team_004.sensor_data.archive import archive_closed_weeks, iter_history, read_archive
+from sep2025_project_team_004.sensor_data.downsampling import lttb
+from sep2025_project_team_004.sensor_data.models import SensorLatest, SensorReading, SensorReadingArchive, SensorRollup, WeeklySensorAverage
+from sep2025_project_team_004.sensor_data.partitions import add_months, month_start
+from sep2025_project_team_004.sensor_data.rollups import choose_resolution
+from sep2025_project_team_004.sensor_data.series import SensorPoint, decode, encode, render_response
+from sep2025_project_team_004.sensor_data.tasks import fetch_and_cache_sensor, maintain_sensor_reading_partitions, refresh_all_sensors
+
+
+class WeeklySensorAverageTests(APITestCase):
+    def test_averages_are_derived_per_metric(self):
+        # temperature seen in 3 readings, pressure only in 1: each mean uses its own count
+        WeeklySensorAverage.objects.create(
+            sensor_id="abc123", year=2025, week_number=18,
+            sum_temperature=60.0, count_temperature=3,
+            sum_pressure=1000.0, count_pressure=1,
+            datapoints=3, calculation_timestamp=timezone.now(),
+        )
+        response = self.client.get(reverse("sensor_data:get_weekly_averages", args=["abc123"]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["avg_temperature"], 20.0)
+        self.assertEqual(response.data[0]["avg_pressure"], 1000.0)
+        self.assertIsNone(response.data[0]["avg_humidity"])
+        self.assertEqual(response.data[0]["datapoints"], 3)
+
+    def test_unknown_sensor_returns_404(self):
+        response = self.client.get(reverse("sensor_data:get_weekly_averages", args=["missing"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SensorRollupTests(APITestCase):
+    def setUp(self):
+        # Two days of readings every 30 minutes, temperature alternating 10/20
+        self.start = datetime.datetime(2025, 3, 3, tzinfo=datetime.timezone.utc) # a Monday
+        SensorReading.objects.bulk_create([
+            SensorReading(
+                sensor_id="abc123",
+                timestamp=self.start + datetime.timedelta(minutes=30 * i),
+                temperature=10.0 if i % 2 == 0 else 20.0,
+                vcc=3300,
+            )
+            for i in range(96)
+        ])
+
+    def test_backfill_builds_every_resolution_and_is_idempotent(self):
+        call_command("backfill_sensor_rollups", chunk_days=1, stdout=io.StringIO())
+        call_command("backfill_sensor_rollups", chunk_days=1, stdout=io.StringIO())
+
+        counts = {
+            res: SensorRollup.objects.filter(sensor_id="abc123", resolution=res).count()
+            for res in ("hour", "day", "week", "month")
+        }
+        self.assertEqual(counts, {"hour": 48, "day": 2, "week": 1, "month": 1})
+
+        week = SensorRollup.objects.get(sensor_id="abc123", resolution="week")
+        self.assertEqual(week.datapoints, 96)
+        stats = week.stats("temperature")
+        self.assertEqual((stats["count"], stats["min"], stats["max"]), (96, 10.0, 20.0))
+        self.assertAlmostEqual(stats["mean"], 15.0)
+        self.assertAlmostEqual(stats["stddev"], 5.0)
+        self.assertEqual(week.stats("vcc")["stddev"], 0.0)
+        self.assertIsNone(week.stats("humidity"))
+
+    def test_resolution_is_the_finest_that_fits_max_points(self):
+        day = datetime.timedelta(days=1)
+        self.assertEqual(choose_resolution(self.start, self.start + day, 500), "hour")
+        self.assertEqual(choose_resolution(self.start, self.start + 60 * day, 500), "day")
+        self.assertEqual(choose_resolution(self.start, self.start + 365 * day, 100), "week")
+        self.assertEqual(choose_resolution(self.start, self.start + 3650 * day, 100), "month")
+
+    def test_api_serves_window_from_rollups(self):
+        call_command("backfill_sensor_rollups", stdout=io.StringIO())
+        url = reverse("sensor_data:sensor-rollups", args=["abc123"])
+        response = self.client.get(url, {
+            "from": "2025-03-03T00:00:00Z", "to": "2025-03-05T00:00:00Z", "max_points": 10,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["resolution"], "day")
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(response.data["results"][0]["datapoints"], 48)
+        self.assertAlmostEqual(response.data["results"][0]["temperature"]["mean"], 15.0)
+
+        response = self.client.get(url, {"from": "2025-03-05T00:00:00Z", "to": "2025-03-03T00:00:00Z"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SensorReadingPartitionTests(TestCase):
+    def test_month_arithmetic_crosses_year_boundaries(self):
+        start = month_start(datetime.datetime(2025, 11, 17, 13, 5, tzinfo=datetime.timezone.utc))
+        self.assertEqual(start, datetime.datetime(2025, 11, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(add_months(start, 2), datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(add_months(start, -11), datetime.datetime(2024, 12, 1, tzinfo=datetime.timezone.utc))
+
+    def test_maintenance_is_a_noop_without_partitioning(self):
+        # The test database is SQLite, where migration 0004 leaves a plain table
+        self.assertEqual(maintain_sensor_reading_partitions(), "sensor_readings is not partitioned")
+
+
+def insert_generated_readings(sensor_id, count):
+    """`count` readings 5 seconds apart from 2025-03-01, generated inside SQLite so the fixture never holds them in Python."""
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < %s)
+            INSERT INTO sensor_readings (timestamp, sensor_id, temperature, pressure, humidity, vcc)
+            SELECT strftime('%%Y-%%m-%%d %%H:%%M:%%S', '2025-03-01', '+' || (i * 5) || ' seconds'),
+                   %s, 20.5 + (i %% 97) / 10.0, 1001.25, NULL, 3300
+            FROM n
+            """,
+            [count, sensor_id],
+        )
+
+
+def rss():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class SensorReadingsApiTests(APITestCase):
+    def setUp(self):
+        start = datetime.datetime(2025, 3, 3, tzinfo=datetime.timezone.utc)
+        readings = [
+            SensorReading(sensor_id="abc123", timestamp=start + datetime.timedelta(minutes=i), temperature=float(i % 10))
+            for i in range(1000)
+        ]
+        readings[500].temperature = 99.0 # a spike any downsampling must keep
+        # Two readings sharing one timestamp, so the cursor has to break ties on id
+        readings.append(SensorReading(sensor_id="abc123", timestamp=start, temperature=1.0))
+        SensorReading.objects.bulk_create(readings)
+        self.url = reverse("sensor_data:sensor-readings", args=["abc123"])
+        self.range = {"from": "2025-03-03T00:00:00Z", "to": "2025-03-04T00:00:00Z"}
+
+    def test_small_range_is_returned_raw(self):
+        response = self.client.get(self.url, {"from": "2025-03-03T00:00:00Z", "to": "2025-03-03T00:10:00Z"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 11)
+        self.assertIsNone(response.data["downsampled"])
+        self.assertIsNone(response.data["next"])
+
+    def test_keyset_pages_cover_the_range_exactly_once(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {**self.range, "max_points": 300, "downsample": "none"}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(response.data["count"], 300)
+            seen.extend(r["timestamp"] for r in response.data["results"])
+            pages += 1
+            cursor = response.data["next"]
+            if not cursor:
+                break
+        self.assertEqual(pages, 4)
+        self.assertEqual(len(seen), 1001)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_large_range_is_downsampled_keeping_extremes(self):
+        for method in ("lttb", "minmax"):
+            response = self.client.get(self.url, {**self.range, "max_points": 100, "downsample": method})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["downsampled"], method)
+            self.assertLessEqual(response.data["count"], 100)
+            temperatures = [r["temperature"] for r in response.data["results"]]
+            self.assertIn(99.0, temperatures)
+            self.assertIn(0.0, temperatures)
+
+    def test_null_stretch_is_kept_as_a_gap(self):
+        SensorReading.objects.filter(sensor_id="abc123", timestamp__gte="2025-03-03T10:00:00Z", timestamp__lt="2025-03-03T12:00:00Z").update(temperature=None)
+        for method in ("lttb", "minmax"):
+            response = self.client.get(self.url, {**self.range, "max_points": 100, "downsample": method})
+            self.assertLessEqual(response.data["count"], 100)
+            timestamps = [r["timestamp"] for r in response.data["results"]]
+            self.assertEqual(timestamps, sorted(timestamps))
+            gaps = [r for r in response.data["results"] if r["temperature"] is None]
+            self.assertTrue(gaps)
+            self.assertTrue(all(r["timestamp"].hour in (10, 11) for r in gaps))
+
+    def test_reading_inserted_between_lttb_passes_is_left_out(self):
+        calls = []
+
+        def history(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 3:
+                # After the first pass (calls[1]), in a bucket it found empty
+                SensorReading.objects.create(sensor_id="abc123", timestamp="2025-03-03T20:00:00Z", temperature=-50.0)
+            return iter_history(*args, **kwargs)
+
+        with patch("sep2025_project_team_004.sensor_data.views.iter_history", side_effect=history):
+            response = self.client.get(self.url, {**self.range, "max_points": 100, "downsample": "lttb"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(calls), 3)  # the overflow check, then the two passes
+        self.assertNotIn(-50.0, [r["temperature"] for r in response.data["results"]])
+
+    def test_lttb_skips_rows_its_first_pass_did_not_see(self):
+        rows = [(float(t), float(t % 7)) for t in range(100)]
+        passes = [rows, rows[:50] + [(50.5, 99.0)] + rows[50:] + [(150.0, 1.0)]]
+        sampled = lttb(lambda: iter(passes.pop(0)), 20, 0, 200, lambda row: row[0], lambda row: row[1])
+        self.assertEqual((sampled[0], sampled[-1]), (rows[0], rows[-1]))
+        self.assertLessEqual(len(sampled), 20)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "needs /proc to sample RSS")
+    def test_million_row_range_is_downsampled_under_memory_ceiling(self):
+        insert_generated_readings("big", 1_000_000)
+        url = reverse("sensor_data:sensor-readings", args=["big"])
+        window = {"from": "2025-03-01T00:00:00Z", "to": "2025-05-01T00:00:00Z"}
+        # Warm up once so the first request's imports are not counted
+        self.client.get(url, {"from": "2025-03-01T00:00:00Z", "to": "2025-03-01T01:00:00Z", "max_points": 10})
+
+        for method in ("lttb", "minmax"):
+            peak = baseline = rss()
+            sampler_done = threading.Event()
+
+            def sample():
+                nonlocal peak
+                while not sampler_done.wait(0.01):
+                    peak = max(peak, rss())
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            try:
+                response = self.client.get(url, {**window, "max_points": 500, "downsample": method})
+            finally:
+                sampler_done.set()
+                sampler.join()
+            self.assertEqual(response.data["downsampled"], method)
+            self.assertLessEqual(response.data["count"], 500)
+            self.assertGreater(response.data["count"], 400)
+            # Materialising 1M rows would take several hundred MB
+            self.assertLess(peak - baseline, 32 * 1024 * 1024)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {**self.range, "cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SensorReadingsExportTests(APITestCase):
+    url_name = "sensor_data:sensor-export"
+    range = {"from": "2025-03-01T00:00:00Z", "to": "2025-06-01T00:00:00Z"}
+
+    def test_csv_and_ndjson_rows(self):
+        insert_generated_readings("abc123", 3)
+        url = reverse(self.url_name, args=["abc123"])
+        response = self.client.get(url, self.range)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "timestamp,sensor_id,temperature,pressure,humidity,vcc")
+        self.assertEqual(lines[1], "2025-03-01T00:00:00+00:00,abc123,20.5,1001.25,,3300")
+        self.assertEqual(len(lines), 4)
+
+        response = self.client.get(url, {**self.range, "format": "ndjson"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        records = [json.loads(line) for line in gzip.decompress(b"".join(response.streaming_content)).splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[2]["timestamp"], "2025-03-01T00:00:10+00:00")
+        self.assertIsNone(records[2]["humidity"])
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "needs /proc to sample RSS")
+    def test_million_row_export_stays_under_memory_ceiling(self):
+        rows = 1_000_000
+        insert_generated_readings("abc123", rows)
+        url = reverse(self.url_name, args=["abc123"])
+        # Warm up once so the first request's imports are not counted
+        b"".join(self.client.get(url, {"from": "2025-03-01T00:00:00Z", "to": "2025-03-01T00:01:00Z"}).streaming_content)
+
+        baseline = peak = rss()
+        response = self.client.get(url, self.range, HTTP_ACCEPT_ENCODING="gzip")
+
+        # Only count what is streamed; keeping the body would defeat the point
+        decompressor = gzip.zlib.decompressobj(16 + gzip.zlib.MAX_WBITS)
+        lines = 0
+        for i, chunk in enumerate(response.streaming_content):
+            lines += decompressor.decompress(chunk).count(b"\n")
+            if i % 20 == 0:
+                peak = max(peak, rss())
+
+        self.assertEqual(lines, rows + 1) # plus the header
+        # Materialising 1M rows would take several hundred MB
+        self.assertLess(peak - baseline, 32 * 1024 * 1024)
+
+
+class SensorReadingArchiveTests(APITestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        storages = {
+            **settings.STORAGES,
+            "sensor_archives": {
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": self.archive_dir},
+            },
+        }
+        overrides = override_settings(STORAGES=storages, SENSOR_ARCHIVE_STORAGE="sensor_archives", SENSOR_ARCHIVE_DELETE_ROWS=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        # Three weeks of hourly readings starting on a Monday; only the first two are closed and cold
+        self.start = datetime.datetime(2025, 3, 3, tzinfo=datetime.timezone.utc)
+        SensorReading.objects.bulk_create([
+            SensorReading(
+                sensor_id="abc123",
+                timestamp=self.start + datetime.timedelta(hours=i),
+                temperature=float(i),
+                humidity=None if i % 2 else 50.0,
+                vcc=3300,
+            )
+            for i in range(21 * 24)
+        ])
+        call_command("backfill_sensor_rollups", resolution=["week"], stdout=io.StringIO())
+        self.now = self.start + datetime.timedelta(weeks=2, days=3)
+
+    def test_closed_weeks_are_archived_once(self):
+        entries = archive_closed_weeks(now=self.now, hot_weeks=0)
+        self.assertEqual([(e.year, e.week_number, e.row_count) for e in entries], [(2025, 10, 168), (2025, 11, 168)])
+        self.assertEqual(archive_closed_weeks(now=self.now, hot_weeks=0), [])
+        # Archived rows left the hot table, the open week stayed
+        self.assertEqual(SensorReading.objects.count(), 7 * 24)
+
+        table = read_archive(entries[0], self.start, self.start + datetime.timedelta(hours=3))
+        self.assertEqual(table.column("temperature").to_pylist(), [0.0, 1.0, 2.0])
+        self.assertEqual(table.column("humidity").to_pylist(), [50.0, None, 50.0])
+
+    def test_history_export_reads_archives_and_hot_rows_in_order(self):
+        archive_closed_weeks(now=self.now, hot_weeks=0)
+        self.assertEqual(SensorReadingArchive.objects.count(), 2)
+
+        response = self.client.get(
+            reverse("sensor_data:sensor-export", args=["abc123"]),
+            {"from": "2025-03-09T22:00:00Z", "to": "2025-03-17T02:00:00Z", "format": "ndjson"},
+        )
+        records = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        # 2h from the end of week 10, all of week 11 (archived), 2h of week 12 (hot)
+        self.assertEqual(len(records), 2 + 168 + 2)
+        self.assertEqual(records[0]["timestamp"], "2025-03-09T22:00:00+00:00")
+        self.assertEqual(records[-1]["timestamp"], "2025-03-17T01:00:00+00:00")
+        self.assertEqual([r["temperature"] for r in records], [float(h) for h in range(166, 338)])
+
+    def test_readings_api_reads_archived_weeks(self):
+        archive_closed_weeks(now=self.now, hot_weeks=0)
+        url = reverse("sensor_data:sensor-readings", args=["abc123"])
+        params = {"from": "2025-03-09T22:00:00Z", "to": "2025-03-17T02:00:00Z", "max_points": 100}
+
+        temperatures, cursor = [], None
+        for _ in range(2):
+            response = self.client.get(url, {**params, "downsample": "none", **({"cursor": cursor} if cursor else {})})
+            temperatures += [r["temperature"] for r in response.data["results"]]
+            cursor = response.data["next"]
+        self.assertIsNone(cursor)
+        self.assertEqual(temperatures, [float(h) for h in range(166, 338)])
+
+        sampled = self.client.get(url, params).data
+        self.assertEqual(sampled["downsampled"], "lttb")
+        self.assertLessEqual(sampled["count"], 100)
+        self.assertEqual(sampled["results"][0]["temperature"], 166.0)
+        self.assertEqual(sampled["results"][-1]["temperature"], 337.0)
+
+
+    def _add_late_readings(self, hours):
+        SensorReading.objects.bulk_create([
+            SensorReading(sensor_id="abc123", timestamp=self.start + datetime.timedelta(hours=h, minutes=30), temperature=-1.0)
+            for h in hours
+        ])
+        # As the ingest path's incremental rollup upsert does
+        SensorRollup.objects.filter(sensor_id="abc123", resolution=SensorRollup.WEEK, bucket_start=self.start).update(
+            datapoints=F("datapoints") + len(hours),
+        )
+
+    def _history(self, start, end):
+        return [row[0] for row in iter_history("abc123", start, end)]
+
+    def test_late_readings_are_merged_into_the_archive(self):
+        archive_closed_weeks(now=self.now, hot_weeks=0)
+        self._add_late_readings([5, 100])
+
+        entries = archive_closed_weeks(now=self.now, hot_weeks=0)
+        self.assertEqual([(e.week_number, e.row_count, e.rows_deleted) for e in entries], [(10, 170, True)])
+        self.assertEqual(archive_closed_weeks(now=self.now, hot_weeks=0), [])
+        self.assertFalse(SensorReading.objects.filter(timestamp__lt=self.start + datetime.timedelta(weeks=2)).exists())
+        timestamps = self._history(self.start, self.start + datetime.timedelta(weeks=1))
+        self.assertEqual(len(timestamps), 170)
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertIn(self.start + datetime.timedelta(hours=100, minutes=30), timestamps)
+
+    def test_reading_arriving_while_archiving_is_kept(self):
+        write_table = archive.pq.write_table
+
+        def write_after_late_reading(*args, **kwargs):
+            # Lands in week 10 after its rows were read, before they are deleted
+            if not SensorReadingArchive.objects.exists():
+                self._add_late_readings([9])
+            return write_table(*args, **kwargs)
+
+        with patch.object(archive.pq, "write_table", side_effect=write_after_late_reading):
+            entries = archive_closed_weeks(now=self.now, hot_weeks=0)
+        self.assertEqual([e.row_count for e in entries], [168, 168])
+        late = SensorReading.objects.get(timestamp__lt=self.start + datetime.timedelta(weeks=1))
+        self.assertEqual(late.timestamp, self.start + datetime.timedelta(hours=9, minutes=30))
+
+        # The next run archives it
+        self.assertEqual([e.row_count for e in archive_closed_weeks(now=self.now, hot_weeks=0)], [169])
+        self.assertFalse(SensorReading.objects.filter(timestamp__lt=self.start + datetime.timedelta(weeks=2)).exists())
+
+    @override_settings(SENSOR_ARCHIVE_DELETE_ROWS=False)
+    def test_late_readings_reach_the_archive_when_rows_are_kept(self):
+        archive_closed_weeks(now=self.now, hot_weeks=0)
+        self._add_late_readings([7])
+
+        entries = archive_closed_weeks(now=self.now, hot_weeks=0)
+        self.assertEqual([(e.week_number, e.row_count, e.rows_deleted) for e in entries], [(10, 169, False)])
+        self.assertEqual(SensorReading.objects.count(), 21 * 24 + 1)
+        self.assertEqual(len(self._history(self.start, self.start + datetime.timedelta(weeks=1))), 169)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            self.consumed = start + chunk_size
+            yield self.content[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def cached_payload(sensor_id):
+    return json.loads(render_response(sensor_id, cache.get(f"sensor:{sensor_id}")))["data"]
+
+
+def upstream_body(start, count, step=datetime.timedelta(minutes=1)):
+    """An ESMC-style payload of `count` points, newest first, the newest at `start`."""
+    return json.dumps({
+        "status": 200,
+        "message": "Success",
+        "sensorID": "abc123",
+        "points": [
+            {"esmcTime": (start - i * step).strftime("%Y-%m-%dT%H:%M:%SZ"), "temperature": str(i)}
+            for i in range(count)
+        ],
+    }).encode()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SENSOR_DELTA_SYNC=False,
+)
+class ConditionalSensorFetchTests(TestCase):
+    body = json.dumps({"status": 200, "points": [{"esmcTime": "2025-01-01T00:00:00Z", "temperature": "21.5"}]}).encode()
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_validators_are_sent_back_and_304_keeps_the_payload(self):
+        self.get.return_value = FakeResponse(200, self.body, {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"})
+        self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 cached successfully")
+        self.assertEqual(cached_payload("abc123")["points"][0]["temperature"], "21.5")
+
+        self.get.return_value = FakeResponse(304)
+        with patch.object(cache, "set", wraps=cache.set) as cache_set:
+            self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 unchanged")
+        # Only the refresh schedule is written, the cached entries just get their TTL extended
+        self.assertEqual([c.args[0] for c in cache_set.call_args_list], ["sensor:abc123:schedule"])
+        headers = self.get.call_args.kwargs["headers"]
+        self.assertEqual(headers["If-None-Match"], '"v1"')
+        self.assertEqual(headers["If-Modified-Since"], "Wed, 01 Jan 2025 00:00:00 GMT")
+        self.assertIsNotNone(cache.get("sensor:abc123"))
+
+    def test_identical_body_is_not_parsed_or_rewritten(self):
+        self.get.return_value = FakeResponse(200, self.body)
+        fetch_and_cache_sensor("abc123")
+        with patch("sep2025_project_team_004.sensor_data.upstream.read_points") as parse, \
+                patch.object(cache, "set_many") as set_many:
+            self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 unchanged")
+        parse.assert_not_called()
+        set_many.assert_not_called()
+
+        self.get.return_value = FakeResponse(200, self.body.replace(b"21.5", b"22.0"))
+        self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 cached successfully")
+        self.assertEqual(cached_payload("abc123")["points"][0]["temperature"], "22")
+
+    def test_expired_payload_is_downloaded_in_full(self):
+        self.get.return_value = FakeResponse(200, self.body, {"ETag": '"v1"'})
+        fetch_and_cache_sensor("abc123")
+        cache.delete("sensor:abc123")
+
+        self.get.side_effect = [FakeResponse(304), FakeResponse(200, self.body, {"ETag": '"v1"'})]
+        self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 cached successfully")
+        self.assertEqual(self.get.call_args.kwargs["headers"], {})
+        self.assertIsNotNone(cache.get("sensor:abc123"))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SENSOR_DELTA_SYNC=True,
+    SENSOR_CACHE_MAX_POINTS=100,
+)
+class SensorDeltaSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.start = datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc)
+
+    def cached_points(self):
+        return cached_payload("abc123")["points"]
+
+    def test_first_sync_stops_reading_at_the_cap(self):
+        response = FakeResponse(200, upstream_body(self.start, 20000))
+        self.get.return_value = response
+        self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 cached successfully")
+
+        points = self.cached_points()
+        self.assertEqual(len(points), 100)
+        self.assertEqual(points[0]["esmcTime"], "2025-05-04T10:00:00Z")
+        self.assertEqual(points[1]["temperature"], "1")
+        self.assertEqual(cached_payload("abc123")["status"], 200)
+        self.assertLess(response.consumed, len(response.content) // 10)
+
+    def test_only_points_newer_than_the_watermark_are_read_and_merged(self):
+        self.get.return_value = FakeResponse(200, upstream_body(self.start, 50))
+        fetch_and_cache_sensor("abc123")
+
+        later = self.start + datetime.timedelta(minutes=3)
+        response = FakeResponse(200, upstream_body(later, 20000))
+        self.get.return_value = response
+        self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 cached successfully")
+        self.assertLess(response.consumed, len(response.content) // 10)
+
+        points = self.cached_points()
+        self.assertEqual(len(points), 53)
+        self.assertEqual(
+            [p["esmcTime"] for p in points[:4]],
+            ["2025-05-04T10:03:00Z", "2025-05-04T10:02:00Z", "2025-05-04T10:01:00Z", "2025-05-04T10:00:00Z"],
+        )
+        newest = SensorLatest.objects.get(sensor_id="abc123")
+        self.assertEqual((newest.timestamp, newest.temperature, newest.humidity), (later, 0.0, None))
+
+        self.get.return_value = FakeResponse(200, upstream_body(later, 20000))
+        with patch.object(cache, "set_many") as set_many:
+            self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 unchanged")
+        set_many.assert_not_called()
+
+    def test_expired_payload_resets_the_watermark(self):
+        self.get.return_value = FakeResponse(200, upstream_body(self.start, 50))
+        fetch_and_cache_sensor("abc123")
+        cache.delete("sensor:abc123")
+
+        self.get.return_value = FakeResponse(200, upstream_body(self.start, 50))
+        self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 cached successfully")
+        self.assertEqual(len(self.cached_points()), 50)
+
+    def test_points_are_parsed_into_typed_records(self):
+        body = json.dumps({"points": [
+            {"esmcTime": "2025-05-04T10:00:00Z", "temperature": "25.5", "soilTemperature": "NaN", "vcc": "3.3"},
+            {"esmcTime": "not a time", "temperature": "1"},
+            {"esmcTime": "2025-05-04T09:59:00", "temperature": 24, "humidity": ""},
+        ]}).encode()
+        self.get.return_value = FakeResponse(200, body)
+        fetch_and_cache_sensor("abc123")
+
+        newest, oldest = self.cached_points()
+        self.assertEqual(newest["temperature"], "25.5")
+        self.assertEqual(newest["soilTemperature"], "NaN")
+        self.assertEqual(newest["vcc"], "3.3")
+        self.assertEqual(oldest["esmcTime"], "2025-05-04T09:59:00Z")
+        self.assertEqual(oldest["temperature"], "24")
+        self.assertEqual(oldest["humidity"], "NaN")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SensorSeriesEncodingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        start = datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc).timestamp()
+        self.envelope = {"status": 200, "message": "Success", "sensorID": "usda-air-w06"}
+        self.points = [
+            SensorPoint(start - 60 * i, 21.3 + i / 10, 45.0, 1001.2, None, None, None, 3.3)
+            for i in range(2000)
+        ]
+
+    def test_round_trip_keeps_float32_precision(self):
+        envelope, points = decode(encode(self.envelope, self.points))
+        self.assertEqual(envelope, self.envelope)
+        self.assertEqual(len(points), 2000)
+        self.assertEqual([p.timestamp for p in points], [p.timestamp for p in self.points])
+        self.assertAlmostEqual(points[0].temperature, 21.3, places=5)
+        self.assertIsNone(points[0].soilMoisture5)
+
+    def test_encoding_is_far_smaller_than_json(self):
+        blob = encode(self.envelope, self.points)
+        as_json = json.dumps({**self.envelope, "points": [p._asdict() for p in self.points]}).encode()
+        self.assertLess(len(blob) * 10, len(as_json))
+
+    def test_view_renders_the_encoded_payload(self):
+        cache.set("sensor:usda-air-w06", encode(self.envelope, self.points[:2]))
+        response = self.client.get(reverse("sensor_data:sensor-data", args=["usda-air-w06"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = response.json()
+        self.assertEqual(body["sensor_id"], "usda-air-w06")
+        self.assertEqual(body["data"]["message"], "Success")
+        # The upstream's wire format: values as strings, "NaN" where missing
+        self.assertEqual(body["data"]["points"][1], {
+            "esmcTime": "2025-05-04T09:59:00Z",
+            "temperature": "21.4",
+            "humidity": "45",
+            "pressure": "1001.2",
+            "soilMoisture20": "NaN",
+            "soilMoisture5": "NaN",
+            "soilTemperature": "NaN",
+            "vcc": "3.3",
+        })
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SENSOR_DELTA_SYNC=True,
+)
+class SensorResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.start = datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc)
+        self.url = reverse("sensor_data:sensor-data", args=["usda-air-w06"])
+
+    def refresh(self, start, count):
+        self.get.return_value = FakeResponse(200, upstream_body(start, count))
+        fetch_and_cache_sensor("usda-air-w06")
+
+    def test_refresh_stores_the_gzipped_body_and_the_view_serves_it_as_is(self):
+        self.refresh(self.start, 3)
+        stored = cache.get("sensor:usda-air-w06:response")
+        self.assertEqual(
+            json.loads(gzip.decompress(stored["body"])),
+            {"sensor_id": "usda-air-w06", "data": cached_payload("usda-air-w06")},
+        )
+
+        with patch("sep2025_project_team_004.sensor_data.series.render_response") as render, \
+                patch("json.dumps") as dumps:
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        render.assert_not_called()
+        dumps.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, stored["body"])
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], f'"{stored["digest"]}-gzip"')
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        plain = self.client.get(self.url)
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(plain["ETag"], f'"{stored["digest"]}"')
+        self.assertEqual(plain.json()["data"]["points"][0]["esmcTime"], "2025-05-04T10:00:00Z")
+
+    def test_matching_if_none_match_gets_a_304_until_the_data_changes(self):
+        self.refresh(self.start, 3)
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        self.refresh(self.start + datetime.timedelta(minutes=1), 3)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_unchanged_refresh_rebuilds_a_missing_response(self):
+        self.refresh(self.start, 3)
+        stored = cache.get("sensor:usda-air-w06:response")
+        cache.delete("sensor:usda-air-w06:response")
+
+        self.get.return_value = FakeResponse(304)
+        self.assertEqual(fetch_and_cache_sensor("usda-air-w06"), "usda-air-w06 unchanged")
+        self.assertEqual(cache.get("sensor:usda-air-w06:response"), stored)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SENSOR_L1_CACHE=True,
+)
+class SensorL1CacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        localcache.local_cache().clear()
+        self.addCleanup(localcache.local_cache().clear)
+        patcher = patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        clock = patch("sep2025_project_team_004.sensor_data.localcache.time.monotonic", return_value=1000.0)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+        self.start = datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc)
+        self.url = reverse("sensor_data:sensor-data", args=["usda-air-w06"])
+
+    def refresh(self, start):
+        self.get.return_value = FakeResponse(200, upstream_body(start, 3))
+        fetch_and_cache_sensor("usda-air-w06")
+
+    def newest_time(self):
+        return self.client.get(self.url).json()["data"]["points"][0]["esmcTime"]
+
+    def test_hot_key_is_served_from_memory_until_the_version_changes(self):
+        self.refresh(self.start)
+        self.assertEqual(self.newest_time(), "2025-05-04T10:00:00Z")
+
+        with patch.object(cache, "get") as redis_get, patch.object(cache, "get_many") as redis_get_many:
+            self.assertEqual(self.newest_time(), "2025-05-04T10:00:00Z")
+        redis_get.assert_not_called()
+        redis_get_many.assert_not_called()
+
+        # Past the TTL an unchanged entry is revalidated with one GET of the version key
+        # (plus the once-per-TTL check of its soft TTL)
+        self.clock.return_value += settings.SENSOR_L1_TTL
+        with patch.object(cache, "get", wraps=cache.get) as redis_get:
+            self.assertEqual(self.newest_time(), "2025-05-04T10:00:00Z")
+        self.assertEqual(
+            [c.args[0] for c in redis_get.call_args_list if c.args[0].startswith("sensor:")],
+            ["sensor:usda-air-w06:version", "sensor:usda-air-w06:fresh"],
+        )
+
+        self.refresh(self.start + datetime.timedelta(minutes=1))
+        self.assertEqual(self.newest_time(), "2025-05-04T10:00:00Z")
+        self.clock.return_value += settings.SENSOR_L1_TTL
+        self.assertEqual(self.newest_time(), "2025-05-04T10:01:00Z")
+
+        stats = localcache.stats()
+        self.assertEqual((stats["hits"], stats["revalidations"], stats["misses"]), (2, 1, 2))
+        self.assertEqual(stats["hit_ratio"], 0.6)
+
+    def test_lru_is_bounded_by_bytes(self):
+        l1 = localcache.LocalCache(max_bytes=250, ttl=5)
+        for key in ("a", "b", "c"):
+            l1.store(key, b"x" * 100, "v1", now=0)
+            l1.lookup("a", now=0)
+        self.assertIsNotNone(l1.lookup("a", now=0))
+        self.assertIsNone(l1.lookup("b", now=0))
+        self.assertEqual(l1.stats()["bytes"], 200)
+        self.assertEqual(l1.stats()["evictions"], 1)
+
+        l1.store("huge", b"x" * 1000, "v1", now=0)
+        self.assertIsNone(l1.lookup("huge", now=0))
+
+    def test_stats_are_for_admins_only(self):
+        self.assertEqual(self.client.get(reverse("sensor_data:sensor-cache-stats")).status_code, 403)
+        admin = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="something-r@nd0m!",  # noqa: S106
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse("sensor_data:sensor-cache-stats"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hit_ratio", response.json())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SensorRevalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        delay = patch.object(fetch_and_cache_sensor, "delay")
+        self.delay = delay.start()
+        self.addCleanup(delay.stop)
+        self.body = upstream_body(datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc), 3)
+        self.url = reverse("sensor_data:sensor-data", args=["usda-air-w06"])
+
+    def test_soft_expired_data_is_served_while_one_background_refresh_runs(self):
+        self.get.return_value = FakeResponse(200, self.body)
+        fetch_and_cache_sensor("usda-air-w06")
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.delay.assert_not_called()
+
+        cache.delete("sensor:usda-air-w06:fresh")
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.delay.assert_called_once_with("usda-air-w06")
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_hard_miss_is_fetched_once_for_concurrent_requests(self):
+        def slow_get(*args, **kwargs):
+            time.sleep(0.2)
+            return FakeResponse(200, self.body)
+
+        self.get.side_effect = slow_get
+        entries = []
+        threads = [
+            threading.Thread(target=lambda: entries.append(revalidation.refresh_once("usda-air-w06")))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.get.call_count, 1)
+        self.assertEqual(len(entries), 5)
+        self.assertTrue(all(entry == entries[0] and entry is not None for entry in entries))
+        self.assertIsNone(cache.get("sensor:usda-air-w06:refreshing"))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_hard_miss_fetch_runs_outside_a_request_transaction(self):
+        outside = len(connection.atomic_blocks)
+        inside = []
+        with patch("sep2025_project_team_004.sensor_data.revalidation.fetch_and_cache_sensor") as fetch:
+            fetch.side_effect = lambda sensor_id: inside.append(len(connection.atomic_blocks))
+            self.client.get(self.url)
+        # ATOMIC_REQUESTS would have added one block around the view
+        self.assertEqual(inside, [outside])
+
+    def test_unreadable_payload_on_a_refresh_falls_back_to_the_cached_entry(self):
+        self.get.return_value = FakeResponse(200, self.body)
+        fetch_and_cache_sensor("usda-air-w06")
+        entry = cache.get(responses.response_key("usda-air-w06"))
+        with patch("sep2025_project_team_004.sensor_data.revalidation.fetch_and_cache_sensor") as fetch:
+            fetch.side_effect = ValueError("Unexpected end of JSON input")
+            self.assertEqual(revalidation.refresh_once("usda-air-w06"), entry)
+            cache.clear()
+            self.assertEqual(self.client.get(self.url).status_code, 503)
+        self.assertIsNone(cache.get("sensor:usda-air-w06:refreshing"))
+
+    def test_failed_refresh_on_a_hard_miss_returns_503(self):
+        self.get.return_value = FakeResponse(500)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertIsNone(cache.get("sensor:usda-air-w06:refreshing"))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SENSOR_REFRESH_INTERVAL=60,
+    SENSOR_ACTIVE_WINDOW=900,
+    SENSOR_IDLE_REFRESH_INTERVAL=1200,
+)
+class SensorRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.invalidate()
+        self.addCleanup(registry.invalidate)
+        registry._recorded.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="owner", password="pass", email="owner@example.com")
+        for sensor_id in ("reg-popular", "reg-idle"):
+            Belongs.objects.create(sensor_id=sensor_id, sensor_type="air", user=self.owner, address="1 Main St")
+        for i in range(3):
+            fan = User.objects.create_user(username=f"fan{i}", password="pass", email=f"fan{i}@example.com")
+            Fav_Sensor.objects.create(sensor_id="reg-popular", user=fan, belongs_to=self.owner)
+
+    def test_valid_ids_come_from_belongs_and_are_served_from_memory(self):
+        self.assertTrue({"reg-popular", "reg-idle", "usda-air-w06"} <= registry.valid_sensor_ids())
+        with self.assertNumQueries(0), patch.object(cache, "get") as redis_get:
+            self.assertIn("reg-idle", registry.valid_sensor_ids())
+            self.assertNotIn("unknown", registry.valid_sensor_ids())
+        redis_get.assert_not_called()
+
+        self.assertEqual(self.client.get(reverse("sensor_data:sensor-data", args=["unknown"])).status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            Belongs.objects.create(sensor_id="reg-new", sensor_type="soil", user=self.owner, address="2 Main St")
+        self.assertIn("reg-new", registry.valid_sensor_ids())
+
+    def test_queried_and_favorite_sensors_refresh_more_often(self):
+        registry.record_query("reg-idle")
+        entries = registry.build()
+        self.assertEqual(entries["reg-idle"]["interval"], 60)
+        self.assertEqual(entries["reg-popular"]["interval"], 300)
+        self.assertEqual(entries["usda-air-w05"]["interval"], 1200)
+        self.assertEqual(list(entries)[:2], ["reg-idle", "reg-popular"])
+
+    def test_refresh_queues_due_sensors_once_with_their_countdown(self):
+        with patch.object(fetch_and_cache_sensor, "apply_async") as apply_async:
+            self.assertEqual(refresh_all_sensors(), "refreshing 5/5 sensors")
+            self.assertEqual(refresh_all_sensors(), "refreshing 0/5 sensors")
+        first = apply_async.call_args_list[0]
+        self.assertEqual(first.args, (("reg-popular",), {"interval": 300}))
+        self.assertTrue(all(0 <= c.kwargs["countdown"] <= settings.SENSOR_REFRESH_JITTER for c in apply_async.call_args_list))
+
+        now = time.time()
+        cache.set(scheduling.state_key("reg-idle"), {"next_fetch": now + 5})
+        cache.set(scheduling.state_key("reg-popular"), {"next_fetch": now + 3600})
+        with patch.object(fetch_and_cache_sensor, "apply_async") as apply_async:
+            self.assertEqual(refresh_all_sensors(), "refreshing 1/5 sensors")
+        self.assertEqual(apply_async.call_args.args[0], ("reg-idle",))
+        self.assertAlmostEqual(apply_async.call_args.kwargs["countdown"], 5, delta=1)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SENSOR_REFRESH_INTERVAL=60,
+    SENSOR_REFRESH_GRACE=15,
+    SENSOR_REFRESH_JITTER=20,
+    SENSOR_MAX_BACKOFF=1800,
+)
+class SensorSchedulingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        jitter = patch("sep2025_project_team_004.sensor_data.scheduling.random.uniform", return_value=0)
+        self.jitter = jitter.start()
+        self.addCleanup(jitter.stop)
+        self.now = datetime.datetime(2025, 5, 4, 10, 1, tzinfo=datetime.timezone.utc).timestamp()
+        newest = self.now - 60
+        self.times = [newest - 300 * i for i in range(50)]
+
+    def test_next_fetch_follows_the_learned_cadence(self):
+        state = scheduling.plan(None, "changed", self.times, 60, self.now)
+        self.assertEqual(state["cadence"], 300)
+        self.assertEqual(state["next_fetch"], self.times[0] + 300 + 15)
+
+        # The demand interval of an idle sensor is the floor
+        state = scheduling.plan(None, "changed", self.times, 1200, self.now)
+        self.assertEqual(state["next_fetch"], self.now + 1200)
+
+    def test_late_sensor_backs_off_exponentially_until_a_point_arrives(self):
+        state = scheduling.plan(None, "changed", self.times, 60, self.now)
+        delays = []
+        now = state["next_fetch"]
+        for _ in range(4):
+            state = scheduling.plan(state, "unchanged", None, 60, now)
+            delays.append(state["next_fetch"] - now)
+            now = state["next_fetch"]
+        cap = scheduling.max_delay()
+        self.assertEqual(delays, [600, 1200, cap, cap])
+        # The cached payload is still there for the next fetch
+        self.assertLess(cap + 20, tasks.CACHE_TIMEOUT)
+
+        times = [now - 10] + self.times
+        state = scheduling.plan(state, "changed", times, 60, now)
+        self.assertEqual(state["misses"], 0)
+        self.assertEqual(state["next_fetch"], now - 10 + 300 + 15)
+
+    def test_failures_back_off_and_jitter_spreads_fetches(self):
+        state = None
+        delays = []
+        for _ in range(7):
+            state = scheduling.plan(state, "failed", None, 60, self.now)
+            delays.append(state["next_fetch"] - self.now)
+        cap = scheduling.max_delay()
+        self.assertEqual(delays, [60, 120, 240, 480, 960, cap, cap])
+        self.assertLess(cap + 20, tasks.CACHE_TIMEOUT)
+
+        self.jitter.return_value = 7.5
+        state = scheduling.plan(None, "changed", self.times, 60, self.now)
+        self.assertEqual(state["next_fetch"], self.times[0] + 300 + 15 + 7.5)
+        self.jitter.assert_called_with(0, 20)
+
+    @patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+    def test_refresh_records_the_schedule(self, get):
+        start = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        get.return_value = FakeResponse(200, upstream_body(start, 10, step=datetime.timedelta(minutes=5)))
+        fetch_and_cache_sensor("abc123", interval=60)
+        state = cache.get(scheduling.state_key("abc123"))
+        self.assertEqual(state["cadence"], 300)
+        self.assertEqual(state["newest"], start.timestamp())
+        self.assertAlmostEqual(state["next_fetch"], start.timestamp() + 315, delta=1)
+
+    @patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+    def test_truncated_body_counts_as_a_failed_fetch(self, get):
+        body = upstream_body(datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc), 10)
+        for delta_sync in (True, False):
+            cache.clear()
+            get.return_value = FakeResponse(200, body[:len(body) // 2])
+            with self.subTest(delta_sync=delta_sync), self.settings(SENSOR_DELTA_SYNC=delta_sync):
+                self.assertEqual(fetch_and_cache_sensor("abc123", interval=60), "abc123 fetch failed")
+                self.assertEqual(cache.get(scheduling.state_key("abc123"))["failures"], 1)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SENSOR_BREAKER_FAILURES=3,
+    SENSOR_BREAKER_RESET_TIMEOUT=60,
+)
+class UpstreamCircuitBreakerTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch("sep2025_project_team_004.sensor_data.upstream.requests.get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.body = upstream_body(datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc), 3)
+
+    def trip(self):
+        self.get.side_effect = requests.Timeout("read timed out")
+        for _ in range(3):
+            self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 fetch failed")
+        self.get.side_effect = None
+
+    def test_breaker_opens_after_failures_and_fails_fast(self):
+        self.get.return_value = FakeResponse(503)
+        fetch_and_cache_sensor("abc123")
+        self.get.return_value = FakeResponse(200, self.body)
+        fetch_and_cache_sensor("abc123")
+        self.assertEqual(breaker.stats()["consecutive_failures"], 0)
+
+        self.trip()
+        self.assertEqual(breaker.state(), "open")
+        self.get.reset_mock()
+        self.assertEqual(fetch_and_cache_sensor("usda-air-w06"), "usda-air-w06 deferred, upstream circuit open")
+        self.get.assert_not_called()
+        # A deferred sensor is retried once the breaker lets probes through, not counted as failing
+        state = cache.get(scheduling.state_key("usda-air-w06"))
+        self.assertNotIn("failures", state)
+        self.assertGreaterEqual(state["next_fetch"], time.time() + 59)
+
+        with patch.object(fetch_and_cache_sensor, "apply_async") as apply_async:
+            self.assertTrue(refresh_all_sensors().startswith("upstream circuit open"))
+        apply_async.assert_not_called()
+
+    def test_half_open_breaker_lets_one_probe_through(self):
+        self.trip()
+        cache.set(breaker.OPENED_KEY, time.time() - 61, breaker.STATE_TIMEOUT)
+        self.assertEqual(breaker.state(), "half_open")
+        with patch.object(fetch_and_cache_sensor, "apply_async") as apply_async:
+            refresh_all_sensors()
+        self.assertEqual(apply_async.call_count, 1)
+
+        # A failed probe opens the breaker again
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure(10)
+        self.assertEqual(breaker.state(), "open")
+
+        # A successful one closes it
+        cache.set(breaker.OPENED_KEY, time.time() - 61, breaker.STATE_TIMEOUT)
+        self.get.return_value = FakeResponse(200, self.body)
+        self.assertEqual(fetch_and_cache_sensor("abc123"), "abc123 cached successfully")
+        self.assertEqual(breaker.state(), "closed")
+
+        stats = breaker.stats()
+        self.assertEqual(
+            (stats["successes"], stats["failures"], stats["rejected"], stats["opened"], stats["closed"]),
+            (1, 4, 1, 2, 1),
+        )
+        self.assertEqual(stats["latency"]["count"], 5)
+        self.assertEqual(stats["latency"]["buckets"]["le_10"], 1)
+
+    def test_stale_data_is_served_without_queueing_refreshes_while_open(self):
+        self.get.return_value = FakeResponse(200, self.body)
+        fetch_and_cache_sensor("usda-air-w06")
+        cache.delete("sensor:usda-air-w06:fresh")
+        self.trip()
+        with patch.object(fetch_and_cache_sensor, "delay") as delay:
+            response = self.client.get(reverse("sensor_data:sensor-data", args=["usda-air-w06"]))
+        self.assertEqual(response.status_code, 200)
+        delay.assert_not_called()
+
+    def test_fetches_are_routed_to_their_own_queue(self):
+        self.assertEqual(
+            settings.CELERY_TASK_ROUTES[fetch_and_cache_sensor.name],
+            {"queue": settings.SENSOR_UPSTREAM_QUEUE},
+        )
+        self.assertNotIn(refresh_all_sensors.name, settings.CELERY_TASK_ROUTES)
+
+    def test_stats_are_for_admins_only(self):
+        url = reverse("sensor_data:sensor-upstream-stats")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        admin = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="something-r@nd0m!",  # noqa: S106
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "closed")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SensorLatestReadingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="dash", password="pw", email="dash@example.com")
+        latest.record({
+            "a": {"timestamp": 2000, "temperature": 21.5, "humidity": 40.0},
+            "b": {"timestamp": 1000, "temperature": 18.0, "soilMoisture5": 0.3},
+            "c": None,
+        })
+
+    def test_older_readings_never_replace_newer_ones(self):
+        latest.record({"a": {"timestamp": 1500, "temperature": 5.0}, "b": {"timestamp": 3000, "temperature": 19.0}})
+        readings = latest.get_many(["a", "b", "c"])
+        self.assertEqual(set(readings), {"a", "b"})
+        self.assertEqual((readings["a"]["timestamp"], readings["a"]["temperature"]), (2000, 21.5))
+        self.assertEqual((readings["b"]["timestamp"], readings["b"]["temperature"]), (3000, 19.0))
+        self.assertIsNone(readings["b"]["soilMoisture5"])
+
+    def test_batch_endpoint_returns_the_requested_sensors_in_order(self):
+        response = self.client.get(reverse("sensor_data:sensor-latest"), {"ids": "b,zzz,a,b"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["sensor_id"] for r in response.data["results"]], ["b", "a"])
+        self.assertEqual(response.data["missing"], ["zzz"])
+        self.assertEqual(response.data["results"][0]["timestamp"], datetime.datetime(1970, 1, 1, 0, 16, 40, tzinfo=datetime.timezone.utc))
+        self.assertEqual(response.data["results"][1]["humidity"], 40.0)
+
+        too_many = ",".join(f"s{i}" for i in range(501))
+        self.assertEqual(self.client.get(reverse("sensor_data:sensor-latest"), {"ids": too_many}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("sensor_data:sensor-latest")).status_code, 400)
+
+    def test_batch_endpoint_defaults_to_the_users_favorites(self):
+        for sensor_id in ("a", "c"):
+            Belongs.objects.create(sensor_id=sensor_id, sensor_type="air", user=self.user, address="1 Test St")
+            Fav_Sensor.objects.create(sensor_id=sensor_id, user=self.user, belongs_to=self.user)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("sensor_data:sensor-latest"))
+        self.assertEqual([r["sensor_id"] for r in response.data["results"]], ["a"])
+        self.assertEqual(response.data["missing"], ["c"])
+
+
+SCHEDULER_CELERY_DIR = Path(__file__).resolve().parents[3] / "scheduler_backend" / "scheduler_backend" / "celery"
+
+
+def scheduler_module(name):
+    """Imports a module of scheduler_backend's celery package, which writes the cache entries this app reads."""
+    if "scheduler_celery" not in sys.modules:
+        package = types.ModuleType("scheduler_celery")
+        package.__path__ = [str(SCHEDULER_CELERY_DIR)]
+        sys.modules["scheduler_celery"] = package
+    return importlib.import_module(f"scheduler_celery.{name}")
+
+
+@unittest.skipUnless(SCHEDULER_CELERY_DIR.is_dir(), "scheduler_backend is not checked out next to this project")
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SchedulerBackendCompatibilityTests(TestCase):
+    """scheduler_backend keeps its own copies of series, upstream, breaker, scheduling and registry; both must agree."""
+
+    def setUp(self):
+        cache.clear()
+        start = datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc).timestamp()
+        self.envelope = {"status": 200, "message": "Success", "sensorID": "abc123"}
+        self.points = [
+            SensorPoint(start - 60 * i - (i % 3), 21.3 + i / 7, None if i % 4 else 45.5, 1001.2, None, 0.31, -2.5, 3.3)
+            for i in range(500)
+        ]
+
+    def test_payloads_round_trip_between_the_projects(self):
+        series = scheduler_module("series")
+        ours = encode(self.envelope, self.points)
+        theirs = series.encode(self.envelope, [series.SensorPoint(*point) for point in self.points])
+        self.assertEqual(ours, theirs)
+        self.assertEqual(tuple(series.SensorPoint._fields), tuple(SensorPoint._fields))
+        self.assertEqual(decode(theirs), tuple(series.decode(ours)))
+        self.assertEqual(render_response("abc123", theirs), series.render_response("abc123", ours))
+        self.assertEqual(decode(series.encode({}, [])), ({}, []))
+
+    def test_cached_responses_and_keys_match(self):
+        scheduler_responses = scheduler_module("responses")
+        scheduler_tasks = scheduler_module("tasks")
+        blob = encode(self.envelope, self.points)
+        entry = scheduler_responses.build("abc123", blob)
+        self.assertEqual(entry, responses.build("abc123", blob))
+        self.assertEqual(gzip.decompress(entry["body"]), render_response("abc123", blob))
+        self.assertEqual(scheduler_responses.response_key("abc123"), responses.response_key("abc123"))
+        self.assertEqual(scheduler_responses.version_key("abc123"), responses.version_key("abc123"))
+        self.assertEqual(scheduler_tasks.sensor_key("abc123"), upstream.sensor_key("abc123"))
+        self.assertEqual(scheduler_tasks.validators_key("abc123"), upstream.validators_key("abc123"))
+        self.assertEqual(scheduler_tasks.fresh_key("abc123"), upstream.fresh_key("abc123"))
+        self.assertEqual(scheduler_module("scheduling").state_key("abc123"), scheduling.state_key("abc123"))
+        self.assertEqual(scheduler_module("scheduling").dispatch_key("abc123", 1000), scheduling.dispatch_key("abc123", 1000))
+        self.assertEqual(scheduler_module("latest").HASH_KEY, latest.HASH_KEY)
+        self.assertEqual(scheduler_module("latest").RECORD_SCRIPT.strip(), latest.RECORD_SCRIPT.strip())
+
+    def test_upstream_bodies_parse_the_same(self):
+        scheduler_upstream = scheduler_module("upstream")
+        body = json.loads(upstream_body(datetime.datetime(2025, 5, 4, 10, tzinfo=datetime.timezone.utc), 50))
+        body["points"][3]["humidity"] = "NaN"
+        body["points"][4]["esmcTime"] = "not a time"
+        body["points"][5]["pressure"] = 1001.25
+        content = json.dumps(body).encode()
+        for kwargs in ({}, {"limit": 10}, {"newer_than": upstream.parse_time("2025-05-04T09:30:00Z")}):
+            self.assertEqual(
+                upstream.read_points(upstream._chunks(content, 100), **kwargs),
+                scheduler_upstream.read_points(scheduler_upstream._chunks(content, 100), **kwargs),
+            )
+        self.assertEqual(scheduler_upstream.body_digest(content), upstream.body_digest(content))
+        validators = {"etag": '"v1"', "last_modified": "Sun, 04 May 2025 10:00:00 GMT"}
+        self.assertEqual(scheduler_upstream.conditional_headers(validators), upstream.conditional_headers(validators))
+
+    def test_breaker_opened_by_either_project_stops_the_other(self):
+        scheduler_breaker = scheduler_module("breaker")
+        for _ in range(settings.SENSOR_BREAKER_FAILURES):
+            scheduler_breaker.record(False, 10)
+        self.assertTrue(breaker.is_open())
+        breaker.record_success(0.1)
+        self.assertEqual(scheduler_breaker.state(), "closed")
+        for _ in range(settings.SENSOR_BREAKER_FAILURES):
+            breaker.record_failure(10)
+        self.assertEqual(scheduler_breaker.state(), "open")
+        self.assertFalse(scheduler_breaker.allow())
+
+    def test_scheduler_reads_the_published_registry(self):
+        entries = registry.publish()
+        self.assertEqual(scheduler_module("registry").load(), entries)
@@ -0,0 +1,290 @@
+"""Conditional fetches of sensor payloads from the ESMC endpoint.
+
+The validators of the last response (ETag, Last-Modified and a SHA-256 digest
+of the body) are kept in the cache next to the payload. The next fetch sends
+them back as If-None-Match / If-Modified-Since; if the upstream ignores those,
+an identical body is still recognised by its digest, so unchanged data is
+never re-parsed or re-written, only has its TTL extended.
+
+In delta-sync mode (sync_sensor) the newest timestamp already cached is kept
+as a watermark with the validators. The reverse-chronological response is
+parsed as it streams in and the download is abandoned at the first point at
+or before the watermark; the new points are merged into a payload capped at
+SENSOR_CACHE_MAX_POINTS points.
+
+Points are parsed into SensorPoint records as they are read (numbers as
+floats, "NaN" and missing values as None) and never as one big object graph;
+parsing stops once SENSOR_CACHE_MAX_POINTS points were read. Payloads are
+cached in the columnar encoding from series.py, next to the pre-serialized
+sensor_data_api response built from them (see responses.py). Every refresh
+that confirms a sensor's data, changed or not, also marks it fresh for
+SENSOR_SOFT_TTL seconds (see revalidation.py). The newest point of every
+stored payload is recorded as the sensor's latest reading (see latest.py).
+
+Every request goes through the shared circuit breaker (see breaker.py):
+while the upstream keeps failing, get_sensor() raises breaker.CircuitOpen at
+once instead of waiting FETCH_TIMEOUT seconds for another timeout.
+"""
+import datetime
+import hashlib
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from . import breaker, latest, responses, series
+from .jsonstream import JSONStream, iter_array, iter_object
+from .series import POINT_FIELDS, SensorPoint
+
+logger = logging.getLogger(__name__)
+
+ESMC_URL = "https://esmc.uiowa.edu/esmc_services/data_base/querySensorInDB_working_reverse.php?sensorID={sensor_id}"
+FETCH_TIMEOUT = 10
+STREAM_CHUNK_SIZE = 64 * 1024
+
+UNCHANGED = object()  # returned instead of a payload when the upstream data did not change
+
+
+def sensor_key(sensor_id):
+    return f"sensor:{sensor_id}"
+
+
+def validators_key(sensor_id):
+    return f"sensor:{sensor_id}:validators"
+
+
+def fresh_key(sensor_id):
+    return f"sensor:{sensor_id}:fresh"
+
+
+def lock_key(sensor_id):
+    return f"sensor:{sensor_id}:refreshing"
+
+
+def conditional_headers(validators):
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def body_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def parse_time(value):
+    """Epoch seconds of an esmcTime string (naive values are UTC), or None."""
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number  # NaN
+
+
+def to_point(raw):
+    """A SensorPoint from one upstream point object, or None if it has no valid esmcTime."""
+    timestamp = parse_time(raw.get('esmcTime')) if isinstance(raw, dict) else None
+    if timestamp is None:
+        return None
+    return SensorPoint(timestamp, *map(_number, map(raw.get, POINT_FIELDS)))
+
+
+def _chunks(content, size=STREAM_CHUNK_SIZE):
+    view = memoryview(content)
+    for start in range(0, len(view), size):
+        yield view[start:start + size].tobytes()
+
+
+def store_payload(sensor_id, payload, validators, timeout):
+    """Caches an encoded payload, its validators and its pre-serialized response in one set_many.
+
+    Its newest point is recorded as the sensor's latest reading.
+
+    The version key goes last, so a reader that sees the new version also sees the new entries.
+    """
+    response = responses.build(sensor_id, payload)
+    cache.set_many({
+        sensor_key(sensor_id): payload,
+        validators_key(sensor_id): validators,
+        responses.response_key(sensor_id): response,
+        responses.version_key(sensor_id): response['digest'],
+    }, timeout)
+    cache.set(fresh_key(sensor_id), True, settings.SENSOR_SOFT_TTL)
+    latest.record({sensor_id: series.newest(payload)})
+
+
+def touch_payload(sensor_id, timeout):
+    """Extends the TTL of a cached payload and its response; returns False if the payload has expired."""
+    if not cache.touch(sensor_key(sensor_id), timeout):
+        return False
+    if not (cache.touch(responses.response_key(sensor_id), timeout)
+            and cache.touch(responses.version_key(sensor_id), timeout)):
+        # Cached before responses were pre-serialized (or evicted on its own): rebuild it
+        payload = cache.get(sensor_key(sensor_id))
+        if series.is_encoded(payload):
+            response = responses.build(sensor_id, payload)
+            cache.set_many({
+                responses.response_key(sensor_id): response,
+                responses.version_key(sensor_id): response['digest'],
+            }, timeout)
+    if not cache.touch(fresh_key(sensor_id), settings.SENSOR_SOFT_TTL):
+        cache.set(fresh_key(sensor_id), True, settings.SENSOR_SOFT_TTL)
+    return True
+
+
+def get_sensor(sensor_id, headers, **kwargs):
+    """GETs a sensor's upstream URL through the circuit breaker, timing it up to the response headers.
+
+    Raises breaker.CircuitOpen without sending anything while the breaker is open.
+    """
+    if not breaker.allow():
+        raise breaker.CircuitOpen(f"ESMC circuit open, {sensor_id} not fetched")
+    started = time.monotonic()
+    try:
+        response = requests.get(
+            ESMC_URL.format(sensor_id=sensor_id),
+            headers=headers,
+            timeout=FETCH_TIMEOUT,
+            verify=False,
+            **kwargs,
+        )
+    except requests.RequestException:
+        breaker.record_failure(time.monotonic() - started)
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure(time.monotonic() - started)
+    else:
+        breaker.record_success(time.monotonic() - started)
+    return response
+
+
+def fetch_sensor(sensor_id, validators=None, max_points=None):
+    """Returns (payload, validators); payload is UNCHANGED if the data did not change, None on failure.
+
+    The payload is the encoded upstream envelope with at most `max_points` points.
+    """
+    validators = validators or {}
+    response = get_sensor(sensor_id, conditional_headers(validators))
+    if response.status_code == 304:
+        return UNCHANGED, validators
+    if response.status_code != 200:
+        logger.error(f"{sensor_id} fetch failed with status {response.status_code}")
+        return None, validators
+    new_validators = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'digest': body_digest(response.content),
+    }
+    if new_validators['digest'] == validators.get('digest'):
+        return UNCHANGED, new_validators
+    envelope, points = read_points(_chunks(response.content), limit=max_points)
+    return series.encode(envelope, points), new_validators
+
+
+def refresh_sensor(sensor_id, timeout, max_points=None):
+    """Fetches a sensor and updates its cache entry; returns 'changed', 'unchanged' or 'failed'."""
+    previous = cache.get(validators_key(sensor_id))
+    data, validators = fetch_sensor(sensor_id, previous, max_points)
+    if data is None:
+        return 'failed'
+    if data is UNCHANGED:
+        if touch_payload(sensor_id, timeout):
+            if validators == previous:
+                cache.touch(validators_key(sensor_id), timeout)
+            else:
+                cache.set(validators_key(sensor_id), validators, timeout)
+            return 'unchanged'
+        # The payload expired while its validators survived: download it in full
+        data, validators = fetch_sensor(sensor_id, max_points=max_points)
+        if data is None:
+            return 'failed'
+    store_payload(sensor_id, data, validators, timeout)
+    return 'changed'
+
+
+def read_points(chunks, newer_than=None, limit=None):
+    """Parses an upstream payload from byte chunks into (envelope, SensorPoints).
+
+    Points are read newest first and reading stops at the first point not
+    after `newer_than` (epoch seconds), or once `limit` points were read; the
+    rest of the input is never consumed. Points without a valid esmcTime are
+    dropped. `envelope` holds the other top-level fields seen up to then
+    (status, message, sensorID).
+    """
+    stream = JSONStream(chunks)
+    envelope, points = {}, []
+    for key in iter_object(stream):
+        if key != 'points':
+            envelope[key] = stream.value()
+            continue
+        for raw in iter_array(stream):
+            point = to_point(raw)
+            if point is None:
+                continue
+            if newer_than is not None and point.timestamp <= newer_than:
+                return envelope, points
+            points.append(point)
+            if limit and len(points) >= limit:
+                return envelope, points
+    return envelope, points
+
+
+def _restart_sync(sensor_id, timeout, max_points):
+    # The cached payload expired while its validators survived: drop them and sync from scratch
+    cache.delete(validators_key(sensor_id))
+    return sync_sensor(sensor_id, timeout, max_points)
+
+
+def sync_sensor(sensor_id, timeout, max_points):
+    """Delta-syncs a sensor's cache entry; returns 'changed', 'unchanged' or 'failed'."""
+    state = cache.get(validators_key(sensor_id)) or {}
+    watermark = parse_time(state.get('watermark'))
+    with get_sensor(sensor_id, conditional_headers(state), stream=True) as response:
+        if response.status_code == 304:
+            envelope, points = None, []
+        elif response.status_code != 200:
+            logger.error(f"{sensor_id} fetch failed with status {response.status_code}")
+            return 'failed'
+        else:
+            envelope, points = read_points(response.iter_content(STREAM_CHUNK_SIZE), watermark, max_points)
+        new_state = {
+            **state,
+            'etag': response.headers.get('ETag', state.get('etag')),
+            'last_modified': response.headers.get('Last-Modified', state.get('last_modified')),
+        }
+
+    if not points and (envelope is None or watermark is not None):
+        if not touch_payload(sensor_id, timeout):
+            return _restart_sync(sensor_id, timeout, max_points) if state else 'failed'
+        if new_state == state:
+            cache.touch(validators_key(sensor_id), timeout)
+        else:
+            cache.set(validators_key(sensor_id), new_state, timeout)
+        return 'unchanged'
+
+    cached_envelope, cached_points = {}, []
+    if watermark is not None:
+        cached = cache.get(sensor_key(sensor_id))
+        if not series.is_encoded(cached):
+            return _restart_sync(sensor_id, timeout, max_points)
+        cached_envelope, cached_points = series.decode(cached)
+    payload = series.encode({**cached_envelope, **envelope}, (points + cached_points)[:max_points])
+    if points:
+        newest = max(point.timestamp for point in points)
+        new_state['watermark'] = datetime.datetime.fromtimestamp(newest, datetime.timezone.utc).isoformat()
+    store_payload(sensor_id, payload, new_state, timeout)
+    return 'changed'
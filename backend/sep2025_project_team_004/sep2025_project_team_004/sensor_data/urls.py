@@ -1,10 +1,16 @@
 from django.urls import path
-from .views import sensor_data_api, get_weekly_averages_for_sensor
+from .views import sensor_data_api, sensor_cache_stats, sensor_upstream_stats, get_weekly_averages_for_sensor, get_sensor_rollups, get_sensor_readings, get_latest_readings, export_sensor_readings
 
 app_name = 'sensor_data'
 
 urlpatterns = [
     path('get_average/<str:sensor_id>/', get_weekly_averages_for_sensor, name='get_weekly_averages'), #this must be written frist to get paired first!
+    path('cache_stats/', sensor_cache_stats, name='sensor-cache-stats'), # before <sensor_id>/ for the same reason
+    path('upstream_stats/', sensor_upstream_stats, name='sensor-upstream-stats'),
+    path('latest/', get_latest_readings, name='sensor-latest'),
+    path('<str:sensor_id>/rollups/', get_sensor_rollups, name='sensor-rollups'),
+    path('<str:sensor_id>/readings/', get_sensor_readings, name='sensor-readings'),
+    path('<str:sensor_id>/export/', export_sensor_readings, name='sensor-export'),
     path('<str:sensor_id>/', sensor_data_api, name="sensor-data"),
 
 ]
@@ -1,4 +1,9 @@
+import base64
+import datetime
+
 import requests
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 def fetch_sensor_data(sensor_id):
     url = f"https://esmc.uiowa.edu/esmc_services/data_base/querySensorInDB_working_reverse.php?sensorID={sensor_id}"
@@ -10,14 +15,14 @@ def fetch_sensor_data(sensor_id):
 
 
 # Caching
-from django.core.cache import cache
 import json
+from . import localcache
 
 CACHE_TIMEOUT = 1500 # 25 min
 
 def get_cached_sensor_data(sensor_id):
     cache_key = f"sensor:{sensor_id}"
-    data = cache.get(cache_key)
+    data = localcache.get(sensor_id, cache_key)  # per-process L1 in front of Redis
     
     if data is not None:
         # hit
@@ -30,5 +35,44 @@ def get_cached_sensor_data(sensor_id):
     #     return fresh_data
 
 
+def parse_time_range(params, default_span=datetime.timedelta(days=7)):
+    """Reads ?from=&to= (ISO 8601, naive values taken as UTC) into an aware [start, end) pair.
+
+    `to` defaults to now and `from` to `default_span` before `to`. Raises
+    ValueError on unparseable or inverted ranges.
+    """
+    bounds = {}
+    for name in ('from', 'to'):
+        raw = params.get(name)
+        if not raw:
+            continue
+        value = parse_datetime(raw)
+        if value is None:
+            raise ValueError(f"Invalid '{name}' timestamp: {raw}")
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, datetime.timezone.utc)
+        bounds[name] = value
+    end = bounds.get('to') or timezone.now()
+    start = bounds.get('from') or end - default_span
+    if start >= end:
+        raise ValueError("'from' must be before 'to'.")
+    return start, end
+
+
+def encode_cursor(timestamp, pk):
+    """Opaque keyset cursor for the row (timestamp, pk)."""
+    raw = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
 
+def decode_cursor(cursor):
+    """Inverse of encode_cursor (naive timestamps are UTC); raises ValueError on anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        value = datetime.datetime.fromisoformat(timestamp)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value, int(pk)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor.") from e
@@ -1,26 +1,134 @@
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Max
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET
-from .utils import get_cached_sensor_data
-from .sensors import SENSOR_LIST
+from .utils import decode_cursor, encode_cursor, get_cached_sensor_data, parse_time_range
 from rest_framework import serializers
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .models import WeeklySensorAverage
+from .downsampling import lttb, min_max_buckets
+from .archive import iter_history
+from .export import CONTENT_TYPES, csv_chunks, gzip_chunks, ndjson_chunks
+from .models import SensorReading, SensorRollup, WeeklySensorAverage
+from .rollups import RESOLUTION_NAMES, bucket_start, choose_resolution
+from . import breaker, latest, localcache, registry, responses, revalidation, series
+from sep2025_project_team_004.sensors.models import Fav_Sensor
+from rest_framework.permissions import IsAdminUser
+from rest_framework.decorators import permission_classes
+import datetime
+import itertools
 import logging
 
 logger = logging.getLogger(__name__)
 
+ROLLUP_MAX_POINTS = 500 # default bucket budget when the client does not send max_points
+READINGS_MAX_POINTS = 500 # default page size / downsampling target for raw readings
+READINGS_MAX_POINTS_LIMIT = 10000
+DOWNSAMPLE_METHODS = ('lttb', 'minmax', 'none')
+LATEST_MAX_IDS = 500 # sensors per latest readings request
+
+@transaction.non_atomic_requests  # a hard miss waits on the upstream; no transaction is held open meanwhile
 @require_GET
 def sensor_data_api(request, sensor_id):
-    if sensor_id not in SENSOR_LIST:
+    if sensor_id not in registry.valid_sensor_ids():
         return JsonResponse({"error": "Sensor ID invalid."}, status=400)
+    registry.record_query(sensor_id)
+
+    # Pre-serialized by the refresh task: served as is, or as a 304 on a matching If-None-Match
+    entry = localcache.get(sensor_id, responses.response_key(sensor_id))
+    if entry is not None:
+        # Past the soft TTL the (stale) entry is still served while one background refresh runs
+        revalidation.revalidate_if_stale(sensor_id)
+        return responses.serve(request, entry)
 
     data = get_cached_sensor_data(sensor_id)
+    if series.is_encoded(data):
+        return responses.serve(request, responses.build(sensor_id, data))
     if data:
         return JsonResponse({"sensor_id": sensor_id, "data": data})
+
+    # Hard miss: a single request fetches upstream, concurrent ones wait for its result
+    entry = revalidation.refresh_once(sensor_id)
+    if entry is not None:
+        return responses.serve(request, entry)
+    return JsonResponse({"error": "Sensor data unavailable."}, status=503)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sensor_cache_stats(request):
+    """Hit/miss counters of the L1 sensor cache in the process that serves this request."""
+    return Response(localcache.stats(), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sensor_upstream_stats(request):
+    """State of the shared ESMC circuit breaker with the upstream request counters and timings."""
+    return Response(breaker.stats(), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def get_latest_readings(request):
+    """The latest reading of each sensor in ?ids=a,b,c, in that order, from latest.py.
+
+    Without ?ids= a signed-in user gets those of their favorite sensors, so a
+    dashboard makes one small request instead of a sensor_data_api call per
+    sensor. Sensors without a reading are listed under `missing`.
+    """
+    if request.query_params.get('ids'):
+        sensor_ids = list(dict.fromkeys(filter(None, request.query_params['ids'].split(','))))
+    elif request.user.is_authenticated:
+        sensor_ids = list(Fav_Sensor.objects.filter(user=request.user).values_list('sensor_id', flat=True))
     else:
-        return JsonResponse({"error": "Sensor data unavailable."}, status=503)
+        return Response({"error": "'ids' is required."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(sensor_ids) > LATEST_MAX_IDS:
+        return Response({"error": f"At most {LATEST_MAX_IDS} sensor IDs per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+    readings = latest.get_many(sensor_ids)
+    results = [
+        {
+            "sensor_id": sensor_id,
+            **readings[sensor_id],
+            "timestamp": datetime.datetime.fromtimestamp(readings[sensor_id]['timestamp'], datetime.timezone.utc),
+        }
+        for sensor_id in sensor_ids if sensor_id in readings
+    ]
+    return Response({
+        "count": len(results),
+        "results": results,
+        "missing": [sensor_id for sensor_id in sensor_ids if sensor_id not in readings],
+    }, status=status.HTTP_200_OK)
+
+@require_GET
+def export_sensor_readings(request, sensor_id):
+    """Streams a sensor's readings for ?from=&to= (default: last 30 days) as ?format=csv or ndjson.
+
+    Archived weeks are read from their Parquet files and the rest through a
+    server-side cursor, and rows are written out in chunks, so a download of
+    months of data never sits in memory. The body is gzipped on the fly when
+    the client accepts it.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in CONTENT_TYPES:
+        return JsonResponse({"error": f"Unknown export format: {fmt}"}, status=400)
+    try:
+        start, end = parse_time_range(request.GET, default_span=datetime.timedelta(days=30))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    encode = csv_chunks if fmt == 'csv' else ndjson_chunks
+    chunks = encode(iter_history(sensor_id, start, end))
+
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = StreamingHttpResponse(
+        gzip_chunks(chunks) if use_gzip else chunks,
+        content_type=CONTENT_TYPES[fmt],
+    )
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    filename = f"{sensor_id}_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 class WeeklySensorAverageSerializer(serializers.ModelSerializer):
     """Serializer for the WeeklySensorAverage model."""
@@ -60,3 +168,140 @@ def get_weekly_averages_for_sensor(request, sensor_id):
     except Exception as e:
         logger.error(f"Error retrieving weekly averages for sensor {sensor_id}: {e}")
         return Response({"error": "An internal server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SensorRollupSerializer(serializers.ModelSerializer):
+    """One rollup bucket with count/min/max/mean/stddev per metric (null when the metric was never reported)."""
+    class Meta:
+        model = SensorRollup
+        fields = ['bucket_start', 'datapoints']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for metric in SensorRollup.METRICS:
+            data[metric] = instance.stats(metric)
+        return data
+
+
+@api_view(['GET'])
+def get_sensor_rollups(request, sensor_id):
+    """Aggregated readings for ?from=&to= served from the pre-computed rollups.
+
+    Unless ?resolution= forces one, the finest resolution whose bucket count fits
+    in ?max_points= is used, so any window costs at most max_points rows and
+    never scans sensor_readings.
+    """
+    try:
+        start, end = parse_time_range(request.query_params)
+        max_points = int(request.query_params.get('max_points', ROLLUP_MAX_POINTS))
+        if max_points < 1:
+            raise ValueError("'max_points' must be positive.")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    resolution = request.query_params.get('resolution') or choose_resolution(start, end, max_points)
+    if resolution not in RESOLUTION_NAMES:
+        return Response({"error": f"Unknown resolution: {resolution}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    rollups = SensorRollup.objects.filter(
+        sensor_id=sensor_id,
+        resolution=resolution,
+        bucket_start__gte=bucket_start(start, resolution),
+        bucket_start__lt=end,
+    ).order_by('bucket_start')[:max_points]
+
+    return Response({
+        "sensor_id": sensor_id,
+        "resolution": resolution,
+        "from": start,
+        "to": end,
+        "results": SensorRollupSerializer(rollups, many=True).data,
+    }, status=status.HTTP_200_OK)
+
+
+def _reading_dict(row):
+    timestamp, temperature, pressure, humidity, vcc = row[1:]
+    return {
+        "timestamp": timestamp,
+        "temperature": temperature,
+        "pressure": pressure,
+        "humidity": humidity,
+        "vcc": vcc,
+    }
+
+
+@api_view(['GET'])
+def get_sensor_readings(request, sensor_id):
+    """Raw readings of one sensor for ?from=&to=, bounded to ?max_points= rows.
+
+    Rows come in (timestamp, id) order, archived weeks from their Parquet
+    files (see archive.iter_history). When the range holds more than
+    max_points rows they are downsampled on the server (?downsample=lttb, the
+    default, or minmax) along ?metric= (default temperature), so a chart gets
+    a bounded payload for any window; a stretch where the metric is null keeps
+    one row, so the chart shows the gap. With ?downsample=none the range is paged
+    instead: each page has at most max_points rows and `next` is a keyset
+    cursor to pass back as ?cursor=, so deep pages cost the same as the first.
+    """
+    params = request.query_params
+    try:
+        start, end = parse_time_range(params)
+        max_points = int(params.get('max_points', READINGS_MAX_POINTS))
+        if not 1 <= max_points <= READINGS_MAX_POINTS_LIMIT:
+            raise ValueError(f"'max_points' must be between 1 and {READINGS_MAX_POINTS_LIMIT}.")
+        cursor = decode_cursor(params['cursor']) if params.get('cursor') else None
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    method = params.get('downsample', 'lttb')
+    metric = params.get('metric', 'temperature')
+    if method not in DOWNSAMPLE_METHODS:
+        return Response({"error": f"Unknown downsample method: {method}"}, status=status.HTTP_400_BAD_REQUEST)
+    if metric not in SensorRollup.METRICS:
+        return Response({"error": f"Unknown metric: {metric}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    columns = ('id', 'timestamp', *SensorRollup.METRICS)
+
+    def history():
+        if cursor is None:
+            return iter_history(sensor_id, start, end, columns=columns)
+        rows = iter_history(sensor_id, max(start, cursor[0]), end, columns=columns)
+        return (row for row in rows if (row[1], row[0]) > cursor)
+
+    # One extra row tells whether the range overflows max_points without a COUNT(*)
+    page = list(itertools.islice(history(), max_points + 1))
+    downsampled = None
+    next_cursor = None
+    if len(page) > max_points and method != 'none' and cursor is None:
+        y_index = columns.index(metric)
+
+        def x(row):
+            return row[1].timestamp()
+
+        def y(row):
+            return row[y_index]
+
+        # Streamed: the range is never held in memory, whatever its size
+        if method == 'lttb':
+            # Both passes see the same rows: none inserted after the first began
+            newest = SensorReading.objects.aggregate(newest=Max('id'))['newest']
+
+            def rows():
+                return (row for row in history() if newest is None or row[0] <= newest)
+
+            page = lttb(rows, max_points, start.timestamp(), end.timestamp(), x, y)
+        else:
+            page = min_max_buckets(history(), start.timestamp(), end.timestamp(), max_points, x, y)
+        downsampled = method
+    elif len(page) > max_points:
+        page = page[:max_points]
+        next_cursor = encode_cursor(page[-1][1], page[-1][0])
+
+    return Response({
+        "sensor_id": sensor_id,
+        "from": start,
+        "to": end,
+        "count": len(page),
+        "downsampled": downsampled,
+        "next": next_cursor,
+        "results": [_reading_dict(row) for row in page],
+    }, status=status.HTTP_200_OK)
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class SensorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'sep2025_project_team_004.sensors'
\ No newline at end of file
+    name = 'sep2025_project_team_004.sensors'
+
+    def ready(self):
+        from . import signals  # noqa: F401
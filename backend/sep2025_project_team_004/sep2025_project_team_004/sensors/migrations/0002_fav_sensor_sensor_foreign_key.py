@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Turns Fav_Sensor.sensor_id into a foreign key to Belongs.sensor_id.
+
+    State only: the column keeps its name and type, and the key has no database
+    constraint or index of its own, so the table is left as it is.
+    """
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sensors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterUniqueTogether(
+                    name='fav_sensor',
+                    unique_together=set(),
+                ),
+                migrations.RemoveField(
+                    model_name='fav_sensor',
+                    name='sensor_id',
+                ),
+                migrations.AddField(
+                    model_name='fav_sensor',
+                    name='sensor',
+                    field=models.ForeignKey(db_column='sensor_id', db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to='sensors.belongs', to_field='sensor_id'),
+                    preserve_default=False,
+                ),
+                migrations.AlterUniqueTogether(
+                    name='fav_sensor',
+                    unique_together={('sensor', 'user')},
+                ),
+            ],
+        ),
+    ]
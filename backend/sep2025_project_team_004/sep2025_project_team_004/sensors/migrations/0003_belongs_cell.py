@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+from sep2025_project_team_004.sensors import spatial
+
+
+def fill_cells(apps, schema_editor):
+    Belongs = apps.get_model('sensors', 'Belongs')
+    sensors = list(Belongs.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for belongs in sensors:
+        belongs.cell = spatial.encode(belongs.latitude, belongs.longitude)
+    Belongs.objects.bulk_update(sensors, ['cell'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0002_fav_sensor_sensor_foreign_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='belongs',
+            name='cell',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.12 on 2026-10-18 00:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0003_belongs_cell'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fav_sensor',
+            name='sensor',
+            field=models.ForeignKey(db_column='sensor_id', db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='favorites', to='sensors.belongs', to_field='sensor_id'),
+        ),
+    ]
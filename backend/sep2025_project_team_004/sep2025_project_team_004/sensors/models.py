@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from . import spatial
+
 User = get_user_model()
 
 
@@ -17,20 +19,49 @@ class Belongs(models.Model):
     registered_at = models.DateTimeField(auto_now_add=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Integer geohash of latitude/longitude (see spatial.py), set by save(); bulk_create()
+    # and update() callers set it themselves
+    cell = models.BigIntegerField(null=True, blank=True, db_index=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The position as loaded, so the map tiles a moved sensor left can be dropped (see signals.py)
+        instance._loaded_position = (instance.__dict__.get('latitude'), instance.__dict__.get('longitude'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.cell = spatial.encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'cell'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.sensor_id} ({self.sensor_type}) belongs to {self.user.username}"
 
 
 class Fav_Sensor(models.Model):
-    sensor_id = models.CharField(max_length=50)  # link to Belongs.sensor_id
+    # Joined on Belongs.sensor_id (the column is still named sensor_id). No database
+    # constraint and no cascade: favorites that predate their sensor's registration,
+    # or outlive it, stay valid rows. The (sensor, user) unique index also serves
+    # lookups by sensor.
+    sensor = models.ForeignKey(
+        Belongs,
+        on_delete=models.DO_NOTHING,
+        to_field='sensor_id',
+        db_column='sensor_id',
+        db_constraint=False,
+        db_index=False,
+        related_name='favorites',
+    )
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorite_sensors')
     nickname = models.CharField(max_length=20, blank=True)
     is_default = models.BooleanField(default=False)
     belongs_to = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_fav_sensors')
 
     class Meta:
-        unique_together = ('sensor_id', 'user')
+        unique_together = ('sensor', 'user')
 
     def __str__(self):
         return f"{self.user.username} set {self.sensor_id} as '{self.nickname or 'no nickname'}'"
\ No newline at end of file
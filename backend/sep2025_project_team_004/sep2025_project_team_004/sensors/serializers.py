@@ -15,12 +15,13 @@ class RegisterSensorSerializer(serializers.Serializer):
 
 
 class SensorDetailSerializer(serializers.Serializer):
+    """A Fav_Sensor with the Belongs row of its sensor (fetch them with select_related('sensor'))."""
     sensor_id = serializers.CharField()
     nickname = serializers.CharField()
     is_default = serializers.BooleanField()
-    belongs_to = serializers.IntegerField()
-    latitude = serializers.DecimalField(max_digits=9, decimal_places=6)
-    longitude = serializers.DecimalField(max_digits=9, decimal_places=6)
-    registered_at = serializers.DateTimeField()
-    address = serializers.CharField()
-    sensor_type = serializers.ChoiceField(choices=[("air", "Air"), ("soil", "Soil")])
\ No newline at end of file
+    belongs_to = serializers.IntegerField(source='belongs_to_id')
+    latitude = serializers.DecimalField(source='sensor.latitude', max_digits=9, decimal_places=6)
+    longitude = serializers.DecimalField(source='sensor.longitude', max_digits=9, decimal_places=6)
+    registered_at = serializers.DateTimeField(source='sensor.registered_at')
+    address = serializers.CharField(source='sensor.address')
+    sensor_type = serializers.ChoiceField(source='sensor.sensor_type', choices=[("air", "Air"), ("soil", "Soil")])
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""Keeps the cached map tiles in step with sensor positions."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import tiles
+from .models import Belongs
+
+
+@receiver(post_save, sender=Belongs)
+@receiver(post_delete, sender=Belongs)
+def invalidate_tiles(sender, instance, **kwargs):
+    positions = {getattr(instance, '_loaded_position', (None, None)), (instance.latitude, instance.longitude)}
+    instance._loaded_position = (instance.latitude, instance.longitude)
+    # After the commit, so no process can rebuild a tile from the old rows
+    transaction.on_commit(lambda: tiles.invalidate(*positions))
@@ -0,0 +1,143 @@
+"""Spatial indexing of registered sensors without PostGIS.
+
+Every Belongs row with coordinates carries `cell`, an integer geohash: the
+bits of its longitude and latitude (CELL_BITS each, longitude first, like a
+geohash) interleaved into one number. Nearby points share leading bits, so
+every cell of the quadtree at `level` (its first `level` bits per axis) is
+one contiguous range of cell values, and the B-tree index on `cell` answers
+"sensors in these cells" with a few range scans.
+
+A viewport is covered by at most MAX_CELLS cells of the finest level that
+allows it (cell_ranges()), adjacent cells merged into one range; the exact
+coordinates then drop the few sensors just outside it. A radius query is the
+viewport around the circle, filtered and ordered by (equirectangular)
+distance.
+
+At low zoom levels sensors are grouped by their cell at cluster_level(zoom),
+a shift of the same column.
+"""
+import math
+from decimal import Decimal
+
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Min, Q, Value
+
+CELL_BITS = 26  # per axis: cells of about 0.6 m
+MAX_CELLS = 16  # cells covering one viewport, before merging adjacent ones
+CLUSTER_ZOOM_OFFSET = 2  # cluster cells are a quarter of a map tile (256 px) wide
+KM_PER_DEGREE = 111.32
+
+
+def _scale(value, low, high):
+    """A coordinate as an integer in [0, 2**CELL_BITS)."""
+    index = int((float(value) - low) / (high - low) * (1 << CELL_BITS))
+    return min(max(index, 0), (1 << CELL_BITS) - 1)
+
+
+def _interleave(x, y):
+    code = 0
+    for bit in range(CELL_BITS - 1, -1, -1):
+        code = (code << 2) | (((x >> bit) & 1) << 1) | ((y >> bit) & 1)
+    return code
+
+
+def encode(latitude, longitude):
+    """The cell of a point, or None without coordinates."""
+    if latitude is None or longitude is None:
+        return None
+    return _interleave(_scale(longitude, -180, 180), _scale(latitude, -90, 90))
+
+
+def cell_range(prefix, level):
+    """The (first, last) cell values inside the cell `prefix` of `level`."""
+    shift = 2 * (CELL_BITS - level)
+    return prefix << shift, ((prefix + 1) << shift) - 1
+
+
+def cell_ranges(min_lat, min_lon, max_lat, max_lon, max_cells=MAX_CELLS):
+    """Merged (first, last) cell value ranges covering a viewport that does not cross the antimeridian."""
+    x0, x1 = _scale(min_lon, -180, 180), _scale(max_lon, -180, 180)
+    y0, y1 = _scale(min_lat, -90, 90), _scale(max_lat, -90, 90)
+    level = CELL_BITS
+    while level and ((x1 >> (CELL_BITS - level)) - (x0 >> (CELL_BITS - level)) + 1) * \
+            ((y1 >> (CELL_BITS - level)) - (y0 >> (CELL_BITS - level)) + 1) > max_cells:
+        level -= 1
+    shift = CELL_BITS - level
+    prefixes = sorted(
+        _interleave(x << shift, y << shift) >> 2 * shift
+        for x in range(x0 >> shift, (x1 >> shift) + 1)
+        for y in range(y0 >> shift, (y1 >> shift) + 1)
+    )
+    ranges = []
+    for prefix in prefixes:
+        first, last = cell_range(prefix, level)
+        if ranges and ranges[-1][1] + 1 == first:
+            ranges[-1] = (ranges[-1][0], last)
+        else:
+            ranges.append((first, last))
+    return ranges
+
+
+def in_viewport(queryset, min_lat, min_lon, max_lat, max_lon):
+    """Sensors of `queryset` inside a viewport; one crossing the antimeridian has min_lon > max_lon."""
+    if min_lon > max_lon:
+        boxes = [(min_lon, 180), (-180, max_lon)]
+    else:
+        boxes = [(min_lon, max_lon)]
+    cells, exact = Q(), Q()
+    for low, high in boxes:
+        for first, last in cell_ranges(min_lat, low, max_lat, high):
+            cells |= Q(cell__gte=first, cell__lte=last)
+        exact |= Q(longitude__gte=Decimal(str(low)), longitude__lte=Decimal(str(high)))
+    # The covering cells reach past the viewport: the exact coordinates decide
+    return queryset.filter(cells).filter(
+        exact, latitude__gte=Decimal(str(min_lat)), latitude__lte=Decimal(str(max_lat)),
+    )
+
+
+def around(latitude, longitude, radius_km):
+    """The viewport (min_lat, min_lon, max_lat, max_lon) around a circle."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if dlon >= 180:
+        min_lon, max_lon = -180, 180
+    else:
+        min_lon = min_lon + 360 if min_lon < -180 else min_lon
+        max_lon = max_lon - 360 if max_lon > 180 else max_lon
+    return max(latitude - dlat, -90), min_lon, min(latitude + dlat, 90), max_lon
+
+
+def nearby(queryset, latitude, longitude, radius_km):
+    """Sensors within `radius_km` of a point, annotated with `distance2` (see distance_km())."""
+    scale = math.cos(math.radians(latitude))
+    dlat = ExpressionWrapper(F('latitude') - Value(latitude), output_field=FloatField())
+    dlon = ExpressionWrapper(F('longitude') - Value(longitude), output_field=FloatField())
+    # Squared equirectangular distance in degrees; fine for the radii allowed
+    distance = ExpressionWrapper(dlat * dlat + dlon * dlon * Value(scale * scale), output_field=FloatField())
+    return (
+        in_viewport(queryset, *around(latitude, longitude, radius_km))
+        .annotate(distance2=distance)
+        .filter(distance2__lte=(radius_km / KM_PER_DEGREE) ** 2)
+    )
+
+
+def distance_km(distance2):
+    return math.sqrt(distance2) * KM_PER_DEGREE
+
+
+def cluster_level(zoom):
+    return min(zoom + CLUSTER_ZOOM_OFFSET, CELL_BITS)
+
+
+def clusters(queryset, zoom):
+    """Sensors of `queryset` grouped by their cell at cluster_level(zoom).
+
+    One row per cluster: count, center_lat/center_lon (the centroid) and first_sensor.
+    """
+    shift = 2 * (CELL_BITS - cluster_level(zoom))
+    return (
+        queryset.annotate(cluster=F('cell').bitrightshift(shift))
+        .values('cluster')
+        .annotate(count=Count('id'), center_lat=Avg('latitude'), center_lon=Avg('longitude'), first_sensor=Min('sensor_id'))
+        .order_by('cluster')
+    )
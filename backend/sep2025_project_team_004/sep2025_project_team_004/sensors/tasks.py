@@ -0,0 +1,46 @@
+import logging
+
+from celery import shared_task
+
+from sep2025_project_team_004.geocoding import geocoder
+
+from . import spatial, tiles
+from .models import Belongs
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(autoretry_for=(geocoder.GeocodingError,), retry_backoff=30, max_retries=5)
+def geocode_sensor(sensor_id):
+    """Fills in the standardized address and coordinates of a sensor registered with GEOCODING_ASYNC."""
+    belongs = Belongs.objects.filter(sensor_id=sensor_id).first()
+    if belongs is None:
+        return f"{sensor_id} is not registered"
+    location = geocoder.lookup(belongs.address)
+    if location is None or location.latitude is None or location.longitude is None:
+        logger.warning(f"{sensor_id}: no coordinates for address {belongs.address!r}")
+        return f"{sensor_id} address not found"
+    # Only if the address was not changed again in the meantime
+    updated = Belongs.objects.filter(sensor_id=sensor_id, address=belongs.address).update(
+        address=location.delivery_line_1,
+        latitude=location.latitude,
+        longitude=location.longitude,
+        cell=spatial.encode(location.latitude, location.longitude),
+    )
+    if updated:
+        # update() sends no signals: mark the map tiles of both positions dirty here
+        tiles.invalidate((belongs.latitude, belongs.longitude), (location.latitude, location.longitude))
+    return f"{sensor_id} geocoded"
+
+
+@shared_task
+def rebuild_tiles(dirty):
+    """Rebuilds the map tiles marked dirty, given as [zoom, x, y] lists (see tiles.invalidate)."""
+    tiles.rebuild([tuple(tile) for tile in dirty])
+    return f"{len(dirty)} tiles rebuilt"
+
+
+@shared_task
+def rebuild_all_tiles():
+    """Rebuilds every map tile, refreshing their readings; runs every SENSOR_TILE_TTL seconds."""
+    return f"{tiles.rebuild_all()} tiles rebuilt"
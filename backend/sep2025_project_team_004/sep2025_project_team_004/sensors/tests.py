@@ -2,28 +2,35 @@ from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from sep2025_project_team_004.geocoding.testing import StubGeocoder
+from sep2025_project_team_004.sensor_data import latest
+from sep2025_project_team_004.sensors import spatial, tasks, tiles
 from sep2025_project_team_004.sensors.models import Belongs, Fav_Sensor
+from sep2025_project_team_004.sensors.tasks import geocode_sensor
 from unittest.mock import patch
+from django.core.cache import cache
 from django.core.management import call_command
+from django.test import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import json
 
 User = get_user_model()
 
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
 class SensorViewTests(APITestCase):
         def setUp(self):
+            cache.clear()
             self.user = User.objects.create_user(username='testuser', password='testpass', email="user@gmail.com")
             self.client.force_authenticate(user=self.user)
+            self.geocoder = self.enterContext(StubGeocoder({
+                "123 Main St": (40.7128, -74.0060),
+                "456 Updated St": (41.0, -75.0),
+            }))
+            self.enterContext(override_settings(GEOCODING_URL=self.geocoder.url))
+            self.enterContext(patch.object(tasks.rebuild_tiles, "delay"))  # no broker here
 
-        @patch("sep2025_project_team_004.sensors.views.requests.get")
-        def test_register_sensor_success(self, mock_get):
-            mock_get.return_value.status_code = 200
-            mock_get.return_value.json.return_value = [{
-                "delivery_line_1": "123 Main St",
-                "metadata": {
-                    "latitude": 40.7128,
-                    "longitude": -74.0060
-                }
-            }]
+        def test_register_sensor_success(self):
             payload = {
                 "sensor_id": "sensor123",
                 "sensor_type": "air",
@@ -34,6 +41,41 @@ class SensorViewTests(APITestCase):
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
             self.assertEqual(Belongs.objects.count(), 1)
             self.assertEqual(Fav_Sensor.objects.count(), 1)
+            self.assertEqual(float(Belongs.objects.get().latitude), 40.7128)
+
+        def test_register_sensor_rejects_unknown_address_and_reuses_known_ones(self):
+            payload = {"sensor_id": "sensor1", "sensor_type": "air", "address": "1 Nowhere Rd"}
+            response = self.client.post(reverse("sensors:register-sensor"), data=payload)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+            for sensor_id in ("sensor1", "sensor2"):
+                payload = {"sensor_id": sensor_id, "sensor_type": "air", "address": "123 main st."}
+                response = self.client.post(reverse("sensors:register-sensor"), data=payload)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(self.geocoder.requests), 2)
+            self.assertEqual(Belongs.objects.get(sensor_id="sensor2").address, "123 Main St")
+
+        @override_settings(GEOCODING_ASYNC=True)
+        def test_async_registration_geocodes_in_a_task(self):
+            payload = {"sensor_id": "sensor123", "sensor_type": "soil", "address": "123 Main St"}
+            with patch("sep2025_project_team_004.sensors.views.geocode_sensor.delay") as delay, \
+                    self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("sensors:register-sensor"), data=payload)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data["geocoding"], "pending")
+            self.assertEqual(self.geocoder.requests, [])
+            self.assertIsNone(Belongs.objects.get().latitude)
+            delay.assert_called_once_with("sensor123")
+
+            self.assertEqual(geocode_sensor("sensor123"), "sensor123 geocoded")
+            belongs = Belongs.objects.get()
+            self.assertEqual((float(belongs.latitude), float(belongs.longitude)), (40.7128, -74.006))
+
+            # Once cached, an address is filled in right away
+            payload = {"sensor_id": "sensor456", "sensor_type": "soil", "address": "123 MAIN ST"}
+            response = self.client.post(reverse("sensors:register-sensor"), data=payload)
+            self.assertNotIn("geocoding", response.data)
+            self.assertEqual(float(Belongs.objects.get(sensor_id="sensor456").latitude), 40.7128)
 
         def test_add_sensor_fails_when_not_registered(self):
             payload = {
@@ -57,6 +99,41 @@ class SensorViewTests(APITestCase):
             self.assertTrue(len(response.data) == 1)
             self.assertEqual(response.data[0]["sensor_id"], "abc123")
 
+        def test_list_my_sensors_uses_one_query_for_any_number_of_favorites(self):
+            owner = User.objects.create_user(username='owner', password='testpass', email="owner@gmail.com")
+            for count in (1, 500):
+                Fav_Sensor.objects.filter(user=self.user).delete()
+                Belongs.objects.all().delete()
+                Belongs.objects.bulk_create([
+                    Belongs(sensor_id=f"s{i}", sensor_type="soil", user=owner, address=f"{i} Test St", latitude=i, longitude=-i)
+                    for i in range(count)
+                ])
+                Fav_Sensor.objects.bulk_create([
+                    Fav_Sensor(sensor_id=f"s{i}", user=self.user, belongs_to=owner, nickname=f"n{i}")
+                    for i in range(count)
+                ])
+                # A favorite of a sensor that is no longer registered is left out
+                Fav_Sensor.objects.create(sensor_id="gone", user=self.user, belongs_to=owner)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse("sensors:list-my-sensors"))
+                # ATOMIC_REQUESTS wraps the view in a savepoint; the rest is one SELECT
+                selects = [q["sql"] for q in queries.captured_queries if "SAVEPOINT" not in q["sql"]]
+                self.assertEqual(len(selects), 1)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data), count)
+                last = response.data[-1]
+                self.assertEqual((last["sensor_id"], last["nickname"], last["belongs_to"]), (f"s{count - 1}", f"n{count - 1}", owner.id))
+                self.assertEqual((last["sensor_type"], last["address"]), ("soil", f"{count - 1} Test St"))
+
+        def test_deleting_a_sensor_keeps_its_favorites(self):
+            owner = User.objects.create_user(username='owner', password='testpass', email="owner@gmail.com")
+            Belongs.objects.create(sensor_id="abc123", sensor_type="air", user=owner, address="123", latitude=1, longitude=2)
+            Fav_Sensor.objects.create(sensor_id="abc123", user=self.user, belongs_to=self.user, nickname="mine")
+            Belongs.objects.filter(sensor_id="abc123").delete()
+            self.assertEqual(Fav_Sensor.objects.get(user=self.user).nickname, "mine")
+            # Without a registered sensor it is left out of the list, as before
+            self.assertEqual(self.client.get(reverse("sensors:list-my-sensors")).data, [])
+
         def test_update_favorite_sensor(self):
             Belongs.objects.create(sensor_id="abc123", sensor_type="air", user=self.user, address="123", latitude=1, longitude=2)
             Fav_Sensor.objects.create(sensor_id="abc123", user=self.user, belongs_to=self.user, nickname="", is_default=True)
@@ -65,17 +142,8 @@ class SensorViewTests(APITestCase):
             self.assertEqual(response.status_code, 200)
             self.assertEqual(Fav_Sensor.objects.get(sensor_id="abc123").nickname, "Updated Name")
 
-        @patch("sep2025_project_team_004.sensors.views.requests.get")
-        def test_update_belongs_sensor_success(self, mock_get):
+        def test_update_belongs_sensor_success(self):
             Belongs.objects.create(sensor_id="abc123", sensor_type="air", user=self.user, address="Old", latitude=0, longitude=0)
-            mock_get.return_value.status_code = 200
-            mock_get.return_value.json.return_value = [{
-                "delivery_line_1": "456 Updated St",
-                "metadata": {
-                    "latitude": 41.0,
-                    "longitude": -75.0
-                }
-            }]
             payload = {"address": "456 Updated St"}
             response = self.client.patch(reverse("sensors:update-belongs-sensor", args=["abc123"]), data=payload)
             self.assertEqual(response.status_code, 200)
@@ -83,4 +151,168 @@ class SensorViewTests(APITestCase):
             self.assertEqual(belongs.address, "456 Updated St")
             self.assertEqual(float(belongs.latitude), 41.0)
             self.assertEqual(float(belongs.longitude), -75.0)
-            
\ No newline at end of file
+
+        def test_register_and_update_keep_the_spatial_cell(self):
+            self.client.post(reverse("sensors:register-sensor"), data={"sensor_id": "abc123", "sensor_type": "air", "address": "123 Main St"})
+            self.assertEqual(Belongs.objects.get().cell, spatial.encode(40.7128, -74.0060))
+            self.client.patch(reverse("sensors:update-belongs-sensor", args=["abc123"]), data={"address": "456 Updated St"})
+            self.assertEqual(Belongs.objects.get().cell, spatial.encode(41.0, -75.0))
+
+
+class SensorMapTests(APITestCase):
+        def setUp(self):
+            self.user = User.objects.create_user(username='mapper', password='testpass', email="mapper@gmail.com")
+            self.client.force_authenticate(user=self.user)
+            # A 10 x 10 grid around Iowa City, 0.01 degrees apart, and two sensors far away
+            points = [(41.60 + i * 0.01, -91.60 + j * 0.01) for i in range(10) for j in range(10)]
+            points += [(40.7128, -74.0060), (-33.86, 151.21)]
+            Belongs.objects.bulk_create([
+                Belongs(sensor_id=f"s{n}", sensor_type="air", user=self.user, address=f"{n} Test St",
+                        latitude=lat, longitude=lon, cell=spatial.encode(lat, lon))
+                for n, (lat, lon) in enumerate(points)
+            ])
+            Belongs.objects.create(sensor_id="unlocated", sensor_type="air", user=self.user, address="Somewhere")
+
+        def pages(self, **params):
+            ids, cursor = [], None
+            while True:
+                response = self.client.get(reverse("sensors:sensor-map"), {**params, **({"cursor": cursor} if cursor else {})})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                ids += [sensor["sensor_id"] for sensor in response.data["results"]]
+                cursor = response.data["next"]
+                if cursor is None:
+                    return ids, response.data
+
+        def test_cell_ranges_cover_the_viewport(self):
+            for box in [(41.6, -91.6, 41.7, -91.5), (-10, -10, 10, 10), (41.655, -91.555, 41.655, -91.555)]:
+                ranges = spatial.cell_ranges(*box)
+                self.assertLessEqual(len(ranges), spatial.MAX_CELLS)
+                for lat, lon in [(box[0], box[1]), (box[2], box[3]), ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)]:
+                    cell = spatial.encode(lat, lon)
+                    self.assertTrue(any(first <= cell <= last for first, last in ranges))
+
+        def test_bbox_returns_exactly_the_sensors_inside_in_pages(self):
+            ids, data = self.pages(bbox="-91.555,41.625,-91.505,41.675", limit=7)
+            expected = {
+                f"s{i * 10 + j}" for i in range(10) for j in range(10)
+                if 41.625 <= 41.60 + i * 0.01 <= 41.675 and -91.555 <= -91.60 + j * 0.01 <= -91.505
+            }
+            self.assertEqual(len(ids), len(expected))
+            self.assertEqual(set(ids), expected)
+            self.assertFalse(data["clustered"])
+            self.assertNotIn("address", data["results"][0])
+
+        def test_bbox_across_the_antimeridian(self):
+            ids, _ = self.pages(bbox="150,-40,-170,-30")
+            self.assertEqual(ids, ["s101"])
+
+        def test_nearby_is_ordered_by_distance_and_paged(self):
+            ids, _ = self.pages(lat=41.60, lon=-91.60, radius_km=2.5, limit=4)
+            response = self.client.get(reverse("sensors:sensor-map"), {"lat": 41.60, "lon": -91.60, "radius_km": 2.5})
+            distances = [sensor["distance_km"] for sensor in response.data["results"]]
+            self.assertEqual(ids, [sensor["sensor_id"] for sensor in response.data["results"]])
+            self.assertEqual(ids[0], "s0")
+            self.assertEqual(distances, sorted(distances))
+            self.assertTrue(all(distance <= 2.5 for distance in distances))
+            # Points 0.02 degrees north (2.2 km) are in, 0.03 degrees (3.3 km) are out
+            self.assertIn("s20", ids)
+            self.assertNotIn("s30", ids)
+
+        def test_low_zoom_returns_clusters(self):
+            response = self.client.get(reverse("sensors:sensor-map"), {"bbox": "-180,-90,180,90", "zoom": 3})
+            self.assertTrue(response.data["clustered"])
+            counts = sorted(cluster["count"] for cluster in response.data["results"])
+            self.assertEqual(counts, [1, 1, 100])
+            iowa = max(response.data["results"], key=lambda cluster: cluster["count"])
+            self.assertAlmostEqual(iowa["latitude"], 41.645, places=3)
+            self.assertAlmostEqual(iowa["longitude"], -91.555, places=3)
+
+        def test_rejects_bad_parameters(self):
+            for params in [{}, {"bbox": "1,2,3"}, {"lat": 95, "lon": 0}, {"lat": 41, "lon": -91, "radius_km": 5000},
+                           {"bbox": "-92,41,-91,42", "cursor": "nope"}, {"bbox": "-92,41,-91,42", "limit": 0}]:
+                response = self.client.get(reverse("sensors:sensor-map"), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SensorTileTests(APITestCase):
+        def setUp(self):
+            cache.clear()
+            self.user = User.objects.create_user(username='tiler', password='testpass', email="tiler@gmail.com")
+            self.client.force_authenticate(user=self.user)
+            self.geocoder = self.enterContext(StubGeocoder({"456 Updated St": (41.0, -75.0)}))
+            self.enterContext(override_settings(GEOCODING_URL=self.geocoder.url))
+            # Three sensors in Iowa City, one in New York
+            points = [(41.66, -91.53), (41.67, -91.54), (41.65, -91.52), (40.7128, -74.0060)]
+            for n, (lat, lon) in enumerate(points):
+                Belongs.objects.create(sensor_id=f"s{n}", sensor_type="air", user=self.user, address=f"{n} Test St",
+                                       latitude=lat, longitude=lon)
+            latest.record({
+                "s0": {"timestamp": 1, "temperature": 20.0, "humidity": 40.0},
+                "s1": {"timestamp": 1, "temperature": 23.0, "humidity": None},
+            })
+            self.rebuild = self.enterContext(patch.object(tasks.rebuild_tiles, "delay"))
+            tasks.rebuild_all_tiles()
+
+        def tile(self, zoom, latitude, longitude):
+            x, y = tiles.tile_of(latitude, longitude, zoom)
+            return self.client.get(reverse("sensors:sensor-tile", args=[zoom, x, y]))
+
+        def test_tile_bounds_hold_their_points(self):
+            for zoom in (0, 3, 11):
+                x, y = tiles.tile_of(41.66, -91.53, zoom)
+                min_lat, min_lon, max_lat, max_lon = tiles.bounds(zoom, x, y)
+                self.assertTrue(min_lat <= 41.66 <= max_lat and min_lon <= -91.53 <= max_lon)
+
+        def test_clusters_have_count_centroid_and_average_readings(self):
+            response = self.tile(4, 41.66, -91.53)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            (iowa,) = response.data["clusters"]
+            self.assertEqual((iowa["count"], iowa["reporting"], iowa["sensor_id"]), (3, 2, "s0"))
+            self.assertAlmostEqual(iowa["latitude"], 41.66)
+            self.assertAlmostEqual(iowa["longitude"], -91.53)
+            self.assertEqual(iowa["readings"]["temperature"], 21.5)
+            self.assertEqual(iowa["readings"]["humidity"], 40.0)
+            self.assertIsNone(iowa["readings"]["pressure"])
+
+            world = self.tile(0, 0, 0).data["clusters"]
+            self.assertEqual(sorted(cluster["count"] for cluster in world), [1, 3])
+
+        def test_moved_sensor_tiles_are_rebuilt_off_the_request_path(self):
+            self.tile(4, 41.66, -91.53)
+            with CaptureQueriesContext(connection) as queries:
+                self.tile(0, 0, 0)
+            self.assertFalse([q for q in queries.captured_queries if "SAVEPOINT" not in q["sql"]])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(reverse("sensors:update-belongs-sensor", args=["s2"]), data={"address": "456 Updated St"})
+            self.assertEqual(response.status_code, 200)
+            (dirty,), _ = self.rebuild.call_args
+            self.assertIn([0, 0, 0], dirty)
+            self.assertIn([4, *tiles.tile_of(41.0, -75.0, 4)], dirty)
+            # Served as it was until the task rebuilt it
+            self.assertEqual(self.tile(4, 41.66, -91.53).data["clusters"][0]["count"], 3)
+
+            tasks.rebuild_tiles(dirty)
+            self.assertEqual(self.tile(4, 41.66, -91.53).data["clusters"][0]["count"], 2)
+            moved = self.tile(4, 41.0, -75.0).data["clusters"]
+            self.assertIn("s2", [cluster["sensor_id"] for cluster in moved])
+
+        def test_unbuilt_tile_is_pending_and_queued_once(self):
+            response = self.tile(4, -33.87, 151.21)
+            self.assertEqual((response.data["clusters"], response.data["pending"]), ([], True))
+            self.tile(4, -33.87, 151.21)
+            self.rebuild.assert_called_once_with([[4, *tiles.tile_of(-33.87, 151.21, 4)]])
+
+            tasks.rebuild_tiles(self.rebuild.call_args.args[0])
+            self.assertFalse(self.tile(4, -33.87, 151.21).data["pending"])
+
+        def test_full_rebuild_matches_single_tile_builds(self):
+            pyramid = tiles.build_all()
+            self.assertEqual(len(pyramid), 2 * (tiles.max_zoom() + 1) - 2)  # Iowa City and New York split from zoom 2
+            for tile, clusters in pyramid.items():
+                self.assertEqual(clusters, tiles.build(*tile), tile)
+
+        def test_rejects_tiles_outside_the_pyramid(self):
+            self.assertEqual(self.client.get(reverse("sensors:sensor-tile", args=[2, 4, 0])).status_code, 404)
+            self.assertEqual(self.client.get(reverse("sensors:sensor-tile", args=[20, 0, 0])).status_code, 400)
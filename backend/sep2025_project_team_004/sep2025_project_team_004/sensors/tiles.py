@@ -0,0 +1,206 @@
+"""Pre-aggregated sensor clusters per map tile.
+
+Tiles are the usual web map tiles: zoom level z splits the Web Mercator
+world into 2**z x 2**z tiles, x from the antimeridian eastwards, y from the
+north. The sensors of a tile are grouped by their spatial cell at
+spatial.cluster_level(z), so a tile holds at most a few dozen clusters
+whatever the number of sensors. Each cluster has its count, its centroid and
+the average of its sensors' latest readings (READING_FIELDS, see
+sensor_data/latest.py).
+
+Tiles are only ever built by Celery tasks (see tasks.py), never on the
+request path; requests serve the last built tile under tile_key():
+
+- rebuild_all() builds every non-empty tile of every zoom level in one pass
+  over the sensors, every SENSOR_TILE_TTL seconds, which bounds how old the
+  readings get. A tile is cached for TILE_LIFETIMES rounds, so one that was
+  not rebuilt (no sensors left in it) eventually drops out.
+- Once a sensor registers, moves or is removed, invalidate() marks the tiles
+  holding its old and new position (one per zoom level) dirty and queues
+  their rebuild; until then they are served as they were. A tile already
+  marked is not queued again, so a burst of moves rebuilds the coarse tiles
+  they share once.
+
+A tile never built yet (see get()) is queued like a dirty one.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+
+from sep2025_project_team_004.sensor_data import latest
+
+from . import spatial
+from .models import Belongs
+
+MAX_LATITUDE = 85.0511287798  # the Web Mercator square ends here
+READING_FIELDS = ('temperature', 'humidity', 'pressure', 'soilMoisture20', 'soilMoisture5', 'soilTemperature')
+LATEST_BATCH = 1000  # latest readings read per round trip
+TILE_LIFETIMES = 3  # rebuild_all() rounds a tile stays cached without being rebuilt
+
+
+def tile_key(zoom, x, y):
+    return f"sensors:tile:{zoom}:{x}:{y}"
+
+
+def dirty_key(zoom, x, y):
+    return f"sensors:tile:{zoom}:{x}:{y}:dirty"
+
+
+def max_zoom():
+    """The deepest tile zoom level; from SENSOR_MAP_CLUSTER_MAX_ZOOM on, the map shows single sensors."""
+    return settings.SENSOR_MAP_CLUSTER_MAX_ZOOM - 1
+
+
+def bounds(zoom, x, y):
+    """(min_lat, min_lon, max_lat, max_lon) of a tile."""
+    n = 1 << zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return latitude(y + 1), x / n * 360 - 180, latitude(y), (x + 1) / n * 360 - 180
+
+
+def tile_of(latitude, longitude, zoom):
+    """(x, y) of the tile holding a point at `zoom`."""
+    n = 1 << zoom
+    latitude = math.radians(min(max(float(latitude), -MAX_LATITUDE), MAX_LATITUDE))
+    x = int((float(longitude) + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(latitude)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _latest(sensor_ids):
+    found = {}
+    for start in range(0, len(sensor_ids), LATEST_BATCH):
+        found.update(latest.get_many(sensor_ids[start:start + LATEST_BATCH]))
+    return found
+
+
+def _add(clusters, cluster, sensor_id, latitude, longitude, reading):
+    totals = clusters.setdefault(cluster, {
+        'count': 0, 'latitude': 0.0, 'longitude': 0.0, 'sensor_id': sensor_id, 'reporting': 0,
+        'sums': dict.fromkeys(READING_FIELDS, 0.0), 'counts': dict.fromkeys(READING_FIELDS, 0),
+    })
+    totals['count'] += 1
+    totals['latitude'] += float(latitude)
+    totals['longitude'] += float(longitude)
+    totals['sensor_id'] = min(totals['sensor_id'], sensor_id)
+    if reading is None:
+        return
+    totals['reporting'] += 1
+    for field in READING_FIELDS:
+        if reading.get(field) is not None:
+            totals['sums'][field] += reading[field]
+            totals['counts'][field] += 1
+
+
+def _summaries(clusters):
+    return [
+        {
+            'count': totals['count'],
+            'latitude': round(totals['latitude'] / totals['count'], 6),
+            'longitude': round(totals['longitude'] / totals['count'], 6),
+            'sensor_id': totals['sensor_id'],
+            'reporting': totals['reporting'],
+            'readings': {
+                field: round(totals['sums'][field] / count, 2) if count else None
+                for field, count in totals['counts'].items()
+            },
+        }
+        for _, totals in sorted(clusters.items())
+    ]
+
+
+def _shift(zoom):
+    return 2 * (spatial.CELL_BITS - spatial.cluster_level(zoom))
+
+
+def build(zoom, x, y):
+    """The clusters of a tile, computed from the database and the latest readings."""
+    min_lat, min_lon, max_lat, max_lon = bounds(zoom, x, y)
+    if y == 0:
+        max_lat = 90  # the polar rows are not on the map; keep their sensors in the outer tiles
+    if y == (1 << zoom) - 1:
+        min_lat = -90
+    sensors = spatial.in_viewport(Belongs.objects.all(), min_lat, min_lon, max_lat, max_lon)
+    rows = [
+        row for row in sensors.values_list('sensor_id', 'cell', 'latitude', 'longitude')
+        # A sensor right on the border belongs to one tile only
+        if tile_of(row[2], row[3], zoom) == (x, y)
+    ]
+    readings = _latest([row[0] for row in rows])
+    clusters = {}
+    for sensor_id, cell, latitude, longitude in rows:
+        _add(clusters, cell >> _shift(zoom), sensor_id, latitude, longitude, readings.get(sensor_id))
+    return _summaries(clusters)
+
+
+def _add_batch(pyramid, zooms, rows):
+    readings = latest.get_many([row[0] for row in rows])
+    for sensor_id, cell, latitude, longitude in rows:
+        for zoom, shift in zooms:
+            clusters = pyramid.setdefault((zoom, *tile_of(latitude, longitude, zoom)), {})
+            _add(clusters, cell >> shift, sensor_id, latitude, longitude, readings.get(sensor_id))
+
+
+def build_all():
+    """{(zoom, x, y): clusters} of every non-empty tile, in one pass over the sensors.
+
+    Sensors are read LATEST_BATCH at a time, with their latest readings.
+    """
+    zooms = [(zoom, _shift(zoom)) for zoom in range(max_zoom() + 1)]
+    pyramid = {}
+    rows = Belongs.objects.exclude(cell=None).values_list('sensor_id', 'cell', 'latitude', 'longitude')
+    batch = []
+    for row in rows.iterator(chunk_size=LATEST_BATCH):
+        batch.append(row)
+        if len(batch) == LATEST_BATCH:
+            _add_batch(pyramid, zooms, batch)
+            batch = []
+    _add_batch(pyramid, zooms, batch)
+    return {tile: _summaries(clusters) for tile, clusters in pyramid.items()}
+
+
+def get(zoom, x, y):
+    """The last built clusters of a tile, or None if it is not built yet (its build is then queued)."""
+    clusters = cache.get(tile_key(zoom, x, y))
+    if clusters is None:
+        _queue([(zoom, x, y)])
+    return clusters
+
+
+def _timeout():
+    return settings.SENSOR_TILE_TTL * TILE_LIFETIMES
+
+
+def rebuild(tiles):
+    """Builds and caches the given (zoom, x, y) tiles, clearing their dirty marks first."""
+    cache.delete_many([dirty_key(*tile) for tile in tiles])
+    cache.set_many({tile_key(*tile): build(*tile) for tile in tiles}, _timeout())
+
+
+def rebuild_all():
+    """Builds and caches every non-empty tile; returns how many there are."""
+    pyramid = build_all()
+    cache.set_many({tile_key(*tile): clusters for tile, clusters in pyramid.items()}, _timeout())
+    return len(pyramid)
+
+
+def _queue(tiles):
+    from .tasks import rebuild_tiles
+
+    marked = [list(tile) for tile in tiles if cache.add(dirty_key(*tile), True, settings.SENSOR_TILE_TTL)]
+    if marked:
+        rebuild_tiles.delay(marked)
+
+
+def invalidate(*points):
+    """Marks the tiles, at every zoom level, that hold any of the (latitude, longitude) points dirty."""
+    _queue({
+        (zoom, *tile_of(latitude, longitude, zoom))
+        for latitude, longitude in points
+        if latitude is not None and longitude is not None
+        for zoom in range(max_zoom() + 1)
+    })
@@ -1,11 +1,15 @@
+from django.db import transaction
 from django.urls import path
-from .views import AddSensorView,ListMySensorsView, RegisterSensorView, UpdateBelongsSensorView, UpdateFavoriteSensorView
+from .views import AddSensorView,ListMySensorsView, RegisterSensorView, SensorMapView, SensorTileView, UpdateBelongsSensorView, UpdateFavoriteSensorView
 
 
 urlpatterns = [
     path('add/', AddSensorView.as_view(), name='add-sensor'),
     path('my/', ListMySensorsView.as_view(), name='list-my-sensors'),
-    path('register/', RegisterSensorView.as_view(), name='register-sensor'),
+    path('map/', SensorMapView.as_view(), name='sensor-map'),
+    path('tiles/<int:zoom>/<int:x>/<int:y>/', SensorTileView.as_view(), name='sensor-tile'),
+    # Geocoding views: no transaction is held open while SmartyStreets answers
+    path('register/', transaction.non_atomic_requests(RegisterSensorView.as_view()), name='register-sensor'),
     path('<str:sensor_id>/update-favorite/', UpdateFavoriteSensorView.as_view(), name='update-fav-sensor'),
-    path('<str:sensor_id>/update-belongs/', UpdateBelongsSensorView.as_view(), name='update-belongs-sensor'),
+    path('<str:sensor_id>/update-belongs/', transaction.non_atomic_requests(UpdateBelongsSensorView.as_view()), name='update-belongs-sensor'),
 ]
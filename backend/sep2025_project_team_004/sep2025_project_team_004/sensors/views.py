@@ -3,11 +3,42 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 
+import base64
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from sep2025_project_team_004.geocoding import geocoder
+
+from . import spatial, tiles
 from .models import Belongs, Fav_Sensor
 from .serializers import AddSensorSerializer, SensorDetailSerializer, RegisterSensorSerializer
+from .tasks import geocode_sensor
+
+MAP_COLUMNS = ('id', 'sensor_id', 'sensor_type', 'latitude', 'longitude')
+
+
+def locate(address_str):
+    """(GeocodedAddress, None), (None, None) to geocode later (GEOCODING_ASYNC), or (None, error Response)."""
+    if settings.GEOCODING_ASYNC:
+        location = geocoder.cached(address_str)
+        if location is None:
+            return None, None
+        if location is geocoder.NOT_FOUND:
+            location = None
+    else:
+        try:
+            location = geocoder.lookup(address_str)
+        except geocoder.GeocodingError as e:
+            return None, Response({"error": f"Geocoding error: {str(e)}"}, status=500)
+    if location is None:
+        return None, Response({"error": "Invalid address or geocoding failed."}, status=400)
+    if location.latitude is None or location.longitude is None:
+        return None, Response({"error": "Geocoding did not return coordinates."}, status=400)
+    return location, None
 
-import requests
-import os
 
 class AddSensorView(APIView):
     permission_classes = [IsAuthenticated]
@@ -45,32 +76,18 @@ class ListMySensorsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        favorites = Fav_Sensor.objects.select_related('belongs_to').filter(user=request.user)
-        data = []
-
-        for fav in favorites:
-            try:
-                belongs = Belongs.objects.get(sensor_id=fav.sensor_id)
-                entry = {
-                    "sensor_id": fav.sensor_id,
-                    "nickname": fav.nickname,
-                    "is_default": fav.is_default,
-                    "belongs_to": fav.belongs_to.id,
-                    "latitude": belongs.latitude,
-                    "longitude": belongs.longitude,
-                    "registered_at": belongs.registered_at,
-                    "address": belongs.address,
-                    "sensor_type": belongs.sensor_type,
-                }
-                serialized = SensorDetailSerializer(entry).data
-                data.append(serialized)
-            except Belongs.DoesNotExist:
-                continue
-
+        # One query: the inner join skips favorites whose sensor is not registered
+        favorites = Fav_Sensor.objects.select_related('sensor').filter(user=request.user)
+        data = SensorDetailSerializer(favorites, many=True).data
         return Response(data, status=status.HTTP_200_OK)
 
 
 class RegisterSensorView(APIView):
+    """Registers a sensor at a geocoded address (no transaction is held while geocoding, see urls.py).
+
+    With GEOCODING_ASYNC an address that is not cached yet is saved as entered
+    and geocode_sensor fills in the coordinates after the response.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -86,52 +103,34 @@ class RegisterSensorView(APIView):
         if Belongs.objects.filter(sensor_id=sensor_id).exists():
             return Response({"error": "This sensor is already registered by another user."}, status=400)
 
-        SMARTY_AUTH_ID = os.getenv("SMARTY_AUTH_ID")
-        SMARTY_AUTH_TOKEN = os.getenv("SMARTY_AUTH_TOKEN")
-
-        params = {
-            "street": address_str,
-            "auth-id": SMARTY_AUTH_ID,
-            "auth-token": SMARTY_AUTH_TOKEN,
-        }
-
-        try:
-            res = requests.get("https://us-street.api.smartystreets.com/street-address", params=params)
-            data = res.json()
-
-            if res.status_code != 200 or not data:
-                return Response({"error": "Invalid address or geocoding failed."}, status=400)
-
-            metadata = data[0].get("metadata", {})
-            full_address = data[0]["delivery_line_1"]
-            latitude = metadata.get("latitude")
-            longitude = metadata.get("longitude")
-
-            if latitude is None or longitude is None:
-                return Response({"error": "Geocoding did not return coordinates."}, status=400)
-
-        except Exception as e:
-            return Response({"error": f"Geocoding error: {str(e)}"}, status=500)
-
-        Belongs.objects.create(
-            sensor_id=sensor_id,
-            sensor_type=sensor_type,
-            user=request.user,
-            address=full_address,
-            latitude=latitude,
-            longitude=longitude
-        )
-
-        is_first = not Fav_Sensor.objects.filter(user=request.user).exists()
-
-        Fav_Sensor.objects.create(
-            sensor_id=sensor_id,
-            user=request.user,
-            belongs_to=request.user,
-            nickname=nickname,
-            is_default=is_first
-        )
-
+        location, error = locate(address_str)
+        if error is not None:
+            return error
+
+        with transaction.atomic():
+            Belongs.objects.create(
+                sensor_id=sensor_id,
+                sensor_type=sensor_type,
+                user=request.user,
+                address=location.delivery_line_1 if location else address_str,
+                latitude=location.latitude if location else None,
+                longitude=location.longitude if location else None,
+            )
+
+            is_first = not Fav_Sensor.objects.filter(user=request.user).exists()
+
+            Fav_Sensor.objects.create(
+                sensor_id=sensor_id,
+                user=request.user,
+                belongs_to=request.user,
+                nickname=nickname,
+                is_default=is_first
+            )
+            if location is None:
+                transaction.on_commit(lambda: geocode_sensor.delay(sensor_id))
+
+        if location is None:
+            return Response({"message": "Sensor registered successfully.", "geocoding": "pending"}, status=201)
         return Response({"message": "Sensor registered successfully."}, status=201)
     
 
@@ -160,6 +159,7 @@ class UpdateFavoriteSensorView(APIView):
 
 
 class UpdateBelongsSensorView(APIView):
+    """Moves a sensor to a new geocoded address, geocoded like in RegisterSensorView."""
     permission_classes = [IsAuthenticated]
 
     def patch(self, request, sensor_id):
@@ -175,31 +175,131 @@ class UpdateBelongsSensorView(APIView):
         if not address_str:
             return Response({"error": "Address is required."}, status=400)
 
-        SMARTY_AUTH_ID = os.getenv("SMARTY_AUTH_ID")
-        SMARTY_AUTH_TOKEN = os.getenv("SMARTY_AUTH_TOKEN")
-        params = {
-            "street": address_str,
-            "auth-id": SMARTY_AUTH_ID,
-            "auth-token": SMARTY_AUTH_TOKEN,
-        }
+        location, error = locate(address_str)
+        if error is not None:
+            return error
+
+        if location is None:
+            # The coordinates stay those of the old address until geocode_sensor has run
+            belongs.address = address_str
+            with transaction.atomic():
+                belongs.save()
+                transaction.on_commit(lambda: geocode_sensor.delay(sensor_id))
+            return Response({"message": "Sensor location updated.", "geocoding": "pending"}, status=200)
+
+        belongs.address = location.delivery_line_1
+        belongs.latitude = location.latitude
+        belongs.longitude = location.longitude
+        belongs.save()
+
+        return Response({"message": "Sensor location updated."}, status=200)
 
-        res = requests.get("https://us-street.api.smartystreets.com/street-address", params=params)
-        data = res.json()
 
-        if res.status_code != 200 or not data:
-            return Response({"error": "Invalid address or geocoding failed."}, status=400)
+def _map_cursor(key, pk):
+    return base64.urlsafe_b64encode(f"{key}|{pk}".encode()).decode()
 
-        metadata = data[0].get("metadata", {})
-        full_address = data[0]["delivery_line_1"]
-        latitude = metadata.get("latitude")
-        longitude = metadata.get("longitude")
 
-        if latitude is None or longitude is None:
-            return Response({"error": "Geocoding failed to return coordinates."}, status=400)
+def _parse_map_cursor(cursor, key_type):
+    try:
+        key, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return key_type(key), int(pk)
+    except (ValueError, UnicodeError, ArithmeticError) as e:
+        raise ValueError("Invalid cursor.") from e
 
-        belongs.address = full_address
-        belongs.latitude = latitude
-        belongs.longitude = longitude
-        belongs.save()
 
-        return Response({"message": "Sensor location updated."}, status=200)
+def _coordinate(value, name, bound):
+    value = float(value)
+    if not -bound <= value <= bound:
+        raise ValueError(f"'{name}' must be between -{bound} and {bound}.")
+    return value
+
+
+class SensorMapView(APIView):
+    """Registered sensors on a map: ?bbox=min_lon,min_lat,max_lon,max_lat or ?lat=&lon=&radius_km=.
+
+    Served from the `cell` index (see spatial.py). Sensors come in pages of at
+    most ?limit= (SENSOR_MAP_PAGE_SIZE); `next` is a keyset cursor to pass back
+    as ?cursor=. Radius queries are ordered by distance and give each sensor's
+    distance_km. With ?zoom= below SENSOR_MAP_CLUSTER_MAX_ZOOM the sensors come
+    as clusters instead (count, centroid and one sensor_id each), in one page.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            if params.get('bbox'):
+                min_lon, min_lat, max_lon, max_lat = params['bbox'].split(',')
+                min_lat, max_lat = _coordinate(min_lat, 'bbox', 90), _coordinate(max_lat, 'bbox', 90)
+                min_lon, max_lon = _coordinate(min_lon, 'bbox', 180), _coordinate(max_lon, 'bbox', 180)
+                if min_lat > max_lat:
+                    raise ValueError("'bbox' must be min_lon,min_lat,max_lon,max_lat.")
+                sensors = spatial.in_viewport(Belongs.objects.all(), min_lat, min_lon, max_lat, max_lon)
+                # Not by cell: SQLite would scan the whole cell index in order rather than seek its ranges
+                order = 'latitude'
+            elif 'lat' in params and 'lon' in params:
+                lat, lon = _coordinate(params['lat'], 'lat', 90), _coordinate(params['lon'], 'lon', 180)
+                radius_km = float(params.get('radius_km', settings.SENSOR_NEARBY_MAX_RADIUS_KM))
+                if not 0 < radius_km <= settings.SENSOR_NEARBY_MAX_RADIUS_KM:
+                    raise ValueError(f"'radius_km' must be between 0 and {settings.SENSOR_NEARBY_MAX_RADIUS_KM}.")
+                sensors = spatial.nearby(Belongs.objects.all(), lat, lon, radius_km)
+                order = 'distance2'
+            else:
+                raise ValueError("Give either 'bbox' or 'lat' and 'lon'.")
+            zoom = int(params['zoom']) if params.get('zoom') else None
+            limit = int(params.get('limit', settings.SENSOR_MAP_PAGE_SIZE))
+            if not 1 <= limit <= settings.SENSOR_MAP_PAGE_SIZE:
+                raise ValueError(f"'limit' must be between 1 and {settings.SENSOR_MAP_PAGE_SIZE}.")
+            cursor = _parse_map_cursor(params['cursor'], Decimal if order == 'latitude' else float) if params.get('cursor') else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if zoom is not None and zoom < settings.SENSOR_MAP_CLUSTER_MAX_ZOOM:
+            results = [
+                {
+                    "count": row['count'],
+                    "latitude": round(float(row['center_lat']), 6),
+                    "longitude": round(float(row['center_lon']), 6),
+                    "sensor_id": row['first_sensor'],
+                }
+                for row in spatial.clusters(sensors, zoom)
+            ]
+            return Response({"clustered": True, "count": len(results), "next": None, "results": results}, status=200)
+
+        if cursor:
+            after_key, after_id = cursor
+            sensors = sensors.filter(Q(**{f'{order}__gt': after_key}) | Q(**{order: after_key, 'id__gt': after_id}))
+        # One extra row tells whether there is another page
+        page = list(sensors.order_by(order, 'id').values_list(*MAP_COLUMNS, order)[:limit + 1])
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = _map_cursor(page[-1][-1], page[-1][0])
+
+        results = []
+        for _, sensor_id, sensor_type, latitude, longitude, key in page:
+            sensor = {"sensor_id": sensor_id, "sensor_type": sensor_type, "latitude": latitude, "longitude": longitude}
+            if order == 'distance2':
+                sensor["distance_km"] = round(spatial.distance_km(key), 3)
+            results.append(sensor)
+        return Response({"clustered": False, "count": len(results), "next": next_cursor, "results": results}, status=200)
+
+
+class SensorTileView(APIView):
+    """The sensor clusters of map tile zoom/x/y, with their latest average readings (see tiles.py).
+
+    Tiles go up to zoom SENSOR_MAP_CLUSTER_MAX_ZOOM - 1; deeper, SensorMapView
+    serves the single sensors. `pending` is true while a tile was never built.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, zoom, x, y):
+        if zoom > tiles.max_zoom():
+            return Response({"error": f"Tiles go up to zoom {tiles.max_zoom()}; use the map endpoint deeper."}, status=400)
+        if not (0 <= x < 1 << zoom and 0 <= y < 1 << zoom):
+            return Response({"error": "No such tile."}, status=404)
+        clusters = tiles.get(zoom, x, y)
+        # A tile not built yet is empty for now; its build is queued
+        return Response(
+            {"zoom": zoom, "x": x, "y": y, "clusters": clusters or [], "pending": clusters is None}, status=200,
+        )
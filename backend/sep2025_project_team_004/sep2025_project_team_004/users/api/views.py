@@ -9,16 +9,17 @@ from .serializers import UserSerializer, UpdateUserSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics
 from django.conf import settings
+from django.db import transaction
 from rest_framework.generics import UpdateAPIView
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail, BadHeaderError
 from django.contrib.auth.hashers import make_password
+from sep2025_project_team_004.geocoding import geocoder
 from sep2025_project_team_004.users.api.serializers import PasswordResetRequestSerializer, PasswordResetSerializer
 import environ
 import smtplib
 from email.mime.text import MIMEText
 import os
-import requests
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 
@@ -193,42 +194,33 @@ class SearchUsersView(APIView):
 
         return Response(serializer.data, status=200)
     
+@transaction.non_atomic_requests  # no transaction is held open while SmartyStreets answers
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def ValidateAddressView(request):
     address = request.data
 
-    SMARTY_AUTH_ID = os.getenv("SMARTY_AUTH_ID")
-    SMARTY_AUTH_TOKEN = os.getenv("SMARTY_AUTH_TOKEN")
-
-    params = {
-        "street": address.get("address"),
-        "city": address.get("city"),
-        "state": address.get("state"),
-        "zipcode": address.get("zip_code"),
-        "auth-id": SMARTY_AUTH_ID,
-        "auth-token": SMARTY_AUTH_TOKEN,
-    }
-
     try:
-        res = requests.get("https://us-street.api.smartystreets.com/street-address", params=params)
-        data = res.json()
+        validated = geocoder.lookup(
+            address.get("address"),
+            address.get("city"),
+            address.get("state"),
+            address.get("zip_code"),
+        )
+    except geocoder.GeocodingError as e:
+        return Response({"error": str(e)}, status=500)
 
-        if res.status_code == 200 and data:
-            validated = data[0]
-            return Response({
-                "valid": True,
-                "standardized": {
-                    "address": validated.get("delivery_line_1"),
-                    "city": validated["components"].get("city_name"),
-                    "state": validated["components"].get("state_abbreviation"),
-                    "zip_code": validated["components"].get("zipcode"),
-                }
-            })
+    if validated is None:
         return Response({"valid": False, "message": "Address not found or invalid."}, status=400)
-
-    except Exception as e:
-        return Response({"error": str(e)}, status=500)
+    return Response({
+        "valid": True,
+        "standardized": {
+            "address": validated.delivery_line_1,
+            "city": validated.city,
+            "state": validated.state,
+            "zip_code": validated.zip_code,
+        }
+    })
 
 class ProfilePictureUploadView(APIView):
     permission_classes = [IsAuthenticated]
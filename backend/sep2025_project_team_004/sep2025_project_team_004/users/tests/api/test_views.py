@@ -7,6 +7,8 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from sep2025_project_team_004.geocoding.testing import StubGeocoder
+
 User = get_user_model()
 
 
@@ -156,13 +158,14 @@ class TestRegisterView:
         assert response.status_code == 200
         assert response.data["email"] == user.email
 
-    @patch("requests.get")
-    def test_validate_address_valid(self, mock_get):
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = [{
-            "delivery_line_1": "123 Main St",
-            "components": {"city_name": "Anytown", "state_abbreviation": "IL", "zipcode": "60000"}
-        }]
+    @pytest.fixture
+    def geocoder(self, settings):
+        settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with StubGeocoder({"123 Main St": (41.0, -88.0)}) as stub:
+            settings.GEOCODING_URL = stub.url
+            yield stub
+
+    def test_validate_address_valid(self, geocoder):
         user = User.objects.create_user(username="addr", email="addr@example.com", password="pw")
         self.client.force_authenticate(user=user)
         response = self.client.post("/api/users/validate-address/", {
@@ -170,11 +173,10 @@ class TestRegisterView:
         })
         assert response.status_code == 200
         assert response.data["valid"] is True
+        assert response.data["standardized"] == {"address": "123 Main St", "city": "Anytown", "state": "IL", "zip_code": "60000"}
+        assert geocoder.requests[0]["zipcode"] == "60000"
 
-    @patch("requests.get")
-    def test_validate_address_invalid(self, mock_get):
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = []
+    def test_validate_address_invalid(self, geocoder):
         user = User.objects.create_user(username="addr2", email="addr2@example.com", password="pw")
         self.client.force_authenticate(user=user)
         response = self.client.post("/api/users/validate-address/", {
@@ -182,8 +184,8 @@ class TestRegisterView:
         })
         assert response.status_code == 400
 
-    @patch("requests.get", side_effect=Exception("Smarty error"))
-    def test_validate_address_error(self, mock_get):
+    def test_validate_address_error(self, geocoder):
+        geocoder.status = 500
         user = User.objects.create_user(username="failaddr", email="failaddr@example.com", password="pw")
         self.client.force_authenticate(user=user)
         response = self.client.post("/api/users/validate-address/", {